@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import pandas as pd
+import pyarrow as pa
+from esquema import aplicar_esquema
+from calendario import adicionar_calendario, COLUNAS_CALENDARIO
+from transformacoes import classificar_produtos
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURAÇÃO =====
+PASTA_SNAPSHOT = os.path.join("cache", "dados_extraidos.parquet")
+ARQUIVO_MANIFESTO = "manifesto.json"
+
+# Tipos que o pyarrow converte sem ambiguidade a partir de colunas object
+TIPOS_SEGUROS = {"string", "empty", "floating", "integer", "boolean", "datetime", "date", "bytes"}
+
+
+# ===== MANIFESTO =====
+
+def ler_manifesto(pasta=PASTA_SNAPSHOT):
+    caminho = os.path.join(pasta, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Manifesto do snapshot ilegível: {e}")
+        return {}
+
+def _gravar_json_atomico(caminho, conteudo):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(conteudo, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def idade_snapshot(pasta=PASTA_SNAPSHOT):
+    """
+    Segundos desde a última gravação do snapshot, ou None se não existir
+    """
+    manifesto = ler_manifesto(pasta)
+    if not manifesto.get("particoes"):
+        return None
+    return time.time() - manifesto.get("atualizado_em", 0)
+
+def marcar_snapshot_verificado(pasta=PASTA_SNAPSHOT):
+    """
+    Renova a data do snapshot quando a origem foi consultada e não mudou
+    """
+    manifesto = ler_manifesto(pasta)
+    if manifesto.get("particoes"):
+        manifesto["atualizado_em"] = time.time()
+        _gravar_json_atomico(os.path.join(pasta, ARQUIVO_MANIFESTO), manifesto)
+
+def snapshot_recente(pasta=PASTA_SNAPSHOT, idade_maxima=3600):
+    idade = idade_snapshot(pasta)
+    return idade is not None and idade < idade_maxima
+
+
+# ===== GRAVAÇÃO INCREMENTAL =====
+
+def _hash_particao(parte):
+    hashes = pd.util.hash_pandas_object(parte, index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+def _preparar_para_parquet(df):
+    """
+    Colunas object com tipos misturados (ex.: Telefone lido ora como número,
+    ora como texto) são convertidas para texto, mantendo os valores ausentes
+    """
+    df = df.copy()
+    for coluna in df.columns:
+        if df[coluna].dtype == object and pd.api.types.infer_dtype(df[coluna], skipna=True) not in TIPOS_SEGUROS:
+            df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    return df
+
+def salvar_snapshot(df, pasta=PASTA_SNAPSHOT, coluna_data="Data"):
+    """
+    Grava o DataFrame processado particionado por mês (um Parquet por mês).
+    Só as partições cujo conteúdo mudou são reescritas; meses que sumiram
+    da origem são removidos. Retorna a lista de meses reescritos.
+    """
+    if df.empty:
+        return []
+
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        particoes_antigas = ler_manifesto(pasta).get("particoes", {})
+
+        # Colunas derivadas da data e do produto são recalculadas na leitura
+        dados = _preparar_para_parquet(df.drop(columns=["Período_Mês", *COLUNAS_CALENDARIO, "Categoria"], errors="ignore"))
+        meses = dados[coluna_data].dt.strftime("%Y-%m")
+
+        particoes = {}
+        reescritas = []
+        for mes, parte in dados.groupby(meses, sort=True):
+            parte = parte.reset_index(drop=True)
+            hash_parte = _hash_particao(parte)
+            arquivo = f"mes={mes}.parquet"
+            caminho = os.path.join(pasta, arquivo)
+
+            if particoes_antigas.get(mes, {}).get("hash") != hash_parte or not os.path.exists(caminho):
+                temporario = f"{caminho}.tmp"
+                parte.to_parquet(temporario, index=False)
+                os.replace(temporario, caminho)
+                reescritas.append(mes)
+
+            particoes[mes] = {"arquivo": arquivo, "hash": hash_parte, "linhas": len(parte)}
+
+        for mes in set(particoes_antigas) - set(particoes):
+            caminho = os.path.join(pasta, particoes_antigas[mes]["arquivo"])
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+        _gravar_json_atomico(os.path.join(pasta, ARQUIVO_MANIFESTO), {
+            "atualizado_em": time.time(),
+            "colunas": list(dados.columns),
+            "particoes": particoes,
+        })
+
+        logger.info(f"✅ Snapshot atualizado: {len(reescritas)}/{len(particoes)} partições reescritas")
+        return reescritas
+
+    except Exception as e:
+        logger.error(f"Erro ao salvar snapshot: {e}")
+        return []
+
+
+# ===== LEITURA =====
+
+def ler_snapshot(pasta=PASTA_SNAPSHOT, colunas=None, meses=None):
+    """
+    Lê o snapshot local com projeção de colunas (só as colunas pedidas são
+    decodificadas) e, opcionalmente, apenas alguns meses ('AAAA-MM')
+    """
+    manifesto = ler_manifesto(pasta)
+    particoes = manifesto.get("particoes", {})
+    if not particoes:
+        return pd.DataFrame()
+
+    try:
+        colunas_lidas = None
+        if colunas is not None:
+            colunas_lidas = [c for c in colunas if c in manifesto.get("colunas", [])]
+
+        partes = [
+            pd.read_parquet(os.path.join(pasta, info["arquivo"]), columns=colunas_lidas)
+            for mes, info in sorted(particoes.items())
+            if meses is None or mes in meses
+        ]
+        if not partes:
+            return pd.DataFrame()
+
+        # Cada partição traz as próprias categorias; o concat as transforma em
+        # texto, então o esquema é reaplicado sobre o conjunto
+        df = aplicar_esquema(pd.concat(partes, ignore_index=True))
+        if "Data" in df.columns:
+            df["Período_Mês"] = df["Data"].dt.to_period("M")
+            df = adicionar_calendario(df)
+        if "Produto" in df.columns:
+            df["Categoria"] = classificar_produtos(df["Produto"])
+
+        logger.info(f"✅ Snapshot local lido. Shape: {df.shape}")
+        return df
+
+    except Exception as e:
+        logger.error(f"Erro ao ler snapshot: {e}")
+        return pd.DataFrame()
+
+
+# ===== DATASET FINAL (ARROW IPC) =====
+# O frame final (linhas de pedido) e os cubos de cada carga bem-sucedida
+# também são gravados em Arrow IPC sem compressão. Na partida do
+# processo esses arquivos são abertos com memory map: as colunas numéricas
+# do pandas apontam direto para as páginas do arquivo (sem cópia nem
+# decodificação) e a primeira pintura não depende do Drive nem do
+# reprocessamento.
+# Cada gravação vai para uma subpasta nova; o ponteiro atual.json só é
+# trocado no fim, então quem lê nunca vê uma versão pela metade.
+
+PASTA_DATASET_FINAL = os.path.join("cache", "dataset_final")
+# Incrementado quando colunas ou cubos mudam; versões gravadas com outro
+# formato são ignoradas na abertura
+FORMATO_DATASET_FINAL = 3
+ARQUIVO_PONTEIRO = "atual.json"
+ARQUIVO_DATASET = "dataset.arrow"
+COLUNA_HASH_ASSINATURA = "hash"
+
+
+def _gravar_arrow(df, caminho):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(caminho, "wb") as destino:
+        with pa.ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+
+def _abrir_arrow(caminho):
+    # split_blocks evita consolidar as colunas num bloco 2D, o que obrigaria
+    # a copiar; numéricas sem nulos ficam como views do memory map
+    with pa.memory_map(caminho, "r") as origem:
+        tabela = pa.ipc.open_file(origem).read_all()
+    return tabela.to_pandas(split_blocks=True)
+
+def salvar_dataset_final(df, cubos, pasta=PASTA_DATASET_FINAL):
+    """
+    Grava o frame final e os cubos em Arrow IPC numa subpasta nova e
+    publica o ponteiro. Versões anteriores são removidas (no Linux, quem
+    ainda as tem mapeadas continua lendo normalmente).
+    """
+    if df.empty:
+        return None
+
+    try:
+        inicio = time.perf_counter()
+        os.makedirs(pasta, exist_ok=True)
+        versao = f"v{time.time_ns()}"
+        os.makedirs(os.path.join(pasta, versao))
+
+        _gravar_arrow(df, os.path.join(pasta, versao, ARQUIVO_DATASET))
+        arquivos_cubos = {}
+        for nome, cubo in cubos.items():
+            if nome == "_assinatura":
+                cubo = cubo.rename(COLUNA_HASH_ASSINATURA).rename_axis("Data").reset_index()
+            arquivos_cubos[nome] = f"{nome}.arrow"
+            _gravar_arrow(cubo, os.path.join(pasta, versao, arquivos_cubos[nome]))
+
+        _gravar_json_atomico(os.path.join(pasta, ARQUIVO_PONTEIRO), {
+            "versao": versao,
+            "formato": FORMATO_DATASET_FINAL,
+            "atualizado_em": time.time(),
+            "linhas": len(df),
+            "cubos": arquivos_cubos,
+        })
+
+        for antiga in os.listdir(pasta):
+            if antiga != versao and os.path.isdir(os.path.join(pasta, antiga)):
+                shutil.rmtree(os.path.join(pasta, antiga), ignore_errors=True)
+
+        logger.info(f"✅ Dataset final gravado em Arrow IPC em {time.perf_counter() - inicio:.2f}s ({versao})")
+        return versao
+
+    except Exception as e:
+        logger.error(f"Erro ao gravar dataset final: {e}")
+        return None
+
+def abrir_dataset_final(pasta=PASTA_DATASET_FINAL):
+    """
+    Abre o último dataset final com memory map. Retorna (df, cubos), ou
+    (DataFrame vazio, {}) se não houver versão gravada ou ela for ilegível.
+    """
+    caminho_ponteiro = os.path.join(pasta, ARQUIVO_PONTEIRO)
+    if not os.path.exists(caminho_ponteiro):
+        return pd.DataFrame(), {}
+
+    try:
+        inicio = time.perf_counter()
+        with open(caminho_ponteiro, "r", encoding="utf-8") as f:
+            ponteiro = json.load(f)
+        if ponteiro.get("formato") != FORMATO_DATASET_FINAL:
+            logger.info("Dataset final gravado em outro formato; ignorado")
+            return pd.DataFrame(), {}
+        pasta_versao = os.path.join(pasta, ponteiro["versao"])
+
+        df = _abrir_arrow(os.path.join(pasta_versao, ARQUIVO_DATASET))
+        cubos = {}
+        for nome, arquivo in ponteiro["cubos"].items():
+            cubo = _abrir_arrow(os.path.join(pasta_versao, arquivo))
+            if nome == "_assinatura":
+                cubo = cubo.set_index("Data")[COLUNA_HASH_ASSINATURA].rename_axis(None).rename(None)
+            cubos[nome] = cubo
+
+        logger.info(f"✅ Dataset final aberto com memory map em {time.perf_counter() - inicio:.2f}s. Shape: {df.shape}")
+        return df, cubos
+
+    except Exception as e:
+        logger.error(f"Erro ao abrir dataset final: {e}")
+        return pd.DataFrame(), {}
@@ -0,0 +1,116 @@
+import time
+import logging
+import threading
+from datetime import datetime
+from apscheduler.schedulers.background import BackgroundScheduler
+
+logger = logging.getLogger(__name__)
+
+# ===== VERSÃO PUBLICADA DOS DADOS =====
+# Uma única versão por processo, compartilhada por todas as sessões sem
+# cópia (o módulo é importado uma vez por processo; com copy-on-write do
+# pandas, o que uma sessão derivar do frame não altera o original). O
+# worker monta a próxima versão inteira fora do caminho das requisições e
+# só então a publica trocando a referência; quem já leu a versão anterior
+# continua com ela até o próximo rerun.
+#
+# Montar e publicar uma versão (inclusive gravar o dataset final e trocar
+# o ponteiro atual.json) acontece sob uma única trava, tanto na primeira
+# carga quanto no job: uma versão mais antiga nunca é publicada por cima
+# de uma mais nova montada ao mesmo tempo.
+
+ID_JOB_ATUALIZACAO = "atualizar_dados"
+
+_trava = threading.Lock()
+_trava_montagem = threading.Lock()
+_versao = None
+
+
+def publicar_versao(df, cubos, origem=None):
+    """
+    Publica uma nova versão (troca atômica da referência) e a devolve
+    """
+    global _versao
+    versao = {"df": df, "cubos": cubos, "origem": origem, "publicada_em": time.time()}
+    with _trava:
+        _versao = versao
+    logger.info(f"✅ Nova versão dos dados publicada ({len(df)} linhas)")
+    return versao
+
+def versao_atual():
+    """
+    Última versão publicada, ou None antes da primeira carga
+    """
+    with _trava:
+        return _versao
+
+def obter_versao(carregar_primeira):
+    """
+    Versão publicada; se ainda não houver, carregar_primeira() -> (df, cubos)
+    roda uma única vez mesmo com várias sessões chegando juntas, e as
+    demais esperam e recebem a mesma versão. None se a carga vier vazia.
+    Um job disparado durante a carga só monta a versão seguinte depois
+    que esta for publicada.
+    """
+    versao = versao_atual()
+    if versao is not None:
+        return versao
+
+    with _trava_montagem:
+        versao = versao_atual()
+        if versao is None:
+            df, cubos = carregar_primeira()
+            if df.empty:
+                return None
+            versao = publicar_versao(df, cubos, origem="requisicao")
+    return versao
+
+
+# ===== AGENDADOR =====
+
+def _executar_com_log(montar_versao):
+    inicio = time.perf_counter()
+    try:
+        with _trava_montagem:
+            resultado = montar_versao()
+            if resultado is None:
+                logger.info("Atualização em segundo plano sem nova versão")
+                return
+            df, cubos = resultado
+            if df.empty:
+                logger.warning("Atualização em segundo plano devolveu dados vazios; versão anterior mantida")
+                return
+            publicar_versao(df, cubos, origem="segundo_plano")
+        logger.info(f"🔄 Atualização em segundo plano concluída em {time.perf_counter() - inicio:.1f}s")
+    except Exception as e:
+        logger.error(f"Erro na atualização em segundo plano; versão anterior mantida: {e}")
+
+def iniciar_agendador(montar_versao, intervalo_segundos, executar_agora=False):
+    """
+    Inicia um BackgroundScheduler com um único job que chama montar_versao()
+    a cada intervalo_segundos. montar_versao devolve (df, cubos), ou None
+    quando não há nada a publicar. Execuções nunca se sobrepõem.
+    """
+    # next_run_time=None pausaria o job; sem o argumento, a primeira
+    # execução acontece após um intervalo
+    primeira_execucao = {"next_run_time": datetime.now()} if executar_agora else {}
+    agendador = BackgroundScheduler(daemon=True)
+    agendador.add_job(
+        _executar_com_log,
+        "interval",
+        args=[montar_versao],
+        seconds=intervalo_segundos,
+        id=ID_JOB_ATUALIZACAO,
+        max_instances=1,
+        coalesce=True,
+        **primeira_execucao,
+    )
+    agendador.start()
+    logger.info(f"⏱️ Atualização em segundo plano a cada {intervalo_segundos}s")
+    return agendador
+
+def atualizar_agora(agendador):
+    """
+    Antecipa a próxima execução do job para agora, sem esperar o intervalo
+    """
+    agendador.modify_job(ID_JOB_ATUALIZACAO, next_run_time=datetime.now())
@@ -0,0 +1,6 @@
+"""
+Benchmarks reprodutíveis do dashboard, sem Streamlit e sem rede: gerador
+de exportações sintéticas (gerador.py), casos medidos (casos.py) e
+histórico de resultados com comparação entre execuções (historico.py).
+Rode da pasta do dashboard: python -m benchmarks --help
+"""
@@ -0,0 +1,250 @@
+"""
+Benchmarks reprodutíveis do dashboard sobre exportações sintéticas de
+pedidos B2B (sem Streamlit e sem rede).
+
+Comandos:
+  gerar     grava uma exportação sintética em CSV
+  executar  gera (ou reaproveita) as exportações dos tamanhos pedidos, mede
+            os casos e acrescenta o resultado ao histórico JSON
+  memoria   mede o pico de RSS da ingestão (em fluxo e pelo caminho antigo
+            com cópias) das exportações dos tamanhos pedidos, um processo
+            novo por medição, e acrescenta o resultado ao histórico
+  sessoes   mede o RSS de N sessões sobre o mesmo dataset (cópia por sessão,
+            como antes, ou a versão compartilhada do processo), um processo
+            novo por medição, e acrescenta o resultado ao histórico
+  interacoes roda o dashboard.py pelo AppTest do Streamlit sobre a exportação
+            e mede o rerun de cada aba e de cada filtro, com os trechos mais
+            lentos de cada interação (spans de medicoes.py), acrescentando o
+            resultado ao histórico
+  comparar  compara duas execuções do histórico caso a caso e termina com
+            código 1 se algum caso regrediu além do limite
+  listar    mostra as execuções do histórico
+
+Casos: ingestao, pipeline_serial, pipeline_particoes, cubos, cubos_atualizacao, periodos, agregacoes,
+banco_consultas, comissoes, geocodificacao, mapas e os pares antes/depois das
+otimizações ("caso_original" mede a implementação anterior de "caso"):
+normalizacao_municipios, normalizacao_cidades, valor_unitario, categorias
+(e categorias_categorica), rerun, partida_fria.
+Tamanhos: 10k, 100k, 1m, 10m (ou um número de linhas).
+As exportações geradas ficam em cache/benchmarks e são reaproveitadas
+enquanto tamanho, semente e versão do gerador forem os mesmos.
+
+Uso (da pasta do dashboard):
+  python -m benchmarks executar --tamanhos 10k 100k
+  python -m benchmarks executar --tamanhos 1m --casos ingestao cubos --repeticoes 5
+  python -m benchmarks memoria --tamanhos 1m 10m 25m   (25m ~ 2,2 GB de CSV)
+  python -m benchmarks sessoes --tamanhos 100k --sessoes 1 10 20 40
+  python -m benchmarks interacoes --tamanho 100k --abas "Cálculo de Meta"
+  python -m benchmarks comparar
+  python -m benchmarks comparar --base 20240105-101500 --limite 5
+  python -m benchmarks gerar --tamanho 10m --saida exportacao_10m.csv
+"""
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from benchmarks.gerador import ler_tamanho, nome_tamanho, gravar_csv, exportacao_em_cache, SEMENTE_PADRAO
+from benchmarks.casos import CASOS, NOMES_CASOS, preparar_contexto, executar_casos, resumir
+from benchmarks import historico, memoria as medicao_memoria, sessoes as simulacao_sessoes, interacoes as medicao_interacoes
+
+
+def _imprimir_resumo(resumo):
+    vazao = f"{resumo['linhas_por_s']:>14,}" if "linhas_por_s" in resumo else ""
+    print(f"  {resumo['caso']:<40}{resumo['mediana_s']:>12.4f}{resumo['minimo_s']:>12.4f}{resumo['maximo_s']:>12.4f}{vazao}")
+
+def gerar(args):
+    inicio = time.perf_counter()
+    gravar_csv(args.saida, args.tamanho, args.semente)
+    print(f"{args.tamanho} linhas gravadas em {args.saida} ({time.perf_counter() - inicio:.1f}s)")
+
+def executar(args):
+    casos = [caso for caso in CASOS if caso.nome in args.casos]
+    execucao = historico.nova_execucao(args.semente, args.repeticoes)
+    for linhas in args.tamanhos:
+        nome = nome_tamanho(linhas)
+        inicio = time.perf_counter()
+        caminho_csv = exportacao_em_cache(linhas, args.semente)
+        geracao = time.perf_counter() - inicio
+
+        with tempfile.TemporaryDirectory(prefix="benchmarks_") as pasta:
+            inicio = time.perf_counter()
+            contexto = preparar_contexto(caminho_csv, pasta)
+            preparacao = time.perf_counter() - inicio
+            print(f"\n== {nome}: {len(contexto['linhas'])} linhas, {len(contexto['pedidos'])} pedidos, "
+                  f"{len(contexto['periodos'])} períodos (preparação {preparacao:.1f}s) ==")
+            print(f"  {'caso':<40}{'mediana (s)':>12}{'mínimo (s)':>12}{'máximo (s)':>12}{'linhas/s':>14}")
+            resultados = executar_casos(contexto, casos, args.repeticoes, ao_medir=_imprimir_resumo)
+
+        execucao["tamanhos"][nome] = {
+            "linhas_exportacao": linhas,
+            "linhas": len(contexto["linhas"]),
+            "pedidos": len(contexto["pedidos"]),
+            "periodos": len(contexto["periodos"]),
+            "geracao_s": round(geracao, 3),
+            "preparacao_s": round(preparacao, 3),
+            "resultados": resultados,
+        }
+        del contexto
+
+    historico.acrescentar(execucao, args.historico)
+    print(f"\nExecução {execucao['id']} gravada em {args.historico}")
+
+def memoria(args):
+    execucao = historico.nova_execucao(args.semente, args.repeticoes)
+    print(f"{'tamanho':<10}{'modo':<8}{'CSV (MB)':>10}{'segundos':>10}{'pico RSS (MB)':>15}{'resultado (MB)':>16}{'sobrecarga (MB)':>17}")
+    for linhas in args.tamanhos:
+        nome = nome_tamanho(linhas)
+        caminho_csv = exportacao_em_cache(linhas, args.semente)
+        resultados = []
+        for modo in args.modos:
+            medicoes = [medicao_memoria.medir(modo, caminho_csv) for _ in range(args.repeticoes)]
+            resumo = resumir(f"memoria/{modo}", [m["segundos"] for m in medicoes], 1, medicoes[0]["linhas"])
+            for chave in ("pico_rss_mb", "resultado_mb", "sobrecarga_mb"):
+                resumo[chave] = max(m[chave] for m in medicoes)
+            resumo["arquivo_mb"] = medicoes[0]["arquivo_mb"]
+            resultados.append(resumo)
+            print(f"{nome:<10}{modo:<8}{resumo['arquivo_mb']:>10.1f}{resumo['mediana_s']:>10.2f}{resumo['pico_rss_mb']:>15.1f}"
+                  f"{resumo['resultado_mb']:>16.1f}{resumo['sobrecarga_mb']:>17.1f}")
+        execucao["tamanhos"][nome] = {"linhas_exportacao": linhas, "resultados": resultados}
+
+    historico.acrescentar(execucao, args.historico)
+    print(f"\nExecução {execucao['id']} gravada em {args.historico}")
+
+def sessoes(args):
+    execucao = historico.nova_execucao(args.semente, 1)
+    print(f"{'tamanho':<10}{'modo':<14}{'sessões':>8}{'RSS base (MB)':>16}{'RSS (MB)':>12}{'MB/sessão':>12}")
+    for linhas in args.tamanhos:
+        nome = nome_tamanho(linhas)
+        caminho_csv = exportacao_em_cache(linhas, args.semente)
+        resultados = []
+        for modo in args.modos:
+            for n in args.sessoes:
+                r = simulacao_sessoes.simular(modo, n, caminho_csv)
+                resumo = resumir(f"sessoes/{modo}/{n}", [r["segundos"]], 1)
+                resumo.update({chave: r[chave] for chave in ("rss_base_mb", "rss_mb", "mb_por_sessao")})
+                resultados.append(resumo)
+                print(f"{nome:<10}{modo:<14}{n:>8}{r['rss_base_mb']:>16.1f}{r['rss_mb']:>12.1f}{r['mb_por_sessao']:>12.1f}")
+        execucao["tamanhos"][nome] = {"linhas_exportacao": linhas, "resultados": resultados}
+
+    historico.acrescentar(execucao, args.historico)
+    print(f"\nExecução {execucao['id']} gravada em {args.historico}")
+
+def interacoes(args):
+    execucao = historico.nova_execucao(args.semente, args.repeticoes)
+    nome = nome_tamanho(args.tamanho)
+    caminho_csv = exportacao_em_cache(args.tamanho, args.semente)
+    with tempfile.TemporaryDirectory(prefix="benchmarks_") as pasta:
+        linhas = medicao_interacoes.preparar_pasta(caminho_csv, pasta)
+        print(f"\n== {nome}: {linhas} linhas ==")
+        tempos, trechos = medicao_interacoes.medir_interacoes(pasta, args.abas, args.repeticoes, args.timeout)
+
+    print(f"  {'interação':<40}{'mediana (s)':>12}{'mínimo (s)':>12}{'máximo (s)':>12}")
+    resultados = []
+    for interacao, amostras in tempos.items():
+        resumo = resumir(f"interacoes/{interacao}", amostras, 1)
+        # Trechos mais lentos pela mediana; "execucao" é o rerun inteiro
+        lentos = trechos[interacao][trechos[interacao]["Trecho"] != "execucao"].nlargest(args.trechos, "p50 ms")
+        resumo["trechos"] = lentos.to_dict("records")
+        resultados.append(resumo)
+        _imprimir_resumo(resumo)
+        for trecho in resumo["trechos"]:
+            print(f"      {trecho['Trecho']:<48}{trecho['p50 ms']:>10.1f} ms (p95 {trecho['p95 ms']:.1f}, n={trecho['n']})")
+    execucao["tamanhos"][nome] = {"linhas_exportacao": args.tamanho, "linhas": linhas, "resultados": resultados}
+
+    historico.acrescentar(execucao, args.historico)
+    print(f"\nExecução {execucao['id']} gravada em {args.historico}")
+
+def comparar(args):
+    registros = historico.ler_historico(args.historico)
+    if not registros:
+        sys.exit(f"Histórico {args.historico} vazio: rode o comando executar")
+    atual = historico.escolher(registros, args.atual if args.atual is not None else -1)
+    if args.base is not None:
+        base = historico.escolher(registros, args.base)
+    else:
+        base = historico.anterior_com_tamanhos(registros, atual)
+        if base is None:
+            sys.exit(f"Nenhuma execução anterior a {atual['id']} com os mesmos tamanhos")
+    comparacao = historico.comparar(base, atual, limite=args.limite / 100)
+    if comparacao.empty:
+        sys.exit(f"As execuções {base['id']} e {atual['id']} não têm casos em comum")
+
+    print(f"base  {base['id']} (commit {base['commit']})\natual {atual['id']} (commit {atual['commit']})")
+    if base["maquina"] != atual["maquina"]:
+        print("aviso: as execuções rodaram em máquinas ou versões diferentes")
+    print(f"{'tamanho':<10}{'caso':<40}{'base (s)':>12}{'atual (s)':>12}{'variação':>10}")
+    for linha in comparacao.itertuples(index=False):
+        marca = "  REGRESSÃO" if linha.regressao else ""
+        print(f"{linha.tamanho:<10}{linha.caso:<40}{linha.base_s:>12.4f}{linha.atual_s:>12.4f}{linha.variacao:>+10.1%}{marca}")
+
+    regressoes = int(comparacao["regressao"].sum())
+    if regressoes:
+        print(f"\n{regressoes} caso(s) mais de {args.limite:g}% mais lento(s)")
+        sys.exit(1)
+    print(f"\nNenhuma regressão acima de {args.limite:g}%")
+
+def listar(args):
+    for execucao in historico.ler_historico(args.historico):
+        tamanhos = ", ".join(execucao["tamanhos"])
+        print(f"{execucao['id']}  commit {execucao['commit'] or '-':<10} {tamanhos}")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--historico", default=historico.CAMINHO_HISTORICO)
+    parser.add_argument("-v", "--verboso", action="store_true", help="mostra o log dos módulos do dashboard")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    p = comandos.add_parser("gerar")
+    p.add_argument("--tamanho", type=ler_tamanho, required=True)
+    p.add_argument("--saida", required=True)
+    p.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    p.set_defaults(funcao=gerar)
+
+    p = comandos.add_parser("executar")
+    p.add_argument("--tamanhos", nargs="+", type=ler_tamanho, default=[ler_tamanho("10k"), ler_tamanho("100k")])
+    p.add_argument("--casos", nargs="+", choices=NOMES_CASOS, default=NOMES_CASOS,
+                   help="; ".join(f"{caso.nome}: {caso.descricao}" for caso in CASOS))
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    p.set_defaults(funcao=executar)
+
+    p = comandos.add_parser("memoria")
+    p.add_argument("--tamanhos", nargs="+", type=ler_tamanho, default=[ler_tamanho("1m")])
+    p.add_argument("--modos", nargs="+", choices=medicao_memoria.MODOS, default=medicao_memoria.MODOS)
+    p.add_argument("--repeticoes", type=int, default=1)
+    p.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    p.set_defaults(funcao=memoria)
+
+    p = comandos.add_parser("sessoes")
+    p.add_argument("--tamanhos", nargs="+", type=ler_tamanho, default=[ler_tamanho("100k")])
+    p.add_argument("--sessoes", nargs="+", type=int, default=[1, 10, 20, 40])
+    p.add_argument("--modos", nargs="+", choices=simulacao_sessoes.MODOS, default=simulacao_sessoes.MODOS)
+    p.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    p.set_defaults(funcao=sessoes)
+
+    p = comandos.add_parser("interacoes")
+    p.add_argument("--tamanho", type=ler_tamanho, default=ler_tamanho("100k"))
+    p.add_argument("--abas", nargs="+", choices=list(medicao_interacoes.ABAS), default=list(medicao_interacoes.ABAS))
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.add_argument("--timeout", type=float, default=600)
+    p.add_argument("--trechos", type=int, default=5, help="trechos mais lentos mostrados por interação")
+    p.add_argument("--semente", type=int, default=SEMENTE_PADRAO)
+    p.set_defaults(funcao=interacoes)
+
+    p = comandos.add_parser("comparar")
+    p.add_argument("--base", help="id ou posição da execução de referência (padrão: a anterior com os mesmos tamanhos)")
+    p.add_argument("--atual", help="id ou posição da execução comparada (padrão: a última)")
+    p.add_argument("--limite", type=float, default=historico.LIMITE_REGRESSAO * 100, help="variação máxima aceita, em %%")
+    p.set_defaults(funcao=comparar)
+
+    p = comandos.add_parser("listar")
+    p.set_defaults(funcao=listar)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verboso else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args.funcao(args)
+
+if __name__ == "__main__":
+    main()
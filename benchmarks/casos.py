@@ -0,0 +1,469 @@
+import os
+import time
+import logging
+import statistics
+from dataclasses import dataclass
+from typing import Callable, Optional
+import pandas as pd
+import consultas
+from ingestao import executar_pipeline, executar_pipeline_em_particoes, ler_csv_em_chunks, ETAPAS
+from periodos import fatiar_periodo, ordenar_por_data
+from calendario import limites_periodo_meta
+from cubos import construir_cubos, atualizar_cubos, CUBO_DIA_PRODUTO, CUBO_CLIENTES, CUBO_PEDIDOS
+from clientes import lojistas_a_recuperar
+from comissoes import calcular_comissoes
+from armazenamento import salvar_snapshot, ler_snapshot, salvar_dataset_final, abrir_dataset_final
+from transformacoes import calcular_valor_unitario, classificar_produto, classificar_produtos
+from geocodificacao import ler_referencias, geocodificar_dataframe, montar_pontos_mapa, normalizar_serie, _limpar_normalizacao
+from benchmarks.gerador import PASTA_REFERENCIAS
+from benchmarks import originais
+
+logger = logging.getLogger(__name__)
+
+# ===== CASOS DE BENCHMARK =====
+# Cada caso mede um trecho do dashboard sem Streamlit, sobre o dataset
+# ingerido uma vez de um CSV (preparar_contexto): ingestão, cubos,
+# recortes de período, consultas dos gráficos, comissões, geocodificação
+# e montagem dos mapas. Um caso recebe o contexto e pode devolver tempos
+# parciais {nome: segundos}, registrados como casos "caso/parcial". Os
+# casos "..._original" medem a implementação anterior de uma otimização
+# (originais.py) sobre os mesmos dados do caso sem o sufixo. Com linhas,
+# o resumo traz também a vazão (linhas por segundo).
+
+DIAS_ATUALIZACAO = 7  # dias refeitos na atualização incremental dos cubos
+DURACAO_MINIMA_AMOSTRA = 0.05  # casos mais rápidos que isto repetem dentro da amostra (como o timeit)
+WORKERS_PARTICOES = max(os.cpu_count() or 1, 2)  # processos do caso pipeline_particoes
+
+
+@dataclass(frozen=True)
+class Caso:
+    nome: str
+    funcao: Callable[[dict], dict]
+    descricao: str = ""
+    linhas: Optional[Callable[[dict], int]] = None
+
+
+def _ler(caminho_csv):
+    with open(caminho_csv, "rb") as f:
+        return executar_pipeline(ler_csv_em_chunks(iter(lambda: f.read(1 << 20), b"")))
+
+def _pares_cidade_estado(linhas):
+    pares = linhas[["Cidade", "Estado"]].drop_duplicates()
+    return pd.DataFrame({
+        "Cidade": pares["Cidade"].astype(str).str.strip(),
+        "Estado": pares["Estado"].astype(str).str.strip().str.upper(),
+    })
+
+def preparar_contexto(caminho_csv, pasta):
+    """
+    Dataset, cubos e referências usados pelos casos, montados uma vez. O
+    cache de geocodificação dos mapas fica em pasta, já aquecido, como no
+    dashboard depois da pré-geocodificação.
+    """
+    resultado = _ler(caminho_csv)
+    linhas = resultado.linhas
+    ultimo_dia = linhas["Data"].iloc[-1].normalize()
+    periodos = pd.period_range(linhas["Data"].iloc[0].to_period("M") + 1, ultimo_dia.to_period("M"), freq="M")
+    contexto = {
+        "csv": caminho_csv,
+        "pasta": pasta,
+        "linhas": linhas,
+        "pedidos": resultado.pedidos,
+        "cubos": construir_cubos(linhas),
+        "cubos_anteriores": construir_cubos(fatiar_periodo(linhas, linhas["Data"].iloc[0], ultimo_dia - pd.Timedelta(days=DIAS_ATUALIZACAO))),
+        "periodos": [limites_periodo_meta(periodo) for periodo in periodos],
+        "hoje": ultimo_dia + pd.Timedelta(days=1),
+        "referencias": ler_referencias(os.path.join(PASTA_REFERENCIAS, "municipios.csv"), os.path.join(PASTA_REFERENCIAS, "estados.csv")),
+        "cache_geocodificacao": os.path.join(pasta, "geocodificacao.json"),
+        "execucoes_geocodificacao": 0,
+    }
+    contexto["banco"] = consultas.criar_banco(contexto["cubos"])
+    _geocodificar(contexto, contexto["cache_geocodificacao"])
+    return contexto
+
+def _preparado(contexto, chave, montar):
+    """
+    Entrada derivada do contexto, montada na primeira vez que um caso a pede
+    (fora do tempo medido, na chamada de calibração)
+    """
+    if chave not in contexto:
+        contexto[chave] = montar()
+    return contexto[chave]
+
+def _geocodificar(contexto, caminho_cache):
+    estados_df, municipios_df, city_list, assinatura, indice = contexto["referencias"]
+    return geocodificar_dataframe(
+        _pares_cidade_estado(contexto["linhas"]), city_list, municipios_df, estados_df, assinatura,
+        caminho_cache=caminho_cache, threshold=70, indice=indice
+    )
+
+
+# ===== CASOS =====
+
+def ingestao(contexto):
+    """
+    CSV -> linhas e pedidos pelo caminho em fluxo (o do download), com o
+    tempo de cada etapa do pipeline
+    """
+    return _ler(contexto["csv"]).tempos
+
+def _bruto(contexto):
+    # Frame bruto já em memória, como o Parquet baixado
+    return _preparado(contexto, "bruto", lambda: pd.read_csv(contexto["csv"]))
+
+def pipeline_serial(contexto):
+    """
+    Frame bruto -> linhas e pedidos em passo único (executar_pipeline), com
+    o tempo das etapas que o caminho paralelo distribui entre as partições
+    (escopo chunk e pedido) e o das que ficam no processo principal
+    """
+    tempos = executar_pipeline([_bruto(contexto)]).tempos
+    particionaveis = {etapa.nome for etapa in ETAPAS if etapa.escopo != "conjunto"}
+    return {
+        "particionaveis": sum(t for nome, t in tempos.items() if nome in particionaveis),
+        "conjunto": sum(t for nome, t in tempos.items() if nome not in particionaveis),
+    }
+
+def pipeline_particoes(contexto):
+    """
+    O mesmo frame em partições por número do pedido no pool de processos
+    (já aberto pela chamada de calibração), com WORKERS_PARTICOES
+    processos mesmo numa máquina de uma CPU: particoes é o tempo de parede
+    da ida e volta pelo pool
+    """
+    resultado = executar_pipeline_em_particoes(_bruto(contexto), max_workers=WORKERS_PARTICOES)
+    return {"particoes": resultado.tempos["particoes"]}
+
+def cubos(contexto):
+    construir_cubos(contexto["linhas"])
+
+def cubos_atualizacao(contexto):
+    """
+    Atualização incremental dos cubos quando os últimos dias mudaram
+    """
+    atualizar_cubos(contexto["cubos_anteriores"], contexto["linhas"])
+
+def periodos(contexto):
+    """
+    Recorte de cada período da meta do histórico sobre as linhas
+    """
+    linhas = contexto["linhas"]
+    for inicio, fim in contexto["periodos"]:
+        fatiar_periodo(linhas, inicio, fim)["Valor Produto"].sum()
+
+def agregacoes(contexto):
+    """
+    Consultas dos gráficos das abas (DuckDB sobre os cubos) para cada
+    período da meta, num cursor do banco da versão como num rerun
+    """
+    con = contexto["banco"].cursor()
+    for inicio, fim in contexto["periodos"]:
+        consultas.vendas_por_dia(con, inicio, fim)
+        consultas.vendas_por_semana(con, inicio, fim)
+        consultas.top_produtos(con, inicio, fim, n=10)
+        consultas.vendas_por_categoria(con, inicio, fim)
+        consultas.totais_meta(con, inicio, fim)
+    consultas.top_lojistas(con, n=10)
+    con.close()
+
+def banco_consultas(contexto):
+    """
+    Cubos copiados para o banco DuckDB (uma vez por versão dos dados)
+    """
+    consultas.criar_banco(contexto["cubos"]).close()
+
+def comissoes(contexto):
+    """
+    Comissões, bônus e prêmio de cada período da meta
+    """
+    for inicio, fim in contexto["periodos"]:
+        calcular_comissoes(contexto["cubos"][CUBO_DIA_PRODUTO], inicio, fim)
+
+def geocodificacao(contexto):
+    """
+    Pares cidade/estado distintos com o cache em disco vazio (busca fuzzy
+    de todos os pares)
+    """
+    contexto["execucoes_geocodificacao"] += 1
+    caminho = os.path.join(contexto["pasta"], f"geocodificacao_fria_{contexto['execucoes_geocodificacao']}.json")
+    _geocodificar(contexto, caminho)
+
+def mapas(contexto):
+    """
+    Pontos do mapa de clientes (último pedido de cada um) e do mapa de
+    lojistas a recuperar, com o cache de geocodificação aquecido
+    """
+    tempos = {}
+    inicio = time.perf_counter()
+    ultimos = contexto["linhas"].drop_duplicates(subset=["Cliente"], keep="last")
+    montar_pontos_mapa(ultimos, contexto["referencias"], caminho_cache=contexto["cache_geocodificacao"])
+    tempos["clientes"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    cubos = contexto["cubos"]
+    lojistas = lojistas_a_recuperar(cubos[CUBO_CLIENTES], cubos[CUBO_PEDIDOS], contexto["hoje"])
+    if not lojistas.empty:
+        montar_pontos_mapa(lojistas, contexto["referencias"], caminho_cache=contexto["cache_geocodificacao"])
+    tempos["lojistas_recuperar"] = time.perf_counter() - inicio
+    return tempos
+
+
+# ===== ANTES E DEPOIS =====
+
+def _municipios(contexto):
+    return contexto["referencias"][1]["nome"]
+
+def _cidades(contexto):
+    # Coluna em texto (object), como era antes do esquema categórico
+    return _preparado(contexto, "cidades", lambda: contexto["linhas"]["Cidade"].astype(object))
+
+def normalizacao_municipios_original(contexto):
+    """
+    normalize_text original aplicado a cada nome do municipios.csv, como
+    na carga das referências
+    """
+    _municipios(contexto).apply(originais.normalize_text)
+
+def normalizacao_municipios(contexto):
+    """
+    normalizar_serie nos nomes do municipios.csv, com a memoização e as
+    marcas vistas vazias
+    """
+    _limpar_normalizacao()
+    normalizar_serie(_municipios(contexto))
+
+def normalizacao_cidades_original(contexto):
+    _cidades(contexto).apply(originais.normalize_text)
+
+def normalizacao_cidades(contexto):
+    """
+    normalizar_serie na coluna Cidade de todas as linhas, com a memoização
+    e as marcas vistas vazias
+    """
+    _limpar_normalizacao()
+    normalizar_serie(_cidades(contexto))
+
+def _valores(contexto):
+    return _preparado(contexto, "valores", lambda: contexto["linhas"][["Valor Total Z19-Z24", "Quantidade"]].copy())
+
+def valor_unitario_original(contexto):
+    """
+    Valor Unitário com df.apply por linha, como em processar_dados e
+    processar_lote antes da etapa derivar
+    """
+    originais.valor_unitario(_valores(contexto))
+
+def valor_unitario(contexto):
+    calcular_valor_unitario(_valores(contexto))
+
+def _produtos(contexto):
+    # Coluna em texto, como antes do esquema categórico
+    return _preparado(contexto, "produtos", lambda: contexto["linhas"]["Produto"].astype("str"))
+
+def categorias_original(contexto):
+    """
+    classificar_produto linha a linha (apply), como era feito a cada rerun
+    """
+    _produtos(contexto).apply(classificar_produto)
+
+def categorias(contexto):
+    """
+    classificar_produtos na coluna em texto: cada nome distinto uma vez
+    """
+    classificar_produtos(_produtos(contexto))
+
+def categorias_categorica(contexto):
+    """
+    classificar_produtos na coluna categórica, como na etapa categorizar
+    da ingestão (só as categorias são classificadas)
+    """
+    classificar_produtos(contexto["linhas"]["Produto"])
+
+def _ultimo_periodo(contexto):
+    """
+    Período da meta mais recente e o mesmo período um ano antes (a
+    comparação semanal da aba de desempenho)
+    """
+    return contexto["periodos"][-1], contexto["periodos"][max(len(contexto["periodos"]) - 13, 0)]
+
+def _consultas_rerun_original(linhas, contexto):
+    (inicio, fim), (inicio_anterior, fim_anterior) = _ultimo_periodo(contexto)
+    consultas.vendas_por_dia_pandas(linhas, inicio, fim)
+    consultas.vendas_por_semana_pandas(linhas, inicio, fim)
+    consultas.vendas_por_semana_pandas(linhas, inicio_anterior, fim_anterior)
+    consultas.top_produtos_pandas(linhas, inicio, fim, n=10)
+    consultas.vendas_por_categoria_pandas(linhas, inicio, fim)
+    consultas.top_lojistas_pandas(linhas, n=10)
+    consultas.totais_meta_pandas(linhas, inicio, fim)
+
+def _consultas_rerun(con, contexto):
+    (inicio, fim), (inicio_anterior, fim_anterior) = _ultimo_periodo(contexto)
+    consultas.vendas_por_dia(con, inicio, fim)
+    consultas.vendas_por_semana(con, inicio, fim)
+    consultas.vendas_por_semana(con, inicio_anterior, fim_anterior)
+    consultas.top_produtos(con, inicio, fim, n=10)
+    consultas.vendas_por_categoria(con, inicio, fim)
+    consultas.top_lojistas(con, n=10)
+    consultas.totais_meta(con, inicio, fim)
+
+def rerun_original(contexto):
+    """
+    Gráficos e totais de um rerun no período mais recente calculados em
+    pandas sobre as linhas (referências de consultas.py), como antes dos
+    cubos
+    """
+    _consultas_rerun_original(contexto["linhas"], contexto)
+
+def rerun(contexto):
+    """
+    Os mesmos resultados de rerun_original pelas consultas DuckDB sobre os
+    cubos, num cursor do banco da versão como o dashboard faz a cada rerun
+    """
+    con = contexto["banco"].cursor()
+    _consultas_rerun(con, contexto)
+    con.close()
+
+def _arquivos_partida(contexto):
+    """
+    Snapshot Parquet e dataset final em Arrow gravados uma vez na pasta do
+    contexto
+    """
+    def gravar():
+        pastas = {"snapshot": os.path.join(contexto["pasta"], "snapshot"), "dataset_final": os.path.join(contexto["pasta"], "dataset_final")}
+        salvar_snapshot(contexto["linhas"], pastas["snapshot"])
+        salvar_dataset_final(contexto["linhas"], contexto["cubos"], pastas["dataset_final"])
+        return pastas
+    return _preparado(contexto, "arquivos_partida", gravar)
+
+def partida_fria_original(contexto):
+    """
+    Primeira requisição de um processo novo antes do dataset final: lê o
+    snapshot Parquet, ordena, monta os cubos e responde ao primeiro rerun
+    """
+    pasta = _arquivos_partida(contexto)["snapshot"]
+    tempos = {}
+    inicio = time.perf_counter()
+    df = ordenar_por_data(ler_snapshot(pasta))
+    cubos = construir_cubos(df)
+    tempos["abrir"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    banco = consultas.criar_banco(cubos)
+    _consultas_rerun(banco.cursor(), contexto)
+    banco.close()
+    tempos["primeiro_rerun"] = time.perf_counter() - inicio
+    return tempos
+
+def partida_fria(contexto):
+    """
+    Primeira requisição de um processo novo: abre o dataset final e os
+    cubos em Arrow com memory map e responde ao primeiro rerun
+    """
+    pasta = _arquivos_partida(contexto)["dataset_final"]
+    tempos = {}
+    inicio = time.perf_counter()
+    df, cubos = abrir_dataset_final(pasta)
+    tempos["abrir"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    banco = consultas.criar_banco(cubos)
+    _consultas_rerun(banco.cursor(), contexto)
+    banco.close()
+    tempos["primeiro_rerun"] = time.perf_counter() - inicio
+    return tempos
+
+CASOS = [
+    Caso("ingestao", ingestao, "CSV -> linhas e pedidos (em fluxo)"),
+    Caso("pipeline_serial", pipeline_serial, "frame bruto -> linhas e pedidos em passo único",
+         linhas=lambda contexto: len(_bruto(contexto))),
+    Caso("pipeline_particoes", pipeline_particoes, f"frame bruto em partições no pool ({WORKERS_PARTICOES} processos)",
+         linhas=lambda contexto: len(_bruto(contexto))),
+    Caso("cubos", cubos, "cubos de agregação do zero"),
+    Caso("cubos_atualizacao", cubos_atualizacao, f"cubos com os últimos {DIAS_ATUALIZACAO} dias alterados"),
+    Caso("periodos", periodos, "recorte de todos os períodos da meta"),
+    Caso("agregacoes", agregacoes, "consultas dos gráficos por período"),
+    Caso("banco_consultas", banco_consultas, "cubos copiados para o banco DuckDB da versão"),
+    Caso("comissoes", comissoes, "comissões de todos os períodos"),
+    Caso("geocodificacao", geocodificacao, "pares cidade/estado com cache frio"),
+    Caso("mapas", mapas, "pontos dos mapas com cache aquecido"),
+    Caso("normalizacao_municipios_original", normalizacao_municipios_original, "normalize_text por nome do municipios.csv",
+         linhas=lambda contexto: len(_municipios(contexto))),
+    Caso("normalizacao_municipios", normalizacao_municipios, "normalizar_serie nos nomes do municipios.csv",
+         linhas=lambda contexto: len(_municipios(contexto))),
+    Caso("normalizacao_cidades_original", normalizacao_cidades_original, "normalize_text por linha da coluna Cidade",
+         linhas=lambda contexto: len(contexto["linhas"])),
+    Caso("normalizacao_cidades", normalizacao_cidades, "normalizar_serie na coluna Cidade",
+         linhas=lambda contexto: len(contexto["linhas"])),
+    Caso("valor_unitario_original", valor_unitario_original, "Valor Unitário com df.apply por linha",
+         linhas=lambda contexto: len(contexto["linhas"])),
+    Caso("valor_unitario", valor_unitario, "Valor Unitário com divisão mascarada (calcular_valor_unitario)",
+         linhas=lambda contexto: len(contexto["linhas"])),
+    Caso("categorias_original", categorias_original, "categoria com apply(classificar_produto) por linha",
+         linhas=lambda contexto: len(contexto["linhas"])),
+    Caso("categorias", categorias, "classificar_produtos na coluna em texto",
+         linhas=lambda contexto: len(contexto["linhas"])),
+    Caso("categorias_categorica", categorias_categorica, "classificar_produtos na coluna categórica",
+         linhas=lambda contexto: len(contexto["linhas"])),
+    Caso("rerun_original", rerun_original, "gráficos de um rerun em pandas sobre as linhas"),
+    Caso("rerun", rerun, "gráficos de um rerun em DuckDB sobre os cubos"),
+    Caso("partida_fria_original", partida_fria_original, "snapshot Parquet + cubos + primeiro rerun"),
+    Caso("partida_fria", partida_fria, "dataset final em Arrow (memory map) + primeiro rerun"),
+]
+NOMES_CASOS = [caso.nome for caso in CASOS]
+
+
+# ===== EXECUÇÃO =====
+
+def resumir(nome, amostras, chamadas, linhas=None):
+    resumo = {
+        "caso": nome,
+        "chamadas_por_amostra": chamadas,
+        "amostras": [round(s, 6) for s in amostras],
+        "mediana_s": round(statistics.median(amostras), 6),
+        "minimo_s": round(min(amostras), 6),
+        "maximo_s": round(max(amostras), 6),
+    }
+    if linhas is not None:
+        resumo["linhas"] = linhas
+        resumo["linhas_por_s"] = round(linhas / max(statistics.median(amostras), 1e-9))
+    return resumo
+
+def _chamadas_por_amostra(caso, contexto):
+    """
+    Quantas chamadas somam ao menos DURACAO_MINIMA_AMOSTRA (a chamada de
+    calibração também aquece o caso)
+    """
+    inicio = time.perf_counter()
+    caso.funcao(contexto)
+    decorrido = time.perf_counter() - inicio
+    if decorrido >= DURACAO_MINIMA_AMOSTRA:
+        return 1
+    return int(DURACAO_MINIMA_AMOSTRA / max(decorrido, 1e-6)) + 1
+
+def executar_casos(contexto, casos=CASOS, repeticoes=3, ao_medir=None):
+    """
+    Roda cada caso `repeticoes` vezes. Retorna uma lista de resumos
+    (caso, amostras, mediana, mínimo e máximo em segundos por chamada, e a
+    vazão nos casos com linhas), com os tempos parciais como casos "caso/parcial". Casos curtos são
+    chamados várias vezes por amostra, para o tempo não ficar na
+    resolução do ruído. ao_medir(resumo) é chamado a cada caso concluído.
+    """
+    resultados = []
+    for caso in casos:
+        chamadas = _chamadas_por_amostra(caso, contexto)
+        amostras, parciais = [], {}
+        for _ in range(repeticoes):
+            soma_parciais = {}
+            inicio = time.perf_counter()
+            for _ in range(chamadas):
+                for nome, segundos in (caso.funcao(contexto) or {}).items():
+                    soma_parciais[nome] = soma_parciais.get(nome, 0.0) + segundos
+            amostras.append((time.perf_counter() - inicio) / chamadas)
+            for nome, segundos in soma_parciais.items():
+                parciais.setdefault(nome, []).append(segundos / chamadas)
+
+        resumos = [resumir(caso.nome, amostras, chamadas, caso.linhas(contexto) if caso.linhas else None)]
+        resumos += [resumir(f"{caso.nome}/{nome}", valores, chamadas) for nome, valores in parciais.items()]
+        for resumo in resumos:
+            if ao_medir:
+                ao_medir(resumo)
+        resultados.extend(resumos)
+    return resultados
@@ -0,0 +1,250 @@
+import os
+import logging
+import unicodedata
+import numpy as np
+import pandas as pd
+from transformacoes import PREFIXOS_KITS_AR
+
+logger = logging.getLogger(__name__)
+
+# ===== EXPORTAÇÃO SINTÉTICA DE PEDIDOS B2B =====
+# Gera, de forma reprodutível (mesma semente, mesmo arquivo), uma exportação
+# no layout que a ingestão mapeia (ingestao.MAPEAMENTO_COLUNAS): uma linha
+# por produto de pedido, com os atributos do pedido repetidos. Os lojistas
+# ficam em municípios reais (municipios.csv), com parte dos cadastros
+# digitados com erros comuns (sem acento, caixa trocada, letra faltando...),
+# e os pedidos têm de 1 a dezenas de linhas, concentrados nos clientes e
+# produtos mais frequentes.
+#
+# As linhas saem em blocos: cada bloco tem o próprio gerador derivado da
+# semente e do número do bloco, então 10 milhões de linhas são gravadas sem
+# ficarem inteiras na memória e cada bloco pode ser refeito sozinho.
+
+TAMANHOS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+COLUNAS_EXPORTACAO = ["Data", "Número do Pedido", "Cliente", "Produto", "Cidade", "Estado",
+                      "Telefone", "Quantidade", "Valor Total Z19-Z24"]
+
+VERSAO_GERADOR = 1  # mudar quando o conteúdo gerado mudar (invalida os CSV em cache)
+SEMENTE_PADRAO = 42
+INICIO_PADRAO = "2021-01-01"
+DIAS_HISTORICO = 4 * 365
+LINHAS_POR_BLOCO = 250_000
+PRIMEIRO_PEDIDO = 100_000
+LINHAS_POR_CLIENTE = 60           # clientes = linhas / isto (entre os limites abaixo)
+MINIMO_CLIENTES, MAXIMO_CLIENTES = 200, 150_000
+PRODUTOS = 3_000
+PROPORCAO_GRAFIA_ERRADA = 0.3     # cadastros com a cidade digitada com erro
+PROPORCAO_SEM_TELEFONE = 0.02
+PESO_CAPITAL = 40                 # capitais concentram lojistas
+
+PASTA_REFERENCIAS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def ler_tamanho(texto):
+    """
+    "10k", "1m" ou um número de linhas
+    """
+    texto = str(texto).strip().lower()
+    if texto in TAMANHOS:
+        return TAMANHOS[texto]
+    multiplicador = {"k": 1_000, "m": 1_000_000}.get(texto[-1:], 1)
+    return int(float(texto.rstrip("km")) * multiplicador)
+
+def nome_tamanho(linhas):
+    """
+    Rótulo de um número de linhas ("10k", "1m"...), o inverso de ler_tamanho
+    """
+    for nome, valor in TAMANHOS.items():
+        if valor == linhas:
+            return nome
+    return str(linhas)
+
+
+# ===== GRAFIAS COM ERRO =====
+
+def sem_acentos(texto):
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if unicodedata.category(c) != "Mn")
+
+def errar_grafia(texto, rng):
+    """
+    Uma variação de digitação do nome: sem acentos (a mais comum), caixa
+    trocada, espaços sobrando, letras trocadas de lugar, faltando ou dobradas
+    """
+    tipo = rng.choice(["sem_acentos", "maiusculas", "minusculas", "espacos", "troca", "falta", "dobra"],
+                      p=[0.35, 0.2, 0.1, 0.1, 0.1, 0.1, 0.05])
+    if tipo == "sem_acentos":
+        return sem_acentos(texto).upper() if rng.random() < 0.5 else sem_acentos(texto)
+    if tipo == "maiusculas":
+        return texto.upper()
+    if tipo == "minusculas":
+        return texto.lower()
+    if tipo == "espacos":
+        return f" {texto.replace(' ', '  ', 1)} "
+    letras = [i for i, c in enumerate(texto) if c.isalpha()]
+    if len(letras) < 4:
+        return texto.upper()
+    i = letras[rng.integers(1, len(letras) - 1)]
+    if tipo == "troca" and i + 1 < len(texto):
+        return texto[:i] + texto[i + 1] + texto[i] + texto[i + 2:]
+    if tipo == "falta":
+        return texto[:i] + texto[i + 1:]
+    return texto[:i] + texto[i] + texto[i:]
+
+
+# ===== CATÁLOGOS =====
+
+def _municipios(pasta):
+    municipios = pd.read_csv(os.path.join(pasta, "municipios.csv"))
+    estados = pd.read_csv(os.path.join(pasta, "estados.csv"), encoding="utf-8-sig")
+    municipios["uf"] = municipios["codigo_uf"].map(estados.set_index("codigo_uf")["uf"])
+    return municipios.dropna(subset=["uf"]).reset_index(drop=True)
+
+def catalogo_clientes(n_clientes, rng, pasta=PASTA_REFERENCIAS):
+    """
+    Lojistas com cidade, estado e telefone do cadastro (a grafia errada,
+    quando há, é a mesma em todos os pedidos do lojista) e o peso de cada
+    um no sorteio dos pedidos (cauda longa: poucos compram muito)
+    """
+    municipios = _municipios(pasta)
+    pesos = np.where(municipios["capital"].to_numpy() == 1, PESO_CAPITAL, 1.0)
+    escolhidos = municipios.iloc[rng.choice(len(municipios), size=n_clientes, p=pesos / pesos.sum())]
+
+    cidades = escolhidos["nome"].to_numpy(dtype=object).copy()
+    for i in np.flatnonzero(rng.random(n_clientes) < PROPORCAO_GRAFIA_ERRADA):
+        cidades[i] = errar_grafia(cidades[i], rng)
+    estados = escolhidos["uf"].to_numpy(dtype=object).copy()
+    minusculos = rng.random(n_clientes) < 0.05
+    estados[minusculos] = [f"{uf.lower()} " for uf in estados[minusculos]]
+
+    ramos = np.array(["AUTO PECAS", "SUSPENSAO", "OFICINA", "CENTRO AUTOMOTIVO", "MOLAS", "RODAS E PNEUS", "DISTRIBUIDORA"], dtype=object)
+    clientes = [f"{ramo} {i:06d}" for i, ramo in enumerate(ramos[rng.integers(0, len(ramos), n_clientes)])]
+
+    telefones = [f"{ddd}9{numero:08d}" for ddd, numero in zip(escolhidos["ddd"], rng.integers(0, 10**8, n_clientes))]
+    telefones = np.array(telefones, dtype=object)
+    telefones[rng.random(n_clientes) < PROPORCAO_SEM_TELEFONE] = None
+
+    peso = rng.lognormal(0, 1.5, n_clientes)
+    return pd.DataFrame({
+        "Cliente": clientes,
+        "Cidade": cidades,
+        "Estado": estados,
+        "Telefone": telefones,
+        "peso": peso / peso.sum(),
+    })
+
+def catalogo_produtos(n_produtos, rng):
+    """
+    Kits de ar (prefixos reais), kits rosca e peças avulsas, com o preço
+    unitário e o peso de cada produto no sorteio das linhas
+    """
+    tipos = rng.choice(3, size=n_produtos, p=[0.3, 0.15, 0.55])
+    prefixos = np.array(PREFIXOS_KITS_AR, dtype=object)[rng.integers(0, len(PREFIXOS_KITS_AR), n_produtos)]
+    nomes, precos = [], []
+    for i, (tipo, prefixo) in enumerate(zip(tipos, prefixos)):
+        if tipo == 0:
+            nomes.append(f"{prefixo} MODELO {i:04d}")
+            precos.append(rng.lognormal(np.log(2500), 0.5))
+        elif tipo == 1:
+            nomes.append(f"KIT ROSCA {i:04d}")
+            precos.append(rng.lognormal(np.log(600), 0.4))
+        else:
+            nomes.append(f"PECA {i:04d}")
+            precos.append(rng.lognormal(np.log(80), 0.8))
+    peso = rng.lognormal(0, 1.2, n_produtos)
+    return pd.DataFrame({
+        "Produto": nomes,
+        "preco": np.round(precos, 2),
+        "peso": peso / peso.sum(),
+    })
+
+
+# ===== GERAÇÃO =====
+
+def _catalogos(linhas, semente, pasta):
+    rng = np.random.default_rng([semente, VERSAO_GERADOR])
+    n_clientes = int(np.clip(linhas // LINHAS_POR_CLIENTE, MINIMO_CLIENTES, MAXIMO_CLIENTES))
+    return catalogo_clientes(n_clientes, rng, pasta), catalogo_produtos(PRODUTOS, rng)
+
+def _bloco(clientes, produtos, linhas, inicio_bloco, tamanho, primeiro_pedido, semente, bloco, dia_inicial):
+    rng = np.random.default_rng([semente, VERSAO_GERADOR, bloco])
+
+    # Linhas por pedido: maioria pequenos, alguns com dezenas de itens. Cada
+    # pedido tem ao menos uma linha, então `tamanho` sorteios bastam; o
+    # último pedido do bloco é aparado para fechar o tamanho.
+    por_pedido = np.minimum(rng.geometric(0.3, size=tamanho), 40)
+    acumulado = np.cumsum(por_pedido)
+    corte = int(np.searchsorted(acumulado, tamanho))
+    por_pedido = por_pedido[:corte + 1]
+    por_pedido[-1] -= int(acumulado[corte]) - tamanho
+    n_pedidos = len(por_pedido)
+
+    # Data do pedido avança com a posição no arquivo (o histórico cresce com
+    # o tamanho), sem domingos
+    posicao = inicio_bloco + np.concatenate(([0], np.cumsum(por_pedido)[:-1]))
+    dias = (posicao * DIAS_HISTORICO) // linhas
+    datas = dia_inicial + dias.astype("timedelta64[D]")
+    domingo = pd.DatetimeIndex(datas).dayofweek.to_numpy() == 6
+    datas[domingo] += np.timedelta64(1, "D")
+
+    cliente_pedido = rng.choice(len(clientes), size=n_pedidos, p=clientes["peso"].to_numpy())
+    repetir = lambda valores: np.repeat(valores, por_pedido)
+    cliente_linha = repetir(cliente_pedido)
+    produto_linha = rng.choice(len(produtos), size=tamanho, p=produtos["peso"].to_numpy())
+    quantidade = np.minimum(rng.geometric(0.25, size=tamanho), 50)
+    desconto = 1 - rng.choice([0, 0.05, 0.1], size=tamanho, p=[0.7, 0.2, 0.1])
+
+    return pd.DataFrame({
+        "Data": pd.DatetimeIndex(repetir(datas)).strftime("%Y-%m-%d"),
+        "Número do Pedido": repetir(primeiro_pedido + np.arange(n_pedidos)),
+        "Cliente": clientes["Cliente"].to_numpy()[cliente_linha],
+        "Produto": produtos["Produto"].to_numpy()[produto_linha],
+        "Cidade": clientes["Cidade"].to_numpy()[cliente_linha],
+        "Estado": clientes["Estado"].to_numpy()[cliente_linha],
+        "Telefone": clientes["Telefone"].to_numpy()[cliente_linha],
+        "Quantidade": quantidade,
+        "Valor Total Z19-Z24": np.round(produtos["preco"].to_numpy()[produto_linha] * quantidade * desconto, 2),
+    }, columns=COLUNAS_EXPORTACAO), n_pedidos
+
+def gerar_blocos(linhas, semente=SEMENTE_PADRAO, inicio=INICIO_PADRAO, linhas_por_bloco=LINHAS_POR_BLOCO, pasta=PASTA_REFERENCIAS):
+    """
+    Gera a exportação em DataFrames de até linhas_por_bloco linhas; cada
+    pedido fica inteiro dentro de um bloco
+    """
+    clientes, produtos = _catalogos(linhas, semente, pasta)
+    dia_inicial = np.datetime64(pd.Timestamp(inicio).date(), "D")
+    proximo_pedido = PRIMEIRO_PEDIDO
+    for bloco, inicio_bloco in enumerate(range(0, linhas, linhas_por_bloco)):
+        tamanho = min(linhas_por_bloco, linhas - inicio_bloco)
+        df, n_pedidos = _bloco(clientes, produtos, linhas, inicio_bloco, tamanho, proximo_pedido, semente, bloco, dia_inicial)
+        proximo_pedido += n_pedidos
+        yield df
+
+def gerar_exportacao(linhas, semente=SEMENTE_PADRAO, **kwargs):
+    """
+    A exportação inteira em um DataFrame (para tamanhos que cabem na memória)
+    """
+    return pd.concat(gerar_blocos(linhas, semente, **kwargs), ignore_index=True)
+
+def gravar_csv(caminho, linhas, semente=SEMENTE_PADRAO, **kwargs):
+    """
+    Grava a exportação em CSV bloco a bloco (gravação atômica)
+    """
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8", newline="") as f:
+        for i, df in enumerate(gerar_blocos(linhas, semente, **kwargs)):
+            df.to_csv(f, index=False, header=(i == 0))
+    os.replace(temporario, caminho)
+    return caminho
+
+def exportacao_em_cache(linhas, semente=SEMENTE_PADRAO, pasta=os.path.join("cache", "benchmarks")):
+    """
+    Caminho do CSV de linhas/semente, gerado só na primeira vez
+    """
+    caminho = os.path.join(pasta, f"exportacao_v{VERSAO_GERADOR}_{nome_tamanho(linhas)}_s{semente}.csv")
+    if not os.path.exists(caminho):
+        logger.info(f"Gerando exportação sintética de {linhas} linhas em {caminho}")
+        gravar_csv(caminho, linhas, semente)
+    return caminho
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import platform
+import subprocess
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ===== HISTÓRICO DE RESULTADOS =====
+# Um arquivo JSON com a lista das execuções do benchmark, da mais antiga à
+# mais recente. Cada execução guarda quando e onde rodou (commit, máquina,
+# versões) e, por tamanho do dataset, os resumos de cada caso. comparar
+# confronta duas execuções caso a caso pela mediana.
+
+CAMINHO_HISTORICO = os.path.join("cache", "benchmarks", "historico.json")
+LIMITE_REGRESSAO = 0.15  # mediana 15% acima da base (o ruído entre execuções chega a ~10%)
+RUIDO_MINIMO_S = 0.005   # diferenças menores que isto não contam como regressão
+
+
+def _commit():
+    try:
+        saida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return saida.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def nova_execucao(semente, repeticoes):
+    """
+    Cabeçalho de uma execução; os resultados entram em execucao["tamanhos"]
+    """
+    return {
+        "id": time.strftime("%Y%m%d-%H%M%S"),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _commit(),
+        "maquina": {
+            "plataforma": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+        },
+        "semente": semente,
+        "repeticoes": repeticoes,
+        "tamanhos": {},
+    }
+
+def ler_historico(caminho=CAMINHO_HISTORICO):
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def acrescentar(execucao, caminho=CAMINHO_HISTORICO):
+    """
+    Acrescenta a execução ao histórico (gravação atômica)
+    """
+    historico = ler_historico(caminho)
+    historico.append(execucao)
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(historico, f, ensure_ascii=False, indent=1)
+    os.replace(temporario, caminho)
+    logger.info(f"Execução {execucao['id']} gravada em {caminho} ({len(historico)} no histórico)")
+    return historico
+
+def escolher(historico, referencia):
+    """
+    Execução pelo id ou pela posição (-1 é a última, -2 a anterior...)
+    """
+    for execucao in historico:
+        if execucao["id"] == str(referencia):
+            return execucao
+    try:
+        return historico[int(referencia)]
+    except (ValueError, IndexError):
+        raise KeyError(f"Execução '{referencia}' não encontrada no histórico ({len(historico)} execuções)")
+
+
+def anterior_com_tamanhos(historico, atual):
+    """
+    A execução mais recente antes de atual com algum tamanho em comum
+    (base padrão da comparação), ou None
+    """
+    posicao = next(i for i, execucao in enumerate(historico) if execucao is atual)
+    for execucao in reversed(historico[:posicao]):
+        if set(execucao["tamanhos"]) & set(atual["tamanhos"]):
+            return execucao
+    return None
+
+
+# ===== COMPARAÇÃO =====
+
+def comparar(base, atual, limite=LIMITE_REGRESSAO, ruido_minimo=RUIDO_MINIMO_S):
+    """
+    DataFrame com a mediana de cada caso nas duas execuções (só os pares
+    tamanho/caso presentes em ambas), a variação relativa e a coluna
+    regressao. Um caso regride quando a mediana e também o mínimo das
+    amostras passam a base em mais que limite (uma amostra lenta isolada
+    não conta) e a mediana piora ao menos ruido_minimo segundos.
+    """
+    linhas = []
+    for tamanho, dados_atual in atual["tamanhos"].items():
+        dados_base = base["tamanhos"].get(tamanho)
+        if not dados_base:
+            continue
+        resultados_base = {r["caso"]: r for r in dados_base["resultados"]}
+        for resultado in dados_atual["resultados"]:
+            anterior = resultados_base.get(resultado["caso"])
+            if anterior is None:
+                continue
+            linhas.append({
+                "tamanho": tamanho,
+                "caso": resultado["caso"],
+                "base_s": anterior["mediana_s"],
+                "atual_s": resultado["mediana_s"],
+                "base_minimo_s": anterior["minimo_s"],
+                "atual_minimo_s": resultado["minimo_s"],
+            })
+
+    comparacao = pd.DataFrame(linhas, columns=["tamanho", "caso", "base_s", "atual_s", "base_minimo_s", "atual_minimo_s"])
+    variacao = lambda depois, antes: (comparacao[depois] / comparacao[antes].where(comparacao[antes] > 0) - 1).fillna(0.0)
+    comparacao["variacao"] = variacao("atual_s", "base_s")
+    comparacao["regressao"] = (
+        (comparacao["variacao"] > limite)
+        & (variacao("atual_minimo_s", "base_minimo_s") > limite)
+        & (comparacao["atual_s"] - comparacao["base_s"] >= ruido_minimo)
+    )
+    return comparacao
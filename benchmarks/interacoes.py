@@ -0,0 +1,125 @@
+"""
+Latência por interação do dashboard: roda o dashboard.py sem navegador
+(streamlit.testing.v1.AppTest) sobre uma exportação sintética, abre cada
+aba e troca cada filtro dela, medindo o tempo do rerun. Com a execução
+preguiçosa das abas, o tempo de uma interação deve depender só da aba em
+que ela acontece. Usado pelo comando interacoes de python -m benchmarks.
+
+O AppTest sempre reexecuta o script inteiro (no navegador, um filtro
+dentro de uma aba reexecuta apenas o fragmento da aba), então os tempos
+aqui são um teto. O agendador de atualização fica desligado
+(ATUALIZACAO_EM_SEGUNDO_PLANO=0): a medição roda sem rede e sem uma
+atualização em segundo plano competindo com os reruns.
+
+Os trechos medidos pelo próprio dashboard (medicoes.py) rodam no mesmo
+processo: os percentis de cada span são separados por interação, mostrando
+para onde vai o tempo de cada uma.
+"""
+import os
+import time
+import shutil
+import logging
+from ingestao import executar_pipeline, ler_csv_em_chunks
+from periodos import ordenar_por_data
+from cubos import construir_cubos
+from armazenamento import salvar_dataset_final
+import medicoes
+from benchmarks.gerador import PASTA_REFERENCIAS
+
+ABAS = {
+    "Desempenho Individual": ["ano_selecionado", "mes_selecionado"],
+    "Análise de Clientes": ["estado_lojistas"],
+    "Cálculo de Meta": ["ano_meta", "mes_meta"],
+}
+CHAVE_ABA = "aba_ativa"
+AMBIENTE = {"ATUALIZACAO_EM_SEGUNDO_PLANO": "0"}
+ARQUIVOS_REFERENCIA = ["municipios.csv", "estados.csv"]
+
+
+# ===== PASTA DE TRABALHO =====
+# O dashboard lê cache/ e os arquivos de referência da pasta corrente: a
+# medição roda numa pasta temporária com o dataset final montado da
+# exportação, como depois de uma primeira carga.
+
+def preparar_pasta(caminho_csv, pasta):
+    with open(caminho_csv, "rb") as f:
+        df = ordenar_por_data(executar_pipeline(ler_csv_em_chunks(iter(lambda: f.read(1 << 20), b""))).linhas)
+    salvar_dataset_final(df, construir_cubos(df), os.path.join(pasta, "cache", "dataset_final"))
+    for arquivo in ARQUIVOS_REFERENCIA:
+        shutil.copy(os.path.join(PASTA_REFERENCIAS, arquivo), pasta)
+    return len(df)
+
+
+# ===== MEDIÇÃO =====
+
+def medir(app, aba, acao=None):
+    """
+    Um rerun com a aba ativa (o AppTest não guarda a aba selecionada entre
+    execuções, então ela é informada a cada uma). Devolve os segundos.
+    """
+    app.session_state[CHAVE_ABA] = aba
+    if acao:
+        acao()
+    inicio = time.perf_counter()
+    app.run()
+    decorrido = time.perf_counter() - inicio
+    erros = [e.value for e in app.exception] + [e.value for e in app.error]
+    if erros:
+        raise RuntimeError(f"Erro no dashboard ({aba}): {erros[0]}")
+    return decorrido
+
+def alternar(app, chave):
+    """
+    Seleciona no selectbox uma opção diferente da atual
+    """
+    widget = app.selectbox(key=chave)
+    opcoes = [o for o in widget.options if o != widget.value]
+    if opcoes:
+        widget.select(opcoes[-1])
+
+def medir_interacoes(pasta, abas=tuple(ABAS), repeticoes=3, timeout=600):
+    """
+    Roda o dashboard com a pasta como diretório corrente. Retorna (tempos,
+    trechos): tempos é {"primeira_execucao": [s], "aba/interação": [s, ...]}
+    e trechos, para as mesmas chaves, o DataFrame de medicoes.percentis()
+    dos spans daquelas execuções. A primeira abertura de cada aba paga os
+    caches da versão, as seguintes não.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    caminho = os.path.join(PASTA_REFERENCIAS, "dashboard.py")
+    diretorio_anterior = os.getcwd()
+    ambiente_anterior = {nome: os.environ.get(nome) for nome in AMBIENTE}
+    os.environ.update(AMBIENTE)
+    logging.disable(logging.CRITICAL)
+    os.chdir(pasta)
+    try:
+        app = AppTest.from_file(caminho, default_timeout=timeout)
+        tempos, trechos = {}, {}
+
+        def interacao(nome, execucoes):
+            medicoes.limpar()
+            tempos[nome] = execucoes()
+            trechos[nome] = medicoes.percentis()
+
+        def primeira_execucao():
+            inicio = time.perf_counter()
+            app.run()
+            return [time.perf_counter() - inicio]
+
+        interacao("primeira_execucao", primeira_execucao)
+        for aba in abas:
+            interacao(f"{aba}/abrir aba", lambda: [medir(app, aba)])
+            interacao(f"{aba}/rerun", lambda: [medir(app, aba) for _ in range(repeticoes)])
+            for chave in ABAS[aba]:
+                interacao(f"{aba}/{chave}", lambda: [medir(app, aba, lambda: alternar(app, chave)) for _ in range(repeticoes)])
+        return tempos, trechos
+    finally:
+        medicoes.limpar()
+        os.chdir(diretorio_anterior)
+        for nome, valor in ambiente_anterior.items():
+            if valor is None:
+                os.environ.pop(nome, None)
+            else:
+                os.environ[nome] = valor
+        logging.disable(logging.NOTSET)
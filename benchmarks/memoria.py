@@ -0,0 +1,80 @@
+"""
+Pico de memória da ingestão de um CSV, medido num processo novo por
+execução (python -m benchmarks.memoria MODO CAMINHO imprime o resultado em
+JSON). Usado pelo comando memoria de python -m benchmarks.
+"""
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+from ingestao import executar_pipeline, ler_csv_em_chunks, BYTES_POR_BLOCO
+from benchmarks import originais
+
+# ===== MODOS =====
+#   fluxo   blocos de BYTES_POR_BLOCO lidos em chunks e processados à
+#           medida que chegam (caminho atual do download)
+#   copias  o arquivo inteiro em BytesIO, copiado para str e lido de um
+#           StringIO antes do processamento (caminho anterior)
+# O resultado (linhas enriquecidas) ocupa o mesmo nos dois modos; o que
+# sobra do pico além dele e do processo vazio é a sobrecarga da leitura.
+
+MODOS = ["fluxo", "copias"]
+
+
+def rss_mb():
+    """
+    RSS atual em MB (/proc no Linux; fora dele, o pico via getrusage)
+    """
+    try:
+        with open("/proc/self/status", "r") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return pico_rss_mb()
+
+def pico_rss_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == "darwin" else pico / 1024
+
+def ingerir(modo, caminho_csv):
+    if modo == "fluxo":
+        with open(caminho_csv, "rb") as f:
+            return executar_pipeline(ler_csv_em_chunks(iter(lambda: f.read(BYTES_POR_BLOCO), b"")))
+    return executar_pipeline([originais.ler_csv_copias(caminho_csv)])
+
+def medir_no_processo(modo, caminho_csv):
+    base = rss_mb()
+    inicio = time.perf_counter()
+    resultado = ingerir(modo, caminho_csv)
+    segundos = time.perf_counter() - inicio
+    resultado_mb = (resultado.linhas.memory_usage(deep=True).sum() + resultado.pedidos.memory_usage(deep=True).sum()) / 2**20
+    pico = pico_rss_mb()
+    return {
+        "modo": modo,
+        "segundos": round(segundos, 3),
+        "linhas": len(resultado.linhas),
+        "arquivo_mb": round(os.path.getsize(caminho_csv) / 2**20, 1),
+        "rss_base_mb": round(base, 1),
+        "pico_rss_mb": round(pico, 1),
+        "resultado_mb": round(resultado_mb, 1),
+        "sobrecarga_mb": round(pico - base - resultado_mb, 1),
+    }
+
+def medir(modo, caminho_csv):
+    """
+    Uma medição num processo novo (o pico de RSS não herda o do chamador
+    nem o de medições anteriores)
+    """
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    saida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.memoria", modo, os.path.abspath(caminho_csv)],
+        capture_output=True, text=True, check=True, cwd=raiz
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    print(json.dumps(medir_no_processo(sys.argv[1], sys.argv[2])))
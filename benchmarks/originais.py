@@ -0,0 +1,34 @@
+import io
+import unicodedata
+import pandas as pd
+
+# ===== IMPLEMENTAÇÕES ORIGINAIS =====
+# Cópias das versões do dashboard antes das otimizações, medidas ao lado
+# das atuais nos casos "..._original" (casos.py). Não são usadas pelo
+# dashboard.
+
+
+def normalize_text(text):
+    if pd.isna(text):
+        return ""
+    text = ''.join(c for c in unicodedata.normalize('NFD', str(text)) if unicodedata.category(c) != 'Mn')
+    return text.strip().upper()
+
+def valor_unitario(df):
+    return df.apply(
+        lambda row: row["Valor Total Z19-Z24"] / row["Quantidade"]
+        if pd.notna(row["Valor Total Z19-Z24"]) and pd.notna(row["Quantidade"]) and row["Quantidade"] > 0
+        else None,
+        axis=1
+    )
+
+def ler_csv_copias(caminho_csv, bytes_por_bloco=100 * 1024 * 1024):
+    """
+    Leitura do download antes do fluxo em chunks: os blocos acumulados num
+    BytesIO, copiados para str e lidos de um StringIO
+    """
+    file_content = io.BytesIO()
+    with open(caminho_csv, "rb") as f:
+        for bloco in iter(lambda: f.read(bytes_por_bloco), b""):
+            file_content.write(bloco)
+    return pd.read_csv(io.StringIO(file_content.getvalue().decode('utf-8')))
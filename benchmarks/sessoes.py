@@ -0,0 +1,88 @@
+"""
+Carga de memória de N sessões do dashboard sobre o mesmo dataset, medida
+num processo novo por execução (python -m benchmarks.sessoes MODO N
+CAMINHO imprime o resultado em JSON). Usado pelo comando sessoes de
+python -m benchmarks.
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import subprocess
+import pandas as pd
+from ingestao import executar_pipeline, ler_csv_em_chunks
+from periodos import ordenar_por_data, fatiar_periodo
+from cubos import construir_cubos
+from atualizacao import publicar_versao, versao_atual
+from benchmarks.memoria import rss_mb
+
+# ===== MODOS =====
+#   copia         comportamento antigo: cada sessão guarda o próprio
+#                 df.copy() (st.session_state.df_dados) e recebe mais uma
+#                 cópia desserializada do st.cache_data a cada rerun
+#   compartilhado cada sessão só referencia a versão publicada do processo
+
+MODOS = ["copia", "compartilhado"]
+
+
+def carregar_dataset(caminho_csv):
+    with open(caminho_csv, "rb") as f:
+        df = executar_pipeline(ler_csv_em_chunks(iter(lambda: f.read(1 << 20), b""))).linhas
+    df = ordenar_por_data(df)
+    return df, construir_cubos(df)
+
+def rerun(df):
+    """
+    Trabalho típico de um rerun: recorte do último período e um agregado
+    """
+    fim = df["Data"].iloc[-1]
+    periodo = fatiar_periodo(df, fim - pd.Timedelta(days=30), fim)
+    return periodo.groupby("Cliente", observed=True)["Valor Produto"].sum()
+
+def simular_no_processo(modo, n_sessoes, caminho_csv):
+    df, cubos = carregar_dataset(caminho_csv)
+    publicar_versao(df, cubos)
+    del df, cubos
+    base = rss_mb()
+
+    inicio = time.perf_counter()
+    sessoes = []
+    for _ in range(n_sessoes):
+        versao = versao_atual()
+        estado = {}
+        if modo == "copia":
+            # Retorno do st.cache_data (desserializado por sessão) + df_dados
+            retorno_cache = pickle.loads(pickle.dumps(versao["df"], protocol=pickle.HIGHEST_PROTOCOL))
+            estado["df_dados"] = retorno_cache.copy()
+            estado["retorno_cache"] = retorno_cache
+            rerun(estado["df_dados"])
+        else:
+            estado["versao"] = versao
+            rerun(versao["df"])
+        sessoes.append(estado)
+
+    rss = rss_mb()
+    return {
+        "modo": modo,
+        "sessoes": n_sessoes,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "rss_base_mb": round(base, 1),
+        "rss_mb": round(rss, 1),
+        "mb_por_sessao": round((rss - base) / max(n_sessoes, 1), 1),
+    }
+
+def simular(modo, n_sessoes, caminho_csv):
+    """
+    Uma simulação num processo novo (o RSS não herda o do chamador nem o de
+    simulações anteriores)
+    """
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    saida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.sessoes", modo, str(n_sessoes), os.path.abspath(caminho_csv)],
+        capture_output=True, text=True, check=True, cwd=raiz
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    print(json.dumps(simular_no_processo(sys.argv[1], int(sys.argv[2]), sys.argv[3])))
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime as dt
+
+# ===== CALENDÁRIO DA META =====
+# O período da meta vai do dia 26 de um mês ao dia 25 do mês seguinte e
+# recebe o nome do mês em que termina (meta de janeiro: 26/12 a 25/01).
+# Cada período é dividido em 4 semanas proporcionais ao número de dias.
+
+DIA_INICIO_PERIODO = 26
+SEMANAS_POR_PERIODO = 4
+COLUNAS_CALENDARIO = ["periodo_meta", "semana_periodo"]
+
+
+def limites_periodo_meta(periodo):
+    """
+    (inicio, fim) do período da meta: 26 do mês anterior às 00:00:00 até o
+    dia 25 do mês do período às 23:59:59. Aceita pd.Period ou 'AAAA-MM'.
+    """
+    periodo = pd.Period(periodo, freq="M")
+    anterior = periodo - 1
+    inicio = dt(anterior.year, anterior.month, DIA_INICIO_PERIODO)
+    fim = dt(periodo.year, periodo.month, DIA_INICIO_PERIODO - 1, 23, 59, 59)
+    return inicio, fim
+
+def _meses_periodo(datas):
+    """
+    Mês do período da meta (datetime64[M]) de cada data: a partir do dia 26
+    a data já pertence ao período do mês seguinte
+    """
+    dias = datas.astype("datetime64[D]")
+    meses = dias.astype("datetime64[M]")
+    dia_do_mes = (dias - meses.astype("datetime64[D]")).astype(np.int64) + 1
+    return meses + (dia_do_mes >= DIA_INICIO_PERIODO).astype(np.int64)
+
+def semanas_periodo(datas):
+    """
+    Semana (1..4) de cada data dentro do próprio período da meta, com a
+    mesma aritmética de get_week; NaT recebe 0
+    """
+    datas = np.asarray(datas, dtype="datetime64[ns]")
+    meses = _meses_periodo(datas)
+    inicio = (meses - 1).astype("datetime64[D]") + (DIA_INICIO_PERIODO - 1)
+    fim = meses.astype("datetime64[D]") + (DIA_INICIO_PERIODO - 1)
+
+    validas = ~np.isnat(datas)
+    total_dias = np.where(validas, (fim - inicio).astype(np.int64), 1)
+    dias_desde_inicio = np.where(validas, (datas.astype("datetime64[D]") - inicio).astype(np.int64), 0)
+    semanas = np.clip((dias_desde_inicio * SEMANAS_POR_PERIODO) // total_dias + 1, 1, SEMANAS_POR_PERIODO)
+    return np.where(validas, semanas, 0).astype(np.int8)
+
+def adicionar_calendario(df, coluna="Data"):
+    """
+    Acrescenta periodo_meta (Period mensal) e semana_periodo (1..4)
+    calculados de forma vetorizada sobre a coluna de datas
+    """
+    datas = df[coluna].to_numpy(dtype="datetime64[ns]")
+    meses = pd.Series(_meses_periodo(datas).astype("datetime64[s]"), index=df.index)
+    df["periodo_meta"] = meses.dt.to_period("M")
+    df["semana_periodo"] = semanas_periodo(datas)
+    return df
+
+def get_week(data, start_date, end_date):
+    """
+    Versão escalar original, mantida como referência para semanas_periodo
+    """
+    total_days = (end_date - start_date).days + 1
+    if total_days <= 0 or data < start_date or data > end_date:
+        return 0
+    days_since_start = (data - start_date).days
+    week = ((days_since_start * 4) // total_days) + 1 if days_since_start >= 0 else 0
+    return min(max(week, 1), 4)
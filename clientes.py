@@ -0,0 +1,119 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ===== ESTADO POR CLIENTE =====
+# Uma linha por cliente com o resumo de todo o histórico: pedidos, primeira
+# e última compra, valor acumulado e a linha do último pedido na tabela de
+# pedidos (cubos.CUBO_PEDIDOS). A tabela fica ordenada pela última compra,
+# então "quem não compra desde X" é um prefixo achado por busca binária,
+# como em periodos.py, sem varrer as linhas de pedido.
+
+COLUNA_ULTIMA_COMPRA = "Ultima Compra"
+COLUNA_LINHA_ULTIMO_PEDIDO = "Linha Ultimo Pedido"
+COLUNAS_CLIENTES = ["Cliente", "Pedidos", "Primeira Compra", COLUNA_ULTIMA_COMPRA, COLUNA_LINHA_ULTIMO_PEDIDO, "Valor Acumulado"]
+
+MINIMO_PEDIDOS_RECUPERAR = 3
+DIAS_SEM_COMPRAR_RECUPERAR = 90
+
+
+def _resumir(pedidos, linhas):
+    """
+    Estado dos clientes presentes em pedidos; linhas são as posições desses
+    pedidos na tabela completa. Como a tabela de pedidos está ordenada por
+    Data, a maior posição de cada cliente é o seu último pedido.
+    """
+    clientes = (
+        pedidos[["Cliente", "Data", "Valor Total Pedido"]]
+        .assign(**{COLUNA_LINHA_ULTIMO_PEDIDO: linhas})
+        .groupby("Cliente", observed=True, sort=False)
+        .agg(**{
+            "Pedidos": ("Data", "size"),
+            "Primeira Compra": ("Data", "min"),
+            COLUNA_ULTIMA_COMPRA: ("Data", "max"),
+            COLUNA_LINHA_ULTIMO_PEDIDO: (COLUNA_LINHA_ULTIMO_PEDIDO, "max"),
+            "Valor Acumulado": ("Valor Total Pedido", "sum"),
+        })
+        .reset_index()
+    )
+    return _ordenar(clientes)
+
+def _ordenar(clientes):
+    # A linha do último pedido é única por cliente e desempata a ordenação,
+    # de modo que montar do zero e atualizar dão a mesma tabela
+    ordem = np.lexsort((clientes[COLUNA_LINHA_ULTIMO_PEDIDO].to_numpy(), clientes[COLUNA_ULTIMA_COMPRA].to_numpy()))
+    return clientes.take(ordem).reset_index(drop=True)[COLUNAS_CLIENTES]
+
+def _a_partir_de(pedidos, dia):
+    i = np.searchsorted(pedidos["Data"].to_numpy(), np.datetime64(pd.Timestamp(dia)), side="left")
+    return pedidos.iloc[i:]
+
+def construir_clientes(pedidos):
+    """
+    Estado de todos os clientes a partir da tabela de pedidos (ordenada por Data)
+    """
+    return _resumir(pedidos, np.arange(len(pedidos)))
+
+def atualizar_clientes(clientes, pedidos_anteriores, pedidos, primeiro_dia):
+    """
+    Atualiza o estado quando os pedidos mudaram a partir de primeiro_dia.
+    Só os clientes com pedidos a partir desse dia, antes ou depois da
+    mudança, são recalculados; os demais têm o último pedido antes dele e,
+    como o trecho anterior da tabela de pedidos é mantido, a mesma linha.
+    """
+    tocados = pd.Index(_a_partir_de(pedidos_anteriores, primeiro_dia)["Cliente"].dropna().unique()).union(
+        pd.Index(_a_partir_de(pedidos, primeiro_dia)["Cliente"].dropna().unique())
+    )
+    if tocados.empty:
+        return clientes
+
+    mascara = pedidos["Cliente"].isin(tocados).to_numpy()
+    recalculados = _resumir(pedidos[mascara], np.flatnonzero(mascara))
+    mantidos = clientes[~clientes["Cliente"].isin(tocados).to_numpy()]
+    atualizado = pd.concat([mantidos, recalculados], ignore_index=True)
+    if isinstance(clientes["Cliente"].dtype, pd.CategoricalDtype) and not isinstance(atualizado["Cliente"].dtype, pd.CategoricalDtype):
+        atualizado["Cliente"] = atualizado["Cliente"].astype("category")
+    logger.info(f"👥 Estado de {len(recalculados)} clientes recalculado ({len(mantidos)} mantidos)")
+    return _ordenar(atualizado)
+
+
+# ===== CONSULTAS =====
+
+def meses_entre(inicio, fim):
+    """
+    Meses completos de cada data de inicio até fim (como no calendário:
+    de 15/01 a 14/03 são 1 mês, a 15/03 são 2)
+    """
+    inicio = pd.to_datetime(inicio)
+    fim = pd.Timestamp(fim)
+    meses = (fim.year - inicio.dt.year) * 12 + (fim.month - inicio.dt.month)
+    incompleto = (inicio.dt.day > fim.day) | ((inicio.dt.day == fim.day) & (inicio.dt.time > fim.time()))
+    return (meses - incompleto.astype(int)).astype(int)
+
+def clientes_sem_comprar(clientes, limite):
+    """
+    Clientes cuja última compra é anterior ou igual a limite, por busca
+    binária na tabela ordenada (visão, sem cópia)
+    """
+    j = np.searchsorted(clientes[COLUNA_ULTIMA_COMPRA].to_numpy(), np.datetime64(pd.Timestamp(limite)), side="right")
+    return clientes.iloc[:j]
+
+def lojistas_a_recuperar(clientes, pedidos, hoje, minimo_pedidos=MINIMO_PEDIDOS_RECUPERAR, dias=DIAS_SEM_COMPRAR_RECUPERAR):
+    """
+    Clientes com mais de minimo_pedidos pedidos e mais de `dias` dias
+    completos sem comprar, com os dados do último pedido (Data, Telefone,
+    Cidade, Estado...) e a coluna meses_sem_comprar
+    """
+    hoje = pd.Timestamp(hoje)
+    # (hoje - última).days > dias  <=>  última <= hoje - (dias + 1) dias
+    candidatos = clientes_sem_comprar(clientes, hoje - pd.Timedelta(days=dias + 1))
+    candidatos = candidatos[candidatos["Pedidos"] > minimo_pedidos]
+
+    lojistas = pedidos.take(candidatos[COLUNA_LINHA_ULTIMO_PEDIDO].to_numpy()).reset_index(drop=True)
+    posicao = lojistas.columns.get_loc("Cliente") + 1
+    lojistas.insert(posicao, "num_pedidos", candidatos["Pedidos"].to_numpy())
+    lojistas.insert(posicao + 1, "ultima_compra", candidatos[COLUNA_ULTIMA_COMPRA].to_numpy())
+    lojistas["meses_sem_comprar"] = meses_entre(lojistas["ultima_compra"], hoje)
+    return lojistas
@@ -0,0 +1,64 @@
+import logging
+import pandas as pd
+from periodos import fatiar_periodo
+from transformacoes import KIT_AR, KIT_ROSCA, PECAS_AVULSAS
+
+logger = logging.getLogger(__name__)
+
+# ===== COMISSÕES E BÔNUS DA META =====
+# Regras do cálculo de meta do vendedor: comissão por categoria sobre o
+# valor vendido no período, bônus a cada faixa vendida e prêmio quando a
+# meta mensal é atingida. Sem Streamlit, para o dashboard e os benchmarks.
+
+PERCENTUAL_KIT_AR = 0.007
+PERCENTUAL_PECAS_AVULSAS = 0.005
+VALOR_POR_BONUS = 200
+FAIXA_BONUS = 50000
+META_MENSAL = 200000
+PREMIO_META = 600
+
+
+def calcular_comissoes(df, inicio_meta, fim_meta):
+    """
+    Comissões, bônus e prêmio do período [inicio_meta, fim_meta] sobre um
+    frame ordenado por Data com Categoria e Valor Produto (as linhas ou o
+    cubo dia x produto). Retorna (resultados, valor_total_vendido, meta_atingida).
+    """
+    # Filtrar dados do período
+    df_periodo = fatiar_periodo(df, inicio_meta, fim_meta)
+
+    # Calcular totais pela mesma categoria dos gráficos (coluna da ingestão)
+    por_categoria = df_periodo.groupby('Categoria', observed=False)['Valor Produto'].sum()
+    valor_kit_ar = por_categoria[KIT_AR]
+    valor_pecas_avulsas = por_categoria[PECAS_AVULSAS] + por_categoria[KIT_ROSCA]
+    valor_total_vendido = valor_kit_ar + valor_pecas_avulsas
+
+    comissao_kit_ar = valor_kit_ar * PERCENTUAL_KIT_AR
+    comissao_pecas_avulsas = valor_pecas_avulsas * PERCENTUAL_PECAS_AVULSAS
+
+    quantidade_bonus = int(valor_total_vendido // FAIXA_BONUS)
+    bonus = quantidade_bonus * VALOR_POR_BONUS
+
+    meta_atingida = valor_total_vendido >= META_MENSAL
+    premio_meta = PREMIO_META if meta_atingida else 0
+
+    ganhos_totais = comissao_kit_ar + comissao_pecas_avulsas + bonus + premio_meta
+
+    resultados = pd.DataFrame({
+        "Descrição": [
+            "Comissão de KIT AR (0.7%)",
+            "Comissão de Peças Avulsas e Kit Rosca (0.5%)",
+            "Bônus (R$ 200,00 a cada 50 mil vendido)",
+            "Prêmio Meta Mensal (se atingida)",
+            "Ganhos Estimados"
+        ],
+        "Valor (R$)": [
+            comissao_kit_ar,
+            comissao_pecas_avulsas,
+            bonus,
+            premio_meta,
+            ganhos_totais
+        ]
+    })
+
+    return resultados, valor_total_vendido, meta_atingida
@@ -0,0 +1,227 @@
+import os
+import logging
+import duckdb
+import pandas as pd
+from calendario import get_week
+from cubos import CUBO_DIA_CATEGORIA, CUBO_DIA_PRODUTO, CUBO_DIA_CLIENTE_ESTADO, CUBO_MES_ESTADO, CUBO_PEDIDOS
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURAÇÃO =====
+TABELA_VENDAS = "vendas"
+TABELA_MAPA = "mapa"
+
+# Só as colunas usadas nas consultas são registradas: o DuckDB converte na
+# hora cada coluna de texto do pandas (ex.: Obs) a cada varredura, mesmo
+# sem usá-la. Período_Mês não tem tipo equivalente no DuckDB.
+COLUNAS_CONSULTA = ["Data", "semana_periodo", "Número do Pedido", "Cliente", "Estado", "Produto", "Quantidade", "Valor Total Pedido"]
+
+
+# ===== CONEXÃO E REGISTRO =====
+
+def conectar(df=None, pasta_snapshot=None, cubos=None):
+    """
+    Conexão DuckDB em memória com a tabela de vendas registrada. Com df, o
+    DataFrame é exposto sem cópia (o DuckDB lê as colunas do próprio pandas);
+    com pasta_snapshot, a visão aponta para os Parquet mensais do snapshot.
+    Os cubos de agregação (ver cubos.py), quando informados, são
+    registrados com os próprios nomes.
+    """
+    con = duckdb.connect(database=":memory:")
+    if df is not None:
+        registrar_dataframe(con, df)
+    elif pasta_snapshot is not None:
+        registrar_snapshot(con, pasta_snapshot)
+    for nome, cubo in (cubos or {}).items():
+        if not nome.startswith("_"):
+            registrar_dataframe(con, cubo, nome, colunas=None)
+    return con
+
+def criar_banco(cubos):
+    """
+    Banco DuckDB em memória com os cubos copiados para tabelas nativas, uma
+    vez por versão dos dados. Registrar os frames a cada rerun custa tanto
+    quanto as consultas (as colunas categóricas viram ENUM a cada registro);
+    com o banco pronto, cada rerun só abre um cursor (banco.cursor()), que
+    enxerga as tabelas e pode rodar em paralelo com os de outras sessões.
+    """
+    banco = duckdb.connect(database=":memory:")
+    for nome, cubo in cubos.items():
+        if nome.startswith("_"):
+            continue
+        registrar_dataframe(banco, cubo, "_origem", colunas=None)
+        banco.execute(f"CREATE TABLE {nome} AS SELECT * FROM _origem")
+        banco.unregister("_origem")
+    return banco
+
+def registrar_dataframe(con, df, nome=TABELA_VENDAS, colunas=COLUNAS_CONSULTA):
+    """
+    Categorias viram ENUM no DuckDB; as consultas fazem CAST para VARCHAR
+    quando precisam de funções de texto. Colunas Period ficam de fora (sem
+    tipo equivalente no DuckDB).
+    """
+    if colunas is None:
+        colunas = [c for c in df.columns if not isinstance(df[c].dtype, pd.PeriodDtype)]
+    df = df[[c for c in colunas if c in df.columns]]
+    con.register(nome, df)
+
+def registrar_snapshot(con, pasta, nome=TABELA_VENDAS):
+    padrao = os.path.join(pasta, "mes=*.parquet").replace("'", "''")
+    colunas = ", ".join(f'"{c}"' for c in COLUNAS_CONSULTA)
+    con.execute(f"CREATE OR REPLACE VIEW {nome} AS SELECT {colunas} FROM read_parquet('{padrao}')")
+
+
+# ===== CONSULTAS SQL =====
+# As somas de "Valor Produto" e "Quantidade" valem tanto sobre as linhas
+# de pedido (TABELA_VENDAS) quanto sobre os cubos, que têm as mesmas
+# colunas já somadas por dia. "Valor Total Pedido" é o total do pedido
+# repetido em cada linha: as somas desse valor por dia, semana, lojista e
+# período da meta partem da tabela de pedidos (CUBO_PEDIDOS, uma linha
+# por pedido), senão um pedido com n linhas contaria n vezes.
+
+
+def vendas_por_dia(con, inicio, fim, tabela=CUBO_PEDIDOS):
+    return con.execute(f"""
+        SELECT CAST("Data" AS DATE) AS "Data", SUM("Valor Total Pedido") AS "Valor Total Pedido"
+        FROM {tabela}
+        WHERE "Data" BETWEEN ? AND ?
+        GROUP BY 1
+        ORDER BY 1
+    """, [inicio, fim]).df()
+
+def vendas_por_semana(con, inicio, fim, tabela=CUBO_PEDIDOS):
+    """
+    Soma por semana_periodo (calculada na ingestão, ver calendario.py); a
+    janela [inicio, fim] deve ser um período da meta (limites_periodo_meta)
+    """
+    semanas = pd.DataFrame({"Semana": range(1, 5)})
+    vendas = con.execute(f"""
+        SELECT CAST("semana_periodo" AS INTEGER) AS "Semana", SUM("Valor Total Pedido") AS "Valor Total Pedido"
+        FROM {tabela}
+        WHERE "Data" BETWEEN ? AND ?
+        GROUP BY 1
+    """, [inicio, fim]).df()
+
+    semanas = semanas.merge(vendas, on="Semana", how="left")
+    semanas["Valor Total Pedido"] = semanas["Valor Total Pedido"].fillna(0)
+    return semanas
+
+def vendas_por_categoria(con, inicio, fim, tabela=CUBO_DIA_CATEGORIA):
+    """
+    Um pedido pode ter produtos de várias categorias: cada categoria soma o
+    valor das suas linhas (Valor Produto), devolvido na coluna "Valor
+    Total Pedido" usada pelo gráfico
+    """
+    return con.execute(f"""
+        SELECT CAST("Categoria" AS VARCHAR) AS "Categoria", SUM("Valor Produto") AS "Valor Total Pedido"
+        FROM {tabela}
+        WHERE "Data" BETWEEN ? AND ?
+        GROUP BY 1
+        ORDER BY 1
+    """, [inicio, fim]).df()
+
+def top_produtos(con, inicio, fim, n=10, tabela=CUBO_DIA_PRODUTO):
+    return con.execute(f"""
+        SELECT upper(trim(CAST("Produto" AS VARCHAR))) AS "Produto", SUM("Quantidade") AS "Quantidade"
+        FROM {tabela}
+        WHERE "Data" BETWEEN ? AND ? AND "Quantidade" > 0
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+        LIMIT ?
+    """, [inicio, fim, n]).df()
+
+def top_lojistas(con, estado=None, n=10, tabela=CUBO_PEDIDOS):
+    filtro = "" if estado is None else 'WHERE CAST("Estado" AS VARCHAR) = ?'
+    parametros = ([] if estado is None else [estado]) + [n]
+    return con.execute(f"""
+        SELECT CAST("Cliente" AS VARCHAR) AS "Cliente", CAST("Estado" AS VARCHAR) AS "Estado",
+               SUM("Valor Total Pedido") AS "Valor Total Pedido"
+        FROM {tabela}
+        {filtro}
+        GROUP BY 1, 2
+        ORDER BY 3 DESC, 1, 2
+        LIMIT ?
+    """, parametros).df()
+
+def contagem_clientes(con, coluna, tabela=TABELA_MAPA):
+    """
+    Número de clientes por valor de coluna (Regiao, Estado_Corrigido) na
+    tabela do mapa, que já tem uma linha por cliente
+    """
+    return con.execute(f"""
+        SELECT CAST("{coluna}" AS VARCHAR) AS valor, COUNT(*) AS total
+        FROM {tabela}
+        WHERE "{coluna}" IS NOT NULL
+        GROUP BY 1
+        ORDER BY 2 DESC, 1
+    """).df()
+
+def totais_meta(con, inicio, fim, tabela=CUBO_DIA_CLIENTE_ESTADO, tabela_pedidos=CUBO_PEDIDOS):
+    """
+    Linhas e pedidos distintos do período, a partir das contagens "Linhas"
+    e "Pedidos" do cubo dia x cliente x estado, e o valor vendido, somando
+    o total de cada pedido uma vez
+    """
+    total_pedidos, pedidos_unicos, valor_total_vendido = con.execute(f"""
+        SELECT
+            (SELECT COALESCE(SUM("Linhas"), 0) FROM {tabela} WHERE "Data" BETWEEN $1 AND $2),
+            (SELECT COALESCE(SUM("Pedidos"), 0) FROM {tabela} WHERE "Data" BETWEEN $1 AND $2),
+            (SELECT COALESCE(SUM("Valor Total Pedido"), 0) FROM {tabela_pedidos} WHERE "Data" BETWEEN $1 AND $2)
+    """, [inicio, fim]).fetchone()
+    return {
+        "total_pedidos": int(total_pedidos),
+        "pedidos_unicos": int(pedidos_unicos),
+        "valor_total_vendido": float(valor_total_vendido),
+    }
+
+
+# ===== REFERÊNCIA EM PANDAS =====
+# Implementações originais do dashboard, mantidas para conferir os
+# resultados das consultas SQL. As somas de "Valor Total Pedido" usam uma
+# linha por pedido (_pedidos) e a de categoria usa "Valor Produto"; o
+# original somava o total do pedido em cada uma das suas linhas.
+
+def _periodo(df, inicio, fim):
+    return df[(df["Data"] >= inicio) & (df["Data"] <= fim)]
+
+def _pedidos(df):
+    return df.drop_duplicates(subset=["Número do Pedido"])
+
+def vendas_por_dia_pandas(df, inicio, fim):
+    df_periodo = _pedidos(_periodo(df, inicio, fim))
+    return df_periodo.groupby(df_periodo["Data"].dt.date)["Valor Total Pedido"].sum().reset_index()
+
+def vendas_por_semana_pandas(df, inicio, fim):
+    df_periodo = _pedidos(_periodo(df, inicio, fim)).copy()
+    df_periodo["Semana"] = df_periodo["Data"].apply(lambda x: get_week(x, start_date=inicio, end_date=fim))
+    return df_periodo.groupby("Semana")["Valor Total Pedido"].sum().reindex(range(1, 5), fill_value=0).reset_index()
+
+def vendas_por_categoria_pandas(df, inicio, fim):
+    df_periodo = _periodo(df, inicio, fim)
+    return df_periodo.groupby("Categoria", observed=True)["Valor Produto"].sum().rename("Valor Total Pedido").reset_index()
+
+def top_produtos_pandas(df, inicio, fim, n=10):
+    df_periodo = _periodo(df, inicio, fim)
+    df_periodo = df_periodo[df_periodo["Quantidade"] > 0].copy()
+    df_periodo["Produto"] = df_periodo["Produto"].astype(str).str.strip().str.upper()
+    top = df_periodo.groupby("Produto")["Quantidade"].sum().reset_index()
+    return top.sort_values(by="Quantidade", ascending=False).head(n)
+
+def top_lojistas_pandas(df, estado=None, n=10):
+    df_lojistas = _pedidos(df).groupby(["Cliente", "Estado"], observed=True)["Valor Total Pedido"].sum().reset_index()
+    if estado is not None:
+        df_lojistas = df_lojistas[df_lojistas["Estado"] == estado]
+    return df_lojistas.sort_values(by="Valor Total Pedido", ascending=False).head(n)
+
+def contagem_clientes_pandas(df_mapa, coluna):
+    contagem = df_mapa[coluna].value_counts().reset_index()
+    contagem.columns = ["valor", "total"]
+    return contagem
+
+def totais_meta_pandas(df, inicio, fim):
+    df_meta = _periodo(df, inicio, fim)
+    return {
+        "total_pedidos": len(df_meta),
+        "pedidos_unicos": df_meta["Número do Pedido"].nunique(),
+        "valor_total_vendido": _pedidos(df_meta)["Valor Total Pedido"].sum(),
+    }
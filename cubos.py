@@ -0,0 +1,154 @@
+import logging
+import time
+import pandas as pd
+from periodos import fatiar_periodo
+from ingestao import separar_pedidos
+from clientes import construir_clientes, atualizar_clientes
+
+logger = logging.getLogger(__name__)
+
+# ===== CUBOS DE AGREGAÇÃO =====
+# Os gráficos só precisam de somas por dia, produto, categoria, cliente e
+# estado. Os cubos são montados uma vez por carga a partir das linhas de
+# pedido e as abas consultam essas tabelas pequenas. Cada cubo tem a coluna
+# "Data" (o dia, à meia-noite) e fica ordenado por ela, de modo que
+# fatiar_periodo e as consultas SQL funcionam sobre ele como sobre o frame
+# original.
+
+CUBO_DIA_CATEGORIA = "cubo_dia_categoria"
+CUBO_DIA_PRODUTO = "cubo_dia_produto"
+CUBO_DIA_CLIENTE_ESTADO = "cubo_dia_cliente_estado"
+CUBO_MES_ESTADO = "cubo_mes_estado"
+CUBO_PEDIDOS = "cubo_pedidos"
+CUBO_CLIENTES = "cubo_clientes"
+CUBOS = [CUBO_DIA_CATEGORIA, CUBO_DIA_PRODUTO, CUBO_DIA_CLIENTE_ESTADO, CUBO_MES_ESTADO, CUBO_PEDIDOS, CUBO_CLIENTES]
+
+COLUNAS_ASSINATURA = ["Data", "Número do Pedido", "Cliente", "Estado", "Produto", "Quantidade", "Valor Produto", "Valor Total Pedido"]
+
+
+def _somas(df, chaves, medidas):
+    return df.groupby(chaves, observed=True, sort=True)[medidas].sum().reset_index()
+
+def _montar(df):
+    """
+    Agregações de um trecho do frame (linhas de pedido)
+    """
+    dia = df["Data"].dt.floor("D")
+
+    cubos = {
+        # semana_periodo é função do dia e Categoria (da ingestão) é função
+        # do produto; entram na chave sem criar células novas
+        CUBO_DIA_CATEGORIA: _somas(
+            df.assign(Data=dia),
+            ["Data", "semana_periodo", "Categoria"], ["Valor Total Pedido", "Valor Produto", "Quantidade"]
+        ),
+        CUBO_DIA_PRODUTO: _somas(
+            df.assign(Data=dia),
+            ["Data", "Produto", "Categoria"], ["Valor Total Pedido", "Valor Produto", "Quantidade"]
+        ),
+    }
+
+    # Linhas e pedidos distintos por célula; como cada pedido tem um único
+    # dia, cliente e estado, a soma de "Pedidos" num período é o número de
+    # pedidos distintos do período
+    cubos[CUBO_DIA_CLIENTE_ESTADO] = (
+        df.assign(Data=dia)
+        .groupby(["Data", "Cliente", "Estado"], observed=True, sort=True)
+        .agg(**{
+            "Valor Total Pedido": ("Valor Total Pedido", "sum"),
+            "Quantidade": ("Quantidade", "sum"),
+            "Linhas": ("Número do Pedido", "size"),
+            "Pedidos": ("Número do Pedido", "nunique"),
+        })
+        .reset_index()
+    )
+
+    cubos[CUBO_MES_ESTADO] = (
+        df.assign(Data=df["Data"].dt.to_period("M").dt.to_timestamp())
+        .groupby(["Data", "Estado"], observed=True, sort=True)
+        .agg(**{
+            "Valor Total Pedido": ("Valor Total Pedido", "sum"),
+            "Quantidade": ("Quantidade", "sum"),
+            "Clientes": ("Cliente", "nunique"),
+        })
+        .reset_index()
+    )
+
+    # Tabela de pedidos (uma linha por pedido), ligada às linhas pelo
+    # número do pedido
+    cubos[CUBO_PEDIDOS] = separar_pedidos(df)
+    return cubos
+
+def assinatura_por_dia(df):
+    """
+    Hash do conteúdo de cada dia (soma dos hashes das linhas), usado para
+    descobrir quais dias mudaram entre duas cargas
+    """
+    colunas = [c for c in COLUNAS_ASSINATURA if c in df.columns]
+    hashes = pd.util.hash_pandas_object(df[colunas], index=False)
+    return hashes.groupby(df["Data"].dt.floor("D").to_numpy(), sort=True).sum()
+
+def construir_cubos(df):
+    """
+    Monta todos os cubos a partir do frame ordenado por Data. Retorna um
+    dicionário {nome: DataFrame} com a assinatura por dia em "_assinatura".
+    """
+    inicio = time.perf_counter()
+    cubos = _montar(df)
+    # Estado por cliente (clientes.py): depende do histórico inteiro, por
+    # isso não sai de _montar, que também agrega trechos do frame
+    cubos[CUBO_CLIENTES] = construir_clientes(cubos[CUBO_PEDIDOS])
+    cubos["_assinatura"] = assinatura_por_dia(df)
+    logger.info(
+        f"🧊 Cubos montados em {time.perf_counter() - inicio:.2f}s: "
+        + ", ".join(f"{nome}={len(cubo)}" for nome, cubo in cubos.items() if not nome.startswith("_"))
+    )
+    return cubos
+
+def atualizar_cubos(cubos, df):
+    """
+    Atualiza cubos de uma carga anterior para o frame atual. Só os dias a
+    partir do primeiro dia alterado são reagregados (os meses a partir do
+    mês desse dia, por causa dos distintos mensais); sem alteração, os
+    cubos anteriores são devolvidos como estão.
+    """
+    if df.empty:
+        return {}
+    if not cubos or set(CUBOS) != {nome for nome in cubos if not nome.startswith("_")}:
+        return construir_cubos(df)
+
+    assinatura = assinatura_por_dia(df)
+    anterior = cubos["_assinatura"]
+    dias = assinatura.index.union(anterior.index)
+    alterados = assinatura.reindex(dias).ne(anterior.reindex(dias))
+    if not alterados.any():
+        return cubos
+
+    primeiro_dia = alterados[alterados].index.min()
+    primeiro_mes = primeiro_dia.to_period("M").to_timestamp()
+    if primeiro_mes <= dias.min():
+        return construir_cubos(df)
+
+    inicio = time.perf_counter()
+    novos = _montar(fatiar_periodo(df, primeiro_mes, df["Data"].iloc[-1]))
+    atualizados = {"_assinatura": assinatura}
+    for nome, cubo in cubos.items():
+        if nome.startswith("_") or nome == CUBO_CLIENTES:
+            continue
+        limite = primeiro_mes if nome == CUBO_MES_ESTADO else primeiro_dia
+        recente = novos[nome][novos[nome]["Data"] >= limite]
+        atualizado = pd.concat([cubo[cubo["Data"] < limite], recente], ignore_index=True)
+        # Categorias diferentes entre as duas cargas viram texto no concat
+        for coluna in cubo.columns:
+            if isinstance(cubo[coluna].dtype, pd.CategoricalDtype) and not isinstance(atualizado[coluna].dtype, pd.CategoricalDtype):
+                atualizado[coluna] = atualizado[coluna].astype("category")
+        atualizados[nome] = atualizado
+    atualizados[CUBO_CLIENTES] = atualizar_clientes(
+        cubos[CUBO_CLIENTES], cubos[CUBO_PEDIDOS], atualizados[CUBO_PEDIDOS], primeiro_dia
+    )
+
+    logger.info(
+        f"🧊 Cubos atualizados a partir de {primeiro_dia:%d/%m/%Y} "
+        f"em {time.perf_counter() - inicio:.2f}s"
+    )
+    return atualizados
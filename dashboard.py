@@ -2,23 +2,61 @@ import os
 import pandas as pd
 import streamlit as st
 import calendar
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
-from fuzzywuzzy import process, fuzz
-import unicodedata
 import numpy as np
 import sys
 from datetime import datetime as dt
-from workalendar.america import Brazil
 import logging
 import io
-import requests
+import itertools
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
+from geocodificacao import (
+    ler_referencias,
+    geocodificar_dataframe,
+    montar_pontos_mapa,
+    formatar_coordenadas,
+)
+from transformacoes import CATEGORIAS
+from armazenamento import (
+    salvar_snapshot,
+    ler_snapshot,
+    snapshot_recente,
+    idade_snapshot,
+    marcar_snapshot_verificado,
+    salvar_dataset_final,
+    abrir_dataset_final,
+)
+from sincronizacao import (
+    ler_estado_sincronizacao,
+    salvar_estado_sincronizacao,
+    abrir_se_alterado,
+    blocos_com_md5,
+    metadados_drive,
+    iterar_download_drive,
+    drive_inalterado,
+)
+from ingestao import (
+    executar_pipeline,
+    executar_pipeline_em_paralelo,
+    ler_csv_em_chunks,
+    BYTES_POR_BLOCO,
+    LINHAS_POR_PARTICAO,
+    COLUNAS_PEDIDO,
+)
+import consultas
+from periodos import ordenar_por_data, fatiar_periodo
+from calendario import limites_periodo_meta, COLUNAS_CALENDARIO
+from dias_uteis import garantir_anos, dias_uteis_entre
+from cubos import atualizar_cubos, CUBO_DIA_PRODUTO, CUBO_MES_ESTADO, CUBO_PEDIDOS, CUBO_CLIENTES
+from clientes import lojistas_a_recuperar
+from comissoes import calcular_comissoes
+from atualizacao import obter_versao, versao_atual, iniciar_agendador, atualizar_agora
+from medicoes import medir, medido, registrar_tempos, configurar_saida, iniciar_execucao, percentis
 
 # Configuração de logging detalhada
 logging.basicConfig(
@@ -51,28 +89,81 @@ PASTA_ID = "1FfiukpgvZL92AnRcj1LxE6QW195JLSMY"
 NOME_PARQUET = "dados_extraidos.parquet"
 NOME_CSV = "dados_extraidos.csv"
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+PASTA_CACHE = "cache"
+CAMINHO_CACHE_GEOCODIFICACAO = os.path.join(PASTA_CACHE, "geocodificacao.json")
+PASTA_SNAPSHOT = os.path.join(PASTA_CACHE, NOME_PARQUET)
+CAMINHO_ESTADO_SINCRONIZACAO = os.path.join(PASTA_CACHE, "sincronizacao.json")
+TTL_DADOS = 3600
+# Intervalo da atualização em segundo plano (segundos)
+INTERVALO_ATUALIZACAO = int(os.environ.get("INTERVALO_ATUALIZACAO", TTL_DADOS))
+# ATUALIZACAO_EM_SEGUNDO_PLANO=0 desliga o agendador (sem consultas à origem
+# depois da primeira carga; usado pelos benchmarks)
+ATUALIZACAO_EM_SEGUNDO_PLANO = os.environ.get("ATUALIZACAO_EM_SEGUNDO_PLANO", "1") != "0"
+# Colunas lidas do snapshot local (projeção); demais colunas da exportação são ignoradas
+COLUNAS_DASHBOARD = [
+    "Data", "Número do Pedido", "Cliente", "Telefone", "Cidade", "Estado", "Produto",
+    "Quantidade", "Valor Total Z19-Z24", "Valor Unitário", "Valor Produto", "Valor Total Pedido",
+    "Quantidade Pedido"
+]
+# Derivadas da data e do produto, recalculadas na leitura do snapshot
+COLUNAS_DERIVADAS = ["Período_Mês", *COLUNAS_CALENDARIO, "Categoria"]
+# Tempos dos trechos medidos (medicoes.py), um JSON por linha
+CAMINHO_MEDICOES = os.environ.get("ARQUIVO_MEDICOES", os.path.join(PASTA_CACHE, "medicoes.jsonl"))
 
 logger.info(f"Configuração inicial - Pasta ID: {PASTA_ID}, Arquivo Parquet: {NOME_PARQUET}, CSV: {NOME_CSV}")
 
+# Cada rerun é uma execução: os spans medidos nela alimentam o painel de perfil
+configurar_saida(CAMINHO_MEDICOES)
+execucao = iniciar_execucao()
+
 
-@st.cache_data(ttl=3600, show_spinner="Carregando dados...")
-def carregar_dados_google_drive():
+def notificar_streamlit(nivel, mensagem):
+    getattr(st, nivel)(mensagem)
+
+def notificar_log(nivel, mensagem):
+    """
+    Mensagens da atualização em segundo plano, que não tem página para exibir
     """
-    Função final corrigida para carregar dados do Google Drive
+    if nivel in ("warning", "error"):
+        logger.warning(mensagem)
+    else:
+        logger.info(mensagem)
+
+@medido("download")
+def baixar_dados_origem(usar_snapshot=True, notificar=notificar_streamlit, ler_snapshot_local=True):
+    """
+    Baixa e processa os dados da origem (ou reaproveita o snapshot). Não
+    depende de uma sessão do Streamlit: as mensagens passam por notificar,
+    o que permite rodar no worker de atualização em segundo plano.
+    Com ler_snapshot_local=False, os caminhos que só releriam o snapshot
+    local (origem inalterada ou indisponível) devolvem None sem ler nada:
+    quem já tem a versão publicada não tem o que atualizar.
     """
     try:
-        st.info("🔄 Tentando carregar dados do Google Drive...")
+        if usar_snapshot and snapshot_recente(PASTA_SNAPSHOT, idade_maxima=TTL_DADOS):
+            df = ler_snapshot(PASTA_SNAPSHOT, colunas=COLUNAS_DASHBOARD)
+            if not df.empty:
+                notificar("success", "✅ Dados carregados do snapshot local")
+                return df
+        
+        notificar("info", "🔄 Tentando carregar dados do Google Drive...")
+        
+        # Metadados da última versão processada; só valem se o snapshot existir
+        estado_sync = ler_estado_sincronizacao(CAMINHO_ESTADO_SINCRONIZACAO) if idade_snapshot(PASTA_SNAPSHOT) is not None else {}
         
         # Método 1: Download direto com URL padrão
         try:
             csv_url = f'https://drive.google.com/uc?export=download&id={PASTA_ID}'
-            response = requests.get(csv_url, timeout=30)
+            response, metadados = abrir_se_alterado(csv_url, estado_sync.get("download_direto"), timeout=30)
             
-            if response.status_code == 200:
-                df = pd.read_csv(io.StringIO(response.text))
-                if not df.empty:
-                    st.success("✅ Dados CSV carregados com sucesso!")
-                    return processar_dados(df)
+            if response is None:
+                return usar_snapshot_inalterado(notificar, ler_snapshot_local)
+            with response:
+                blocos = blocos_com_md5(response.iter_content(BYTES_POR_BLOCO), metadados)
+                df = processar_e_salvar_snapshot(ler_csv_em_chunks(blocos), "download_direto", metadados, notificar)
+            if not df.empty:
+                notificar("success", "✅ Dados CSV carregados com sucesso!")
+                return df
         except Exception as e:
             logger.warning(f"Download direto falhou: {e}")
         
@@ -96,29 +187,30 @@ def carregar_dados_google_drive():
                     credentials_info, scopes=SCOPES
                 )
                 
-                # Baixar arquivo
+                # Consultar metadados antes de baixar
                 service = build('drive', 'v3', credentials=creds)
-                request = service.files().get_media(fileId=PASTA_ID)
-                file_content = io.BytesIO()
-                downloader = MediaIoBaseDownload(file_content, request)
-                done = False
+                metadados = metadados_drive(service, PASTA_ID)
+                if drive_inalterado(metadados, estado_sync.get("service_account")):
+                    return usar_snapshot_inalterado(notificar, ler_snapshot_local)
                 
-                while done is False:
-                    status, done = downloader.next_chunk()
+                # Baixar arquivo em blocos; Parquet precisa do arquivo inteiro (rodapé),
+                # CSV é processado à medida que os blocos chegam
+                blocos = iterar_download_drive(service, PASTA_ID, BYTES_POR_BLOCO)
+                primeiro_bloco = next(blocos, b"")
                 
-                # Tentar como CSV primeiro
-                try:
-                    df = pd.read_csv(io.StringIO(file_content.getvalue().decode('utf-8')))
-                    st.success("✅ Dados CSV carregados via Service Account!")
-                    return processar_dados(df)
-                except:
-                    # Tentar como Parquet
-                    try:
-                        df = pd.read_parquet(file_content)
-                        st.success("✅ Dados Parquet carregados via Service Account!")
-                        return processar_dados(df)
-                    except:
-                        pass
+                if primeiro_bloco.startswith(b"PAR1"):
+                    df = pd.read_parquet(io.BytesIO(primeiro_bloco + b"".join(blocos)))
+                    df = processar_e_salvar_snapshot(df, "service_account", metadados, notificar)
+                    if not df.empty:
+                        notificar("success", "✅ Dados Parquet carregados via Service Account!")
+                        return df
+                else:
+                    df = processar_e_salvar_snapshot(
+                        ler_csv_em_chunks(itertools.chain([primeiro_bloco], blocos)), "service_account", metadados, notificar
+                    )
+                    if not df.empty:
+                        notificar("success", "✅ Dados CSV carregados via Service Account!")
+                        return df
                         
             except Exception as e:
                 logger.warning(f"Service account falhou: {e}")
@@ -126,213 +218,105 @@ def carregar_dados_google_drive():
         # Método 3: Download alternativo
         try:
             alt_url = f'https://docs.google.com/uc?export=download&id={PASTA_ID}'
-            response = requests.get(alt_url, timeout=30)
+            response, metadados = abrir_se_alterado(alt_url, estado_sync.get("url_alternativa"), timeout=30)
             
-            if response.status_code == 200:
-                df = pd.read_csv(io.StringIO(response.text))
-                if not df.empty:
-                    st.success("✅ Dados CSV carregados via URL alternativa!")
-                    return processar_dados(df)
+            if response is None:
+                return usar_snapshot_inalterado(notificar, ler_snapshot_local)
+            with response:
+                blocos = blocos_com_md5(response.iter_content(BYTES_POR_BLOCO), metadados)
+                df = processar_e_salvar_snapshot(ler_csv_em_chunks(blocos), "url_alternativa", metadados, notificar)
+            if not df.empty:
+                notificar("success", "✅ Dados CSV carregados via URL alternativa!")
+                return df
         except Exception as e:
             logger.warning(f"URL alternativa falhou: {e}")
         
-        # Se tudo falhar
-        st.error("❌ Nenhuma das tentativas de download funcionou")
-        st.info("Soluções:")
-        st.markdown("- Verifique se o arquivo está compartilhado com 'Qualquer pessoa com o link'")
-        st.markdown("- Confirme o ID do arquivo no Google Drive")
-        st.markdown("- Verifique se o arquivo não está corrompido")
+        # Se tudo falhar, usar o último snapshot local mesmo que antigo
+        if not ler_snapshot_local:
+            notificar("warning", "⚠️ Google Drive indisponível. Versão atual mantida.")
+            return None
+        df = ler_snapshot(PASTA_SNAPSHOT, colunas=COLUNAS_DASHBOARD)
+        if not df.empty:
+            notificar("warning", "⚠️ Google Drive indisponível. Usando o último snapshot local.")
+            return df
+        
+        notificar("error", "❌ Nenhuma das tentativas de download funcionou")
+        notificar("info", "Soluções:")
+        notificar("markdown", "- Verifique se o arquivo está compartilhado com 'Qualquer pessoa com o link'")
+        notificar("markdown", "- Confirme o ID do arquivo no Google Drive")
+        notificar("markdown", "- Verifique se o arquivo não está corrompido")
         
         return pd.DataFrame()
         
     except Exception as e:
         logger.error(f"Erro crítico no carregamento: {e}")
-        st.error(f"Erro crítico: {e}")
+        notificar("error", f"Erro crítico: {e}")
         return pd.DataFrame()
+
+def usar_snapshot_inalterado(notificar=notificar_streamlit, ler_snapshot_local=True):
+    """
+    A origem não mudou desde a última sincronização: reaproveita o snapshot
+    local sem baixar nem reprocessar. Com ler_snapshot_local=False, só
+    registra a verificação e devolve None (nada mudou).
+    """
+    marcar_snapshot_verificado(PASTA_SNAPSHOT)
+    if not ler_snapshot_local:
+        notificar("success", "✅ Arquivo sem alterações no Google Drive. Versão atual mantida")
+        return None
+    notificar("success", "✅ Arquivo sem alterações no Google Drive. Usando snapshot local")
+    return ler_snapshot(PASTA_SNAPSHOT, colunas=COLUNAS_DASHBOARD)
+
+def processar_e_salvar_snapshot(chunks, fonte=None, metadados=None, notificar=notificar_streamlit):
+    """
+    Processa os dados baixados (DataFrame ou iterável de DataFrames), atualiza o snapshot
+    Parquet local e registra os metadados da versão processada para a
+    próxima sincronização
+    """
+    df_processado = processar_dados_em_chunks(chunks, notificar)
+    if not df_processado.empty:
+        salvar_snapshot(df_processado, PASTA_SNAPSHOT)
+        if fonte and metadados:
+            salvar_estado_sincronizacao(fonte, metadados, CAMINHO_ESTADO_SINCRONIZACAO)
+    return df_processado
+
 def processar_dados(df):
     """
     Processa os dados carregados de forma otimizada
     """
     if df.empty:
         return pd.DataFrame()
-    
-    # Mapeamento robusto de colunas
-    mapeamento_colunas = {
-        'data': ['data', 'Data', 'DATA', 'date', 'Date', 'DATE'],
-        'valor_total': ['valor_total', 'Valor Total Z19-Z24', 'valor_total', 'Valor Total', 'valor', 'Valor'],
-        'quantidade': ['quantidade', 'Quantidade', 'QUANTIDADE', 'qtd', 'QTD'],
-        'numero_pedido': ['numero_pedido', 'Número do Pedido', 'pedido', 'Pedido', 'NUMERO_PEDIDO'],
-        'cliente': ['cliente', 'Cliente', 'CLIENTE', 'customer', 'Customer'],
-        'produto': ['produto', 'Produto', 'PRODUTO', 'item', 'Item'],
-        'cidade': ['cidade', 'Cidade', 'CIDADE'],
-        'estado': ['estado', 'Estado', 'ESTADO'],
-        'telefone': ['telefone', 'Telefone', 'TELEFONE'],
-        'valor_unitario': ['valor_unitario', 'Valor Unitário', 'VALOR_UNITARIO', 'unitario', 'Unitário'],
-        'valor_produto': ['valor_produto', 'Valor Produto', 'VALOR_PRODUTO', 'produto_value', 'Produto Value']
-    }
-    
-    def encontrar_coluna(df, nomes_esperados):
-        for nome in nomes_esperados:
-            if nome in df.columns:
-                return nome
-        return None
-    
-    # Encontrar colunas correspondentes
-    col_data = encontrar_coluna(df, mapeamento_colunas['data'])
-    col_valor = encontrar_coluna(df, mapeamento_colunas['valor_total'])
-    col_quantidade = encontrar_coluna(df, mapeamento_colunas['quantidade'])
-    col_pedido = encontrar_coluna(df, mapeamento_colunas['numero_pedido'])
-    col_cliente = encontrar_coluna(df, mapeamento_colunas['cliente'])
-    col_produto = encontrar_coluna(df, mapeamento_colunas['produto'])
-    col_cidade = encontrar_coluna(df, mapeamento_colunas['cidade'])
-    col_estado = encontrar_coluna(df, mapeamento_colunas['estado'])
-    col_telefone = encontrar_coluna(df, mapeamento_colunas['telefone'])
-    col_unitario = encontrar_coluna(df, mapeamento_colunas['valor_unitario'])
-    col_produto_value = encontrar_coluna(df, mapeamento_colunas['valor_produto'])
-    
-    # Renomear colunas
-    df_renomeado = df.copy()
-    renomeacoes = {}
-    
-    if col_data and col_data != 'Data':
-        renomeacoes[col_data] = 'Data'
-    if col_valor and col_valor != 'Valor Total Z19-Z24':
-        renomeacoes[col_valor] = 'Valor Total Z19-Z24'
-    if col_quantidade and col_quantidade != 'Quantidade':
-        renomeacoes[col_quantidade] = 'Quantidade'
-    if col_pedido and col_pedido != 'Número do Pedido':
-        renomeacoes[col_pedido] = 'Número do Pedido'
-    if col_cliente and col_cliente != 'Cliente':
-        renomeacoes[col_cliente] = 'Cliente'
-    if col_produto and col_produto != 'Produto':
-        renomeacoes[col_produto] = 'Produto'
-    if col_cidade and col_cidade != 'Cidade':
-        renomeacoes[col_cidade] = 'Cidade'
-    if col_estado and col_estado != 'Estado':
-        renomeacoes[col_estado] = 'Estado'
-    if col_telefone and col_telefone != 'Telefone':
-        renomeacoes[col_telefone] = 'Telefone'
-    if col_unitario and col_unitario != 'Valor Unitário':
-        renomeacoes[col_unitario] = 'Valor Unitário'
-    if col_produto_value and col_produto_value != 'Valor Produto':
-        renomeacoes[col_produto_value] = 'Valor Produto'
-    
-    if renomeacoes:
-        df_renomeado = df_renomeado.rename(columns=renomeacoes)
-        st.info(f"🔄 Colunas renomeadas: {list(renomeacoes.values())}")
-    
-    df = df_renomeado
-    
-    # Processar dados
+    return processar_dados_em_chunks(df)
+
+@medido("processar_dados")
+def processar_dados_em_chunks(chunks, notificar=notificar_streamlit):
+    """
+    Passa os dados uma única vez pelo pipeline de ingestão (ver
+    ingestao.ETAPAS). Um iterável de chunks é processado à medida que os
+    chunks chegam; um DataFrame inteiro vai para o processamento paralelo.
+    Devolve as linhas de pedido.
+    """
     try:
         logger.info("Processando dados...")
+        if isinstance(chunks, pd.DataFrame):
+            resultado = processar_em_lotes(chunks)
+        else:
+            resultado = executar_pipeline(chunks)
+        # Etapas do pipeline (no modo paralelo, somadas entre os processos)
+        registrar_tempos("ingestao", resultado.tempos, linhas=len(resultado.linhas))
         
-        # Converter colunas
-        df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
-        df["Valor Total Z19-Z24"] = pd.to_numeric(df["Valor Total Z19-Z24"], errors="coerce")
-        df["Quantidade"] = pd.to_numeric(df["Quantidade"], errors="coerce")
-        
-        # Se coluna Valor Unitário não existir, calcular a partir do Valor Total
-        if "Valor Unitário" not in df.columns:
-            df["Valor Unitário"] = df.apply(
-                lambda row: row["Valor Total Z19-Z24"] / row["Quantidade"] 
-                if pd.notna(row["Valor Total Z19-Z24"]) and pd.notna(row["Quantidade"]) and row["Quantidade"] > 0 
-                else None,
-                axis=1
-            )
-        
-        # Se coluna Valor Produto não existir, calcular
-        if "Valor Produto" not in df.columns:
-            df["Valor Produto"] = df["Valor Unitário"] * df["Quantidade"]
-        
-        # Filtrar dados inválidos
-        df = df.dropna(subset=["Data", "Valor Produto"])
-        df = df[df["Quantidade"] > 0]
-        
-        # Calcular valor total do pedido por pedido
-        df["Valor Total Pedido"] = df.groupby("Número do Pedido")["Valor Produto"].transform("sum")
-        
-        # Ordenar e remover duplicatas mantendo a última ocorrência
-        df = df.sort_values("Data").drop_duplicates(subset=["Número do Pedido", "Produto"], keep="last")
-        
-        # Adicionar período mensal
-        df["Período_Mês"] = df["Data"].dt.to_period("M")
+        if resultado.renomeacoes:
+            notificar("info", f"🔄 Colunas renomeadas: {list(resultado.renomeacoes.values())}")
         
-        logger.info(f"✅ Dados processados. Shape final: {df.shape}")
-        return df
+        logger.info(f"✅ Dados processados. Linhas: {resultado.linhas.shape}, pedidos: {len(resultado.pedidos)}")
+        return resultado.linhas
         
     except Exception as e:
         logger.error(f"Erro ao processar dados: {e}")
-        st.error(f"❌ Erro ao processar dados: {str(e)}")
+        notificar("error", f"❌ Erro ao processar dados: {str(e)}")
         return pd.DataFrame()
 
 # ===== FUNÇÕES DE ANÁLISE E VISUALIZAÇÃO =====
 
-def normalize_text(text):
-    if pd.isna(text):
-        return ""
-    text = ''.join(c for c in unicodedata.normalize('NFD', str(text)) if unicodedata.category(c) != 'Mn')
-    return text.strip().upper()
-
-def find_closest_city_with_state(city, state, city_list, municipios_df, estados_df, threshold=70):
-    if not city or city == "DESCONHECIDO":
-        return None, None, None
-    
-    normalized_city = normalize_text(city)
-    normalized_state = normalize_text(state) if state else None
-    
-    if normalized_state:
-        estado_codigo = get_estado_codigo(normalized_state, estados_df)
-        if estado_codigo is not None:
-            state_cities = municipios_df[municipios_df['codigo_uf'] == estado_codigo]
-            state_city_list = state_cities['nome_normalizado'].tolist()
-            
-            if state_city_list:
-                match = process.extractOne(normalized_city, state_city_list, scorer=fuzz.token_sort_ratio)
-                if match and match[1] >= threshold:
-                    matched_city = match[0]
-                    city_info = state_cities[state_cities['nome_normalizado'] == matched_city]
-                    if not city_info.empty:
-                        return matched_city, city_info.iloc[0]['latitude'], city_info.iloc[0]['longitude']
-    
-    match = process.extractOne(normalized_city, city_list, scorer=fuzz.token_sort_ratio)
-    if match and match[1] >= threshold:
-        matched_city = match[0]
-        city_info = municipios_df[municipios_df['nome_normalizado'] == matched_city]
-        if not city_info.empty:
-            if normalized_state:
-                estado_codigo = get_estado_codigo(normalized_state, estados_df)
-                if estado_codigo is not None and city_info.iloc[0]['codigo_uf'] != estado_codigo:
-                    return None, None, None
-            return matched_city, city_info.iloc[0]['latitude'], city_info.iloc[0]['longitude']
-    
-    return None, None, None
-
-def get_estado_codigo(estado_normalizado, estados_df):
-    estado_info = estados_df[estados_df['uf_normalizado'] == estado_normalizado]
-    if not estado_info.empty:
-        return estado_info.iloc[0]['codigo_uf']
-    return None
-
-def get_week(data, start_date, end_date):
-    total_days = (end_date - start_date).days + 1
-    if total_days <= 0 or data < start_date or data > end_date:
-        return 0
-    days_since_start = (data - start_date).days
-    week = ((days_since_start * 4) // total_days) + 1 if days_since_start >= 0 else 0
-    return min(max(week, 1), 4)
-
-def classificar_produto(descricao):
-    kits_ar = ["KIT 1", "KIT 2", "KIT 3", "KIT 4", "KIT 5", "KIT 6", "KIT 7", 
-               "KIT UNIVERSAL", "KIT UPGRADE", "KIT AIR RIDE 4C", "KIT K3", "KIT K4", "KIT K5"]
-    descricao_normalizada = str(descricao).strip().upper()
-    if any(descricao_normalizada.startswith(kit) for kit in kits_ar):
-        return "KITS AR"
-    elif "KIT ROSCA" in descricao_normalizada:
-        return "KITS ROSCA"
-    else:
-        return "PEÇAS AVULSAS"
-
 def verificar_duplicatas(df):
     try:
         duplicatas = df[df.duplicated(subset=['Número do Pedido'], keep=False)]
@@ -356,90 +340,77 @@ def verificar_duplicatas(df):
 
 def calcular_comissoes_e_bonus(df, inicio_meta, fim_meta):
     try:
-        # Filtrar dados do período
-        df_periodo = df[(df['Data'] >= inicio_meta) & (df['Data'] <= fim_meta)].copy()
-        
-        # Calcular totais
-        valor_kit_ar = df_periodo[df_periodo['Produto'].str.contains('KIT', na=False) & 
-                                  ~df_periodo['Produto'].str.contains('KIT ROSCA', na=False)]['Valor Produto'].sum()
-        valor_pecas_avulsas = df_periodo[df_periodo['Produto'].isin(['PEÇAS AVULSAS', 'KITS ROSCA'])]['Valor Produto'].sum()
-        valor_total_vendido = valor_kit_ar + valor_pecas_avulsas
-        
-        percentual_kit_ar = 0.007
-        percentual_pecas_avulsas = 0.005
-        
-        comissao_kit_ar = valor_kit_ar * percentual_kit_ar
-        comissao_pecas_avulsas = valor_pecas_avulsas * percentual_pecas_avulsas
-        
-        bonus = 0
-        valor_por_bonus = 200
-        quantidade_bonus = int(valor_total_vendido // 50000)
-        bonus = quantidade_bonus * valor_por_bonus
-        
-        meta_atingida = valor_total_vendido >= 200000
-        premio_meta = 600 if meta_atingida else 0
-        
-        ganhos_totais = comissao_kit_ar + comissao_pecas_avulsas + bonus + premio_meta
-        
-        resultados = pd.DataFrame({
-            "Descrição": [
-                "Comissão de KIT AR (0.7%)",
-                "Comissão de Peças Avulsas e Kit Rosca (0.5%)",
-                "Bônus (R$ 200,00 a cada 50 mil vendido)",
-                "Prêmio Meta Mensal (se atingida)",
-                "Ganhos Estimados"
-            ],
-            "Valor (R$)": [
-                comissao_kit_ar,
-                comissao_pecas_avulsas,
-                bonus,
-                premio_meta,
-                ganhos_totais
-            ]
-        })
-        
-        return resultados, valor_total_vendido, meta_atingida
+        return calcular_comissoes(df, inicio_meta, fim_meta)
         
     except Exception as e:
         logger.error(f"Erro ao calcular comissões: {e}")
         st.error(f"Erro ao calcular comissões: {e}")
         return pd.DataFrame(), 0, False
 
-def identificar_lojistas_recuperar(df):
+def identificar_lojistas_recuperar(cubos, hoje=None):
     try:
-        # Identificar lojistas com mais de 3 pedidos e mais de 3 meses sem comprar
-        hoje = dt.now()
-        lojistas_recuperar = df.groupby('Cliente').agg(
-            num_pedidos=('Número do Pedido', 'count'),
-            ultima_compra=('Data', 'max')
-        ).reset_index()
-        
-        lojistas_recuperar = lojistas_recuperar[
-            (lojistas_recuperar['num_pedidos'] > 3) & 
-            ((hoje - lojistas_recuperar['ultima_compra']).dt.days > 90)
-        ]
-        
-        # Juntar com dados completos do último pedido
-        df_completo = df.sort_values('Data').drop_duplicates(subset=['Cliente'], keep='last')
-        lojistas_recuperar = pd.merge(
-            lojistas_recuperar[['Cliente', 'num_pedidos', 'ultima_compra']], 
-            df_completo, 
-            on='Cliente'
-        )
-        
-        return lojistas_recuperar
+        # Lojistas com mais de 3 pedidos e mais de 3 meses sem comprar, pelo
+        # estado por cliente mantido nos cubos, com os dados do último pedido
+        return lojistas_a_recuperar(cubos[CUBO_CLIENTES], cubos[CUBO_PEDIDOS], hoje or dt.now())
         
     except Exception as e:
         logger.error(f"Erro ao identificar lojistas: {e}")
         st.error(f"Erro ao identificar lojistas: {e}")
         return pd.DataFrame()
 
+# ===== CÁLCULOS DAS ABAS (CACHE POR VERSÃO) =====
+# O que só depende da versão publicada dos dados fica em cache, chaveado
+# pelo instante de publicação (publicada_em); os frames da versão entram
+# com "_" no nome e ficam fora do hash. Assim um rerun de uma aba só
+# recalcula o que depende dos próprios filtros.
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def meses_do_ano(publicada_em, _df, ano):
+    """
+    Meses com vendas no ano (todos os meses do dataset se ano for vazio)
+    """
+    datas = _df["Data"]
+    if ano:
+        datas = datas[datas.dt.year == ano]
+    return sorted(datas.dt.month.unique())
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def montar_mapa_clientes(publicada_em, _df):
+    """
+    Último pedido de cada cliente, geocodificado e com os pontos da mesma
+    cidade afastados (latitude_mapa/longitude_mapa), para o mapa de clientes
+    e os gráficos regionais. Sem coordenadas válidas, a linha sai.
+    """
+    # O frame já está ordenado por Data: a última linha é o último pedido
+    df_mapa = _df.drop_duplicates(subset=['Cliente'], keep='last')
+    df_mapa = montar_pontos_mapa(df_mapa, referencias, caminho_cache=CAMINHO_CACHE_GEOCODIFICACAO)
+    return df_mapa.dropna(subset=["latitude", "longitude"])
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def banco_da_versao(publicada_em, _cubos):
+    """
+    Banco DuckDB com os cubos da versão, montado no primeiro rerun depois
+    da publicação e compartilhado pelas sessões (cada rerun abre um cursor)
+    """
+    with medir("banco_consultas"):
+        return consultas.criar_banco(_cubos)
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def montar_mapa_lojistas_recuperar(publicada_em, dia, _cubos):
+    """
+    Lojistas a recuperar no dia, geocodificados (as linhas sem coordenadas
+    ficam, para a aba distinguir "nenhum lojista" de "nenhum localizado")
+    """
+    df_recuperar_mapa = identificar_lojistas_recuperar(_cubos, pd.Timestamp(dia))
+    if df_recuperar_mapa.empty:
+        return df_recuperar_mapa
+    
+    return montar_pontos_mapa(df_recuperar_mapa, referencias, caminho_cache=CAMINHO_CACHE_GEOCODIFICACAO)
+
 def gerar_tabela_pedidos_meta_atual(df, inicio_meta, fim_meta):
     try:
         # Filtrar pedidos do período
-        tabela = df[
-            (df['Data'] >= inicio_meta) & (df['Data'] <= fim_meta)
-        ][['Data', 'Número do Pedido', 'Cliente', 'Valor Total Pedido']].copy()
+        tabela = fatiar_periodo(df, inicio_meta, fim_meta)[['Data', 'Número do Pedido', 'Cliente', 'Valor Total Pedido']]
         
         tabela = tabela.rename(columns={
             'Data': 'data_pedido',
@@ -458,166 +429,160 @@ def gerar_tabela_pedidos_meta_atual(df, inicio_meta, fim_meta):
 
 # ===== FUNÇÕES DE PROCESSAMENTO EM LOTES =====
 
-def processar_em_lotes(df, tamanho_lote=1000):
+@medido("processar_em_lotes")
+def processar_em_lotes(df, linhas_por_particao=LINHAS_POR_PARTICAO):
+    """
+    Pipeline de ingestão em partições por número do pedido (um pedido nunca
+    fica dividido entre partições), em paralelo no pool de processos da
+    ingestão quando PROCESSOS_INGESTAO pede (por padrão, em passo único).
+    Mesmo resultado do pipeline em passo único. Devolve o ResultadoPipeline.
+    """
+    try:
+        return executar_pipeline_em_paralelo(df, linhas_por_particao=linhas_por_particao)
+    except Exception as e:
+        logger.error(f"Erro no processamento paralelo, processando em passo único: {e}")
+        return executar_pipeline([df])
+
+# ===== FUNÇÃO DE CARREGAMENTO PROGRESSIVO =====
+
+@medido("preparar_dataset")
+def preparar_dataset(df, cubos_anteriores=None, notificar=notificar_streamlit):
     """
-    Processa dados em lotes para melhor performance
+    Da saída do pipeline de ingestão (ou do snapshot) ao frame lido pelas
+    abas: projeção das colunas usadas, ordenação por data e cubos de
+    agregação, entre eles a tabela de pedidos. Retorna (df, cubos).
     """
     if df.empty:
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
     
-    logger.info(f"Processando dados em lotes de {tamanho_lote} registros...")
-    resultados = []
+    # Snapshot gravado antes da tabela de pedidos: passa uma vez pelo pipeline
+    if not set(COLUNAS_PEDIDO) <= set(df.columns):
+        notificar("info", f"Snapshot em formato anterior ({len(df)} registros). Reprocessando...")
+        df = processar_em_lotes(df).linhas
     
-    # Dividir DataFrame em lotes
-    num_lotes = (len(df) // tamanho_lote) + 1
-    for i in range(num_lotes):
-        inicio = i * tamanho_lote
-        fim = min((i + 1) * tamanho_lote, len(df))
-        lote = df.iloc[inicio:fim]
-        
-        # Processar lote
-        lote_processado = processar_lote(lote)
-        if not lote_processado.empty:
-            resultados.append(lote_processado)
-        
-        # Mostrar progresso
-        progresso = ((i + 1) / num_lotes) * 100
-        logger.info(f"Lote {i+1}/{num_lotes} processado ({progresso:.1f}%)")
+    # Manter ordenado por data para o recorte de períodos
+    df = ordenar_por_data(df[[c for c in df.columns if c in COLUNAS_DASHBOARD or c in COLUNAS_DERIVADAS]])
     
-    # Combinar resultados
-    if resultados:
-        return pd.concat(resultados, ignore_index=True)
-    return pd.DataFrame()
+    # Cubos de agregação lidos pelas abas; só os dias alterados desde a
+    # versão anterior são reagregados
+    with medir("cubos", linhas=len(df)):
+        cubos = atualizar_cubos(cubos_anteriores, df)
+    return df, cubos
 
-def processar_lote(df):
+def pre_geocodificar(df):
     """
-    Processa um lote de dados
+    Resolve no cache de geocodificação os pares cidade/estado ainda não
+    vistos, para que os mapas da aba de clientes só consultem o cache
     """
-    try:
-        # Converter colunas
-        df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
-        df["Valor Total Z19-Z24"] = pd.to_numeric(df["Valor Total Z19-Z24"], errors="coerce")
-        df["Quantidade"] = pd.to_numeric(df["Quantidade"], errors="coerce")
-        
-        # Calcular valor unitário e valor do produto
-        df["Valor Unitário"] = df.apply(
-            lambda row: row["Valor Total Z19-Z24"] / row["Quantidade"] 
-            if pd.notna(row["Valor Total Z19-Z24"]) and pd.notna(row["Quantidade"]) and row["Quantidade"] > 0 
-            else None,
-            axis=1
+    pares = df[["Cidade", "Estado"]].drop_duplicates()
+    pares = pd.DataFrame({
+        "Cidade": pares["Cidade"].str.strip(),
+        "Estado": pares["Estado"].str.strip().str.upper(),
+    })
+    with medir("geocodificacao", linhas=len(pares)):
+        geocodificar_dataframe(
+            pares, city_list, municipios_df, estados_df, assinatura_referencia,
+            caminho_cache=CAMINHO_CACHE_GEOCODIFICACAO, threshold=70, indice=indice_municipios
         )
-        
-        df["Valor Produto"] = df["Valor Unitário"] * df["Quantidade"]
-        
-        # Filtrar dados inválidos
-        df = df.dropna(subset=["Data", "Valor Produto"])
-        df = df[df["Quantidade"] > 0]
-        
-        # Calcular valor total do pedido
-        df["Valor Total Pedido"] = df.groupby("Número do Pedido")["Valor Produto"].transform("sum")
-        
-        return df
-        
-    except Exception as e:
-        logger.error(f"Erro ao processar lote: {e}")
-        return pd.DataFrame()
 
-# ===== FUNÇÃO DE CARREGAMENTO PROGRESSIVO =====
+def montar_versao_em_segundo_plano():
+    """
+    Job do agendador: consulta a origem (download condicional), prepara o
+    dataset e os cubos e aquece o cache de geocodificação, tudo fora do
+    caminho das requisições. Devolve None quando não há o que publicar
+    (origem inalterada ou indisponível, ou os mesmos dados), para que a
+    versão publicada e os caches chaveados por ela continuem valendo.
+    """
+    anterior = versao_atual()
+    # Com uma versão publicada, origem inalterada custa só a consulta de metadados
+    df = baixar_dados_origem(usar_snapshot=False, notificar=notificar_log, ler_snapshot_local=anterior is None)
+    if df is None or df.empty:
+        return None
+    
+    df, cubos = preparar_dataset(df, anterior["cubos"] if anterior else None, notificar_log)
+    # Cubos devolvidos sem alteração: conteúdo igual ao da versão publicada
+    if anterior is not None and cubos is anterior["cubos"]:
+        return None
+    salvar_dataset_final(df, cubos)
+    pre_geocodificar(df)
+    return df, cubos
+
+@st.cache_resource
+def agendador_atualizacao():
+    """
+    Um agendador por processo, compartilhado por todas as sessões (None
+    com a atualização em segundo plano desligada)
+    """
+    if not ATUALIZACAO_EM_SEGUNDO_PLANO:
+        logger.info("Atualização em segundo plano desligada (ATUALIZACAO_EM_SEGUNDO_PLANO=0)")
+        return None
+    return iniciar_agendador(montar_versao_em_segundo_plano, INTERVALO_ATUALIZACAO)
+
+def carregar_primeira_versao():
+    """
+    Carga quando o processo ainda não tem versão publicada. Se houver um
+    dataset final em Arrow, ele é aberto com memory map e a consulta à
+    origem segue em segundo plano (o job espera esta versão ser publicada:
+    atualizacao.obter_versao); senão, carga síncrona (snapshot local se
+    recente, senão a origem).
+    """
+    df, cubos = abrir_dataset_final()
+    if not df.empty:
+        agendador = agendador_atualizacao()
+        if agendador is not None:
+            atualizar_agora(agendador)
+        return df, cubos
+
+    with st.spinner("Carregando dados..."):
+        df, cubos = preparar_dataset(baixar_dados_origem(usar_snapshot=True))
+    salvar_dataset_final(df, cubos)
+    return df, cubos
 
 def carregar_dados_progressivos():
     """
-    Carrega dados de forma progressiva para melhor performance
+    Devolve a última versão publicada dos dados ({"df", "cubos", ...}).
+    A versão é uma só por processo e as sessões a referenciam sem copiar;
+    só a primeira carga do processo acontece dentro de uma requisição, as
+    seguintes são montadas pelo agendador e trocadas atomicamente.
+    Devolve None se não houver dados.
     """
     try:
-        # Carregar dados principais
-        df = carregar_dados_google_drive()
-        
-        if df.empty:
-            return pd.DataFrame()
-        
-        # Processar em lotes para grandes datasets
-        if len(df) > 5000:
-            st.info(f"Dataset grande ({len(df)} registros). Processando em lotes...")
-            df = processar_em_lotes(df, tamanho_lote=2000)
-        
-        # Consolidar dados
-        df_consolidado = consolidar_dados(df)
-        
-        # Atualizar session state
-        st.session_state.df_dados = df_consolidado.copy()
-        st.session_state.ultima_atualizacao = dt.now()
-        
-        return df_consolidado
+        return obter_versao(carregar_primeira_versao)
         
     except Exception as e:
         logger.error(f"Erro no carregamento progressivo: {e}")
         st.error(f"Erro no carregamento progressivo: {e}")
-        return pd.DataFrame()
+        return None
+
+# ===== CONFIGURAÇÃO INICIAL =====
 
-def consolidar_dados(df):
+@st.cache_resource(show_spinner=False)
+def carregar_referencias():
     """
-    Consolida dados de forma otimizada
+    Municípios, estados e o índice de geocodificação, lidos uma vez por
+    processo e compartilhados (só leitura) por todas as sessões
     """
-    if df.empty:
-        return pd.DataFrame()
-    
-    try:
-        # Agrupar por pedido para calcular métricas
-        pedidos = df.groupby('Número do Pedido').agg({
-            'Data': 'first',
-            'Cliente': 'first',
-            'Telefone': 'first',
-            'Cidade': 'first',
-            'Estado': 'first',
-            'Valor Total Pedido': 'sum',
-            'Quantidade': 'sum'
-        }).reset_index()
-        
-        # Juntar com detalhes dos produtos
-        produtos = df[['Número do Pedido', 'Produto', 'Quantidade', 'Valor Unitário', 'Valor Produto']]
-        
-        # Remover duplicatas de produtos
-        produtos = produtos.drop_duplicates(subset=['Número do Pedido', 'Produto'], keep='last')
-        
-        return pd.merge(pedidos, produtos, on='Número do Pedido', how='left')
-        
-    except Exception as e:
-        logger.error(f"Erro na consolidação: {e}")
-        return df
-
-# ===== CONFIGURAÇÃO INICIAL =====
+    logger.info("Carregando arquivos de referência...")
+    referencias = ler_referencias("municipios.csv", "estados.csv")
+    logger.info("✅ Arquivos de referência carregados com sucesso")
+    return referencias
 
 logger.info("Iniciando configuração inicial do dashboard")
 
 try:
-    # Inicializar session_state
-    if 'df_dados' not in st.session_state:
-        st.session_state.df_dados = pd.DataFrame()
-    if 'ultima_atualizacao' not in st.session_state:
-        st.session_state.ultima_atualizacao = None
-    
-    logger.info("Session state inicializado")
-    
-    # Carregar arquivos de referência
+    # Configurar página (antes de qualquer elemento na tela)
+    st.set_page_config(layout="wide", page_title="Dashboard de Vendas com Parquet")
+    logger.info("✅ Página configurada")
+
+    # Carregar arquivos de referência (uma vez por processo)
     try:
-        logger.info("Carregando arquivos de referência...")
-        estados_df = pd.read_csv("estados.csv")
-        municipios_df = pd.read_csv("municipios.csv")
-        
-        municipios_df["nome_normalizado"] = municipios_df["nome"].apply(normalize_text)
-        city_list = municipios_df["nome_normalizado"].tolist()
-        
-        estados_df["uf_normalizado"] = estados_df["uf"].apply(normalize_text)
-        logger.info("✅ Arquivos de referência carregados com sucesso")
+        referencias = carregar_referencias()
+        estados_df, municipios_df, city_list, assinatura_referencia, indice_municipios = referencias
     except Exception as e:
         logger.error(f"Erro ao carregar arquivos de referência: {e}")
         st.error(f"Erro ao carregar arquivos de referência: {e}")
         st.stop()
     
-    # Configurar página
-    st.set_page_config(layout="wide", page_title="Dashboard de Vendas com Parquet")
-    logger.info("✅ Página configurada")
-    
 except Exception as e:
     logger.error(f"Erro na configuração inicial: {e}")
     st.error(f"Erro na configuração inicial: {e}")
@@ -765,12 +730,16 @@ st.sidebar.markdown(f"### 📄 Arquivo Parquet: {NOME_PARQUET}")
 st.sidebar.markdown(f"### 📄 Arquivo CSV: {NOME_CSV}")
 st.sidebar.markdown(f"### 📂 Pasta ID: {PASTA_ID}")
 
+# Atualização periódica em segundo plano (uma por processo)
+agendador = agendador_atualizacao()
+
 if st.sidebar.button("🔄 Recarregar Dados"):
-    if 'df_dados' in st.session_state:
-        del st.session_state.df_dados
-    if 'ultima_atualizacao' in st.session_state:
-        del st.session_state.ultima_atualizacao
-    st.rerun()
+    # A nova versão é montada em segundo plano; a página continua com a atual
+    if agendador is None:
+        st.sidebar.warning("Atualização em segundo plano desligada")
+    else:
+        atualizar_agora(agendador)
+        st.sidebar.info("🔄 Atualização iniciada em segundo plano")
 
 st.sidebar.markdown('</div>', unsafe_allow_html=True)
 
@@ -780,7 +749,8 @@ logger.info("Iniciando carregamento de dados principais...")
 
 try:
     # Carregar dados progressivamente
-    df = carregar_dados_progressivos()
+    versao = carregar_dados_progressivos()
+    df = versao["df"] if versao else pd.DataFrame()
     logger.info(f"DataFrame carregado. Shape: {df.shape if not df.empty else 'vazio'}")
     
     if df.empty:
@@ -794,33 +764,42 @@ try:
     # Seção de status
     st.sidebar.success("✅ Conectado ao Google Drive")
     st.sidebar.caption(f"📁 {len(df)} pedidos carregados")
+    st.sidebar.caption(f"💾 Memória do dataset: {df.memory_usage(deep=True).sum() / 2**20:.1f} MB")
     
-    # Correção robusta para o erro de formatação de data
-    ultima_atualizacao_str = "Nenhuma atualização registrada"
-    if 'ultima_atualizacao' in st.session_state:
-        try:
-            if st.session_state.ultima_atualizacao is not None:
-                ultima_atualizacao_str = st.session_state.ultima_atualizacao.strftime('%d/%m/%Y %H:%M')
-            else:
-                ultima_atualizacao_str = "Nenhuma atualização registrada"
-        except (AttributeError, TypeError) as e:
-            ultima_atualizacao_str = f"Erro de formatação: {str(e)}"
-    
-    st.sidebar.caption(f"🕒 Última atualização: {ultima_atualizacao_str}")
+    # Idade do snapshot local (última vez que a origem foi baixada ou conferida)
+    idade = idade_snapshot(PASTA_SNAPSHOT)
+    if idade is None:
+        st.sidebar.caption("🕒 Snapshot local indisponível")
+    elif idade < 3600:
+        st.sidebar.caption(f"🕒 Dados atualizados há {idade / 60:.0f} min")
+    else:
+        st.sidebar.caption(f"🕒 Dados atualizados há {idade / 3600:.1f} h")
     
     # ===== DASHBOARD COM ABAS =====
     st.title("📊 Dashboard de Vendas")
     
     if not df.empty:
+        # Agregações dos gráficos e da meta rodam em SQL sobre os cubos
+        cubos = versao["cubos"]
+        con_vendas = banco_da_versao(versao["publicada_em"], cubos).cursor()
+        
         anos_disponiveis = sorted(df["Data"].dt.year.unique())
+        
+        # Tabela de dias úteis dos anos do dataset e do ano seguinte
+        garantir_anos(int(anos_disponiveis[0]), int(anos_disponiveis[-1]) + 1)
         hoje = dt.now()
         mes_atual = hoje.month
         ano_atual = hoje.year
         
-        tab1, tab2, tab3 = st.tabs(["Desempenho Individual", "Análise de Clientes", "Cálculo de Meta"])
+        # Só a aba ativa executa (trocar de aba provoca um rerun), e cada aba
+        # é um fragmento: mexer num filtro reexecuta apenas a própria aba
+        tab1, tab2, tab3 = st.tabs(["Desempenho Individual", "Análise de Clientes", "Cálculo de Meta"], key="aba_ativa", on_change="rerun")
+        chave_versao = versao["publicada_em"]
         
         # ===== ABA 1: DESEMPENHO INDIVIDUAL =====
-        with tab1:
+        @st.fragment
+        @medido("aba/desempenho_individual")
+        def aba_desempenho_individual():
             try:
                 st.markdown('<div class="filtro-topo">', unsafe_allow_html=True)
                 st.markdown("### 📅 FILTRO DOS GRÁFICOS")
@@ -836,10 +815,7 @@ try:
                     )
                 
                 with col_mes:
-                    if ano_selecionado:
-                        meses_disponiveis = sorted(df[df["Data"].dt.year == ano_selecionado]["Data"].dt.month.unique())
-                    else:
-                        meses_disponiveis = sorted(df["Data"].dt.month.unique())
+                    meses_disponiveis = meses_do_ano(chave_versao, df, ano_selecionado)
                     
                     nomes_meses = [calendar.month_name[mes] for mes in meses_disponiveis]
                     
@@ -859,171 +835,122 @@ try:
                 
                 st.markdown('</div>', unsafe_allow_html=True)
                 
-                inicio_periodo_local = dt(ano_selecionado, mes_selecionado_num, 26).replace(hour=0, minute=0, second=0)
-                fim_periodo_local = (inicio_periodo_local + relativedelta(months=1) - timedelta(days=1)).replace(hour=23, minute=59, second=59)
-                df_desempenho_local = df[(df["Data"] >= inicio_periodo_local) & (df["Data"] <= fim_periodo_local)].copy()
+                # O mês escolhido é o de início: 26 do mês até 25 do mês seguinte
+                periodo_local = pd.Period(year=ano_selecionado, month=mes_selecionado_num, freq="M") + 1
+                inicio_periodo_local, fim_periodo_local = limites_periodo_meta(periodo_local)
                 
                 # Gráfico 1: Vendas por dia
-                try:
-                    col_d1_full, = st.columns([4])
-                    with col_d1_full:
-                        vendas_dia = df_desempenho_local.groupby(df_desempenho_local["Data"].dt.date)["Valor Total Pedido"].sum().reset_index()
-                        fig_dia = px.bar(vendas_dia, x="Data", y="Valor Total Pedido", template="plotly_dark", color_discrete_sequence=["#FF8C00"])
-                        fig_dia.update_layout(xaxis_title="Data", yaxis_title="Valor Total (R$)", font=dict(size=10), margin=dict(l=10, r=10, t=30, b=10))
-                        st.plotly_chart(fig_dia, width="stretch")
-                        logger.info("✅ Gráfico de vendas por dia criado")
-                except Exception as e:
-                    logger.error(f"Erro ao criar gráfico de vendas por dia: {e}")
-                    st.error(f"Erro ao criar gráfico de vendas por dia: {e}")
+                with medir("grafico/vendas_por_dia"):
+                    try:
+                        col_d1_full, = st.columns([4])
+                        with col_d1_full:
+                            vendas_dia = consultas.vendas_por_dia(con_vendas, inicio_periodo_local, fim_periodo_local)
+                            fig_dia = px.bar(vendas_dia, x="Data", y="Valor Total Pedido", template="plotly_dark", color_discrete_sequence=["#FF8C00"])
+                            fig_dia.update_layout(xaxis_title="Data", yaxis_title="Valor Total (R$)", font=dict(size=10), margin=dict(l=10, r=10, t=30, b=10))
+                            st.plotly_chart(fig_dia, width="stretch")
+                            logger.info("✅ Gráfico de vendas por dia criado")
+                    except Exception as e:
+                        logger.error(f"Erro ao criar gráfico de vendas por dia: {e}")
+                        st.error(f"Erro ao criar gráfico de vendas por dia: {e}")
                 
                 # Gráfico 2: Comparação anual
-                try:
-                    inicio_atual = dt(ano_selecionado, mes_selecionado_num, 26).replace(hour=0, minute=0, second=0)
-                    fim_atual = (inicio_atual + relativedelta(months=1) - timedelta(days=1)).replace(hour=23, minute=59, second=59)
-                    inicio_anterior = inicio_atual - relativedelta(years=1)
-                    fim_anterior = fim_atual - relativedelta(years=1)
-                    
-                    df_atual = df[(df["Data"] >= inicio_atual) & (df["Data"] <= fim_atual)].copy()
-                    df_anterior = df[(df["Data"] >= inicio_anterior) & (df["Data"] <= fim_anterior)].copy()
-                    
-                    df_atual["Semana"] = df_atual["Data"].apply(lambda x: get_week(x, start_date=inicio_atual, end_date=fim_atual))
-                    df_anterior["Semana"] = df_anterior["Data"].apply(lambda x: get_week(x, start_date=inicio_anterior, end_date=fim_anterior))
-                    
-                    vendas_atual_week = df_atual.groupby("Semana")["Valor Total Pedido"].sum().reindex(range(1, 5), fill_value=0).reset_index()
-                    vendas_atual_week["Período"] = vendas_atual_week["Semana"].apply(lambda x: f"Semana {x}")
-                    vendas_anterior_week = df_anterior.groupby("Semana")["Valor Total Pedido"].sum().reindex(range(1, 5), fill_value=0).reset_index()
-                    vendas_anterior_week["Período"] = vendas_anterior_week["Semana"].apply(lambda x: f"Semana {x}")
-                    
-                    fig_comparacao_ano = go.Figure()
-                    fig_comparacao_ano.add_trace(go.Scatter(x=vendas_atual_week["Período"], y=vendas_atual_week["Valor Total Pedido"], mode='lines+markers', name=f'{ano_selecionado}', line=dict(color='#FF8C00')))
-                    fig_comparacao_ano.add_trace(go.Scatter(x=vendas_anterior_week["Período"], y=vendas_anterior_week["Valor Total Pedido"], mode='lines+markers', name=f'{ano_selecionado-1}', line=dict(color='#FFA500')))
-                    fig_comparacao_ano.update_layout(
-                        template="plotly_dark",
-                        xaxis_title="Semanas",
-                        yaxis_title="Valor Total (R$)",
-                        font=dict(size=10),
-                        margin=dict(l=10, r=10, t=30, b=10),
-                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                    )
-                    st.plotly_chart(fig_comparacao_ano, width="stretch")
-                    logger.info("✅ Gráfico de comparação anual criado")
-                except Exception as e:
-                    logger.error(f"Erro ao criar gráfico de comparação anual: {e}")
-                    st.error(f"Erro ao criar gráfico de comparação anual: {e}")
-                
-                # Gráfico 3: Top produtos
-                try:
-                    col_d2_full, = st.columns([4])
-                    with col_d2_full:
-                        df_periodo = df_desempenho_local.copy()
-                        df_periodo = df_periodo[df_periodo["Quantidade"] > 0].copy()
-                        df_periodo["Produto"] = df_periodo["Produto"].str.strip().str.upper()
-                        top_produtos = df_periodo.groupby("Produto")["Quantidade"].sum().reset_index()
-                        top_produtos = top_produtos.sort_values(by="Quantidade", ascending=False).head(10)
+                with medir("grafico/comparacao_anual"):
+                    try:
+                        inicio_atual, fim_atual = inicio_periodo_local, fim_periodo_local
+                        inicio_anterior, fim_anterior = limites_periodo_meta(periodo_local - 12)
+                        
+                        vendas_atual_week = consultas.vendas_por_semana(con_vendas, inicio_atual, fim_atual)
+                        vendas_atual_week["Período"] = vendas_atual_week["Semana"].apply(lambda x: f"Semana {x}")
+                        vendas_anterior_week = consultas.vendas_por_semana(con_vendas, inicio_anterior, fim_anterior)
+                        vendas_anterior_week["Período"] = vendas_anterior_week["Semana"].apply(lambda x: f"Semana {x}")
                         
-                        fig_top_produtos = px.bar(top_produtos, x="Produto", y="Quantidade", 
-                                                title=f"Top 10 Produtos Mais Vendidos - {inicio_periodo_local.strftime('%d/%m/%Y')} a {fim_periodo_local.strftime('%d/%m/%Y')}",
-                                                template="plotly_dark", color_discrete_sequence=["#FF8C00"])
-                        fig_top_produtos.update_layout(
-                            xaxis_title="Produtos",
-                            yaxis_title="Quantidade Vendida",
+                        fig_comparacao_ano = go.Figure()
+                        fig_comparacao_ano.add_trace(go.Scatter(x=vendas_atual_week["Período"], y=vendas_atual_week["Valor Total Pedido"], mode='lines+markers', name=f'{ano_selecionado}', line=dict(color='#FF8C00')))
+                        fig_comparacao_ano.add_trace(go.Scatter(x=vendas_anterior_week["Período"], y=vendas_anterior_week["Valor Total Pedido"], mode='lines+markers', name=f'{ano_selecionado-1}', line=dict(color='#FFA500')))
+                        fig_comparacao_ano.update_layout(
+                            template="plotly_dark",
+                            xaxis_title="Semanas",
+                            yaxis_title="Valor Total (R$)",
                             font=dict(size=10),
                             margin=dict(l=10, r=10, t=30, b=10),
-                            xaxis_tickangle=-45
+                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
                         )
-                        st.plotly_chart(fig_top_produtos, width="stretch")
-                        logger.info("✅ Gráfico de top produtos criado")
-                except Exception as e:
-                    logger.error(f"Erro ao criar gráfico de top produtos: {e}")
-                    st.error(f"Erro ao criar gráfico de top produtos: {e}")
+                        st.plotly_chart(fig_comparacao_ano, width="stretch")
+                        logger.info("✅ Gráfico de comparação anual criado")
+                    except Exception as e:
+                        logger.error(f"Erro ao criar gráfico de comparação anual: {e}")
+                        st.error(f"Erro ao criar gráfico de comparação anual: {e}")
+                
+                # Gráfico 3: Top produtos
+                with medir("grafico/top_produtos"):
+                    try:
+                        col_d2_full, = st.columns([4])
+                        with col_d2_full:
+                            top_produtos = consultas.top_produtos(con_vendas, inicio_periodo_local, fim_periodo_local, n=10)
+                            
+                            fig_top_produtos = px.bar(top_produtos, x="Produto", y="Quantidade", 
+                                                    title=f"Top 10 Produtos Mais Vendidos - {inicio_periodo_local.strftime('%d/%m/%Y')} a {fim_periodo_local.strftime('%d/%m/%Y')}",
+                                                    template="plotly_dark", color_discrete_sequence=["#FF8C00"])
+                            fig_top_produtos.update_layout(
+                                xaxis_title="Produtos",
+                                yaxis_title="Quantidade Vendida",
+                                font=dict(size=10),
+                                margin=dict(l=10, r=10, t=30, b=10),
+                                xaxis_tickangle=-45
+                            )
+                            st.plotly_chart(fig_top_produtos, width="stretch")
+                            logger.info("✅ Gráfico de top produtos criado")
+                    except Exception as e:
+                        logger.error(f"Erro ao criar gráfico de top produtos: {e}")
+                        st.error(f"Erro ao criar gráfico de top produtos: {e}")
                 
                 # Gráfico 4: Vendas por categoria
-                try:
-                    df_desempenho_local["Categoria"] = df_desempenho_local["Produto"].apply(classificar_produto)
-                    vendas_categoria = df_desempenho_local.groupby("Categoria")["Valor Total Pedido"].sum().reset_index()
-                    categorias_completas = pd.DataFrame({"Categoria": ["KITS AR", "KITS ROSCA", "PEÇAS AVULSAS"]})
-                    vendas_categoria = pd.merge(categorias_completas, vendas_categoria, on="Categoria", how="left").fillna(0)
-                    
-                    fig_categoria = px.pie(vendas_categoria, names="Categoria", values="Valor Total Pedido",
-                                         title=f"Vendas por Categoria - {inicio_periodo_local.strftime('%d/%m/%Y')} a {fim_periodo_local.strftime('%d/%m/%Y')}",
-                                         template="plotly_dark",
-                                         color_discrete_sequence=["#FFA500", "#FF8C00", "#E94F37"])
-                    fig_categoria.update_traces(textinfo="percent+label", textposition="inside")
-                    fig_categoria.update_layout(
-                        font=dict(size=10),
-                        margin=dict(l=10, r=10, t=30, b=10),
-                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                    )
-                    st.plotly_chart(fig_categoria, width="stretch")
-                    logger.info("✅ Gráfico de vendas por categoria criado")
-                except Exception as e:
-                    logger.error(f"Erro ao criar gráfico de vendas por categoria: {e}")
-                    st.error(f"Erro ao criar gráfico de vendas por categoria: {e}")
+                with medir("grafico/vendas_por_categoria"):
+                    try:
+                        vendas_categoria = consultas.vendas_por_categoria(con_vendas, inicio_periodo_local, fim_periodo_local)
+                        categorias_completas = pd.DataFrame({"Categoria": CATEGORIAS})
+                        vendas_categoria = pd.merge(categorias_completas, vendas_categoria, on="Categoria", how="left").fillna(0)
+                        
+                        fig_categoria = px.pie(vendas_categoria, names="Categoria", values="Valor Total Pedido",
+                                             title=f"Vendas por Categoria - {inicio_periodo_local.strftime('%d/%m/%Y')} a {fim_periodo_local.strftime('%d/%m/%Y')}",
+                                             template="plotly_dark",
+                                             color_discrete_sequence=["#FFA500", "#FF8C00", "#E94F37"])
+                        fig_categoria.update_traces(textinfo="percent+label", textposition="inside")
+                        fig_categoria.update_layout(
+                            font=dict(size=10),
+                            margin=dict(l=10, r=10, t=30, b=10),
+                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                        )
+                        st.plotly_chart(fig_categoria, width="stretch")
+                        logger.info("✅ Gráfico de vendas por categoria criado")
+                    except Exception as e:
+                        logger.error(f"Erro ao criar gráfico de vendas por categoria: {e}")
+                        st.error(f"Erro ao criar gráfico de vendas por categoria: {e}")
                 
             except Exception as e:
                 logger.error(f"Erro na aba Desempenho Individual: {e}")
                 st.error(f"Erro na aba Desempenho Individual: {e}")
         
+        with tab1:
+            if tab1.open:
+                aba_desempenho_individual()
+        
         # ===== ABA 2: ANÁLISE DE CLIENTES =====
-        with tab2:
+        @st.fragment
+        @medido("aba/analise_clientes")
+        def aba_analise_clientes():
             try:
-                df_lojistas_recuperar = identificar_lojistas_recuperar(df)
-                
                 col_mapa1, col_mapa2 = st.columns([1, 1])
                 
-                with col_mapa1:
-                    df_mapa = df.copy()
-                    df_mapa["Cidade"] = df_mapa["Cidade"].str.strip()
-                    df_mapa["Estado"] = df_mapa["Estado"].str.strip().str.upper()
-                    
-                    df_mapa["Cidade_Corrigida"] = None
-                    df_mapa["latitude"] = None
-                    df_mapa["longitude"] = None
-                    
-                    for index, row in df_mapa.iterrows():
-                        cidade = row["Cidade"]
-                        estado = row["Estado"]
-                        cidade_corrigida, lat, lon = find_closest_city_with_state(cidade, estado, city_list, municipios_df, estados_df, threshold=70)
-                        
-                        if cidade_corrigida and lat and lon:
-                            df_mapa.at[index, "Cidade_Corrigida"] = cidade_corrigida
-                            df_mapa.at[index, "latitude"] = lat
-                            df_mapa.at[index, "longitude"] = lon
-                        else:
-                            estado_normalizado = normalize_text(estado)
-                            estado_info = estados_df[estados_df["uf_normalizado"] == estado_normalizado]
-                            if not estado_info.empty:
-                                df_mapa.at[index, "latitude"] = estado_info.iloc[0]["latitude"]
-                                df_mapa.at[index, "longitude"] = estado_info.iloc[0]["longitude"]
-                            else:
-                                df_mapa.at[index, "latitude"] = -15.7801
-                                df_mapa.at[index, "longitude"] = -47.9292
-                    
-                    df_mapa["Estado_Corrigido"] = df_mapa["Estado"]
-                    df_mapa = df_mapa.sort_values('Data').drop_duplicates(subset=['Cliente'], keep='last')
-                    df_mapa["Coordenadas Atuais"] = df_mapa.apply(lambda row: f"({row['latitude']}, {row['longitude']})", axis=1)
-                    
-                    cidades_grupo = df_mapa.groupby("Cidade_Corrigida")
-                    np.random.seed(42)
-                    for cidade, grupo in cidades_grupo:
-                        indices = grupo.index.tolist()
-                        n_clientes = len(indices)
-                        
-                        for i, idx in enumerate(indices):
-                            deslocamento_lat = np.random.uniform(-0.002, 0.002)
-                            deslocamento_lon = np.random.uniform(-0.002, 0.002)
-                            
-                            df_mapa.at[idx, "latitude"] += deslocamento_lat
-                            df_mapa.at[idx, "longitude"] += deslocamento_lon
-                    
-                    df_mapa["Ultima_Compra"] = df_mapa["Data"].dt.strftime("%d/%m/%Y")
-                    df_mapa = df_mapa.dropna(subset=["latitude", "longitude"])
+                with col_mapa1, medir("mapa/clientes"):
+                    # Geocodificação e dispersão em cache por versão dos dados
+                    df_mapa = montar_mapa_clientes(chave_versao, df)
                     
                     if not df_mapa.empty:
                         with st.spinner("Gerando mapa de localização..."):
                             fig_mapa = go.Figure(go.Scattermap(
-                                lat=df_mapa["latitude"],
-                                lon=df_mapa["longitude"],
+                                lat=df_mapa["latitude_mapa"],
+                                lon=df_mapa["longitude_mapa"],
                                 mode='markers',
                                 hovertemplate=
                                 '<b>Cliente</b>: %{customdata[0]}<br>'+
@@ -1040,7 +967,7 @@ try:
                                 mapbox_style="dark",
                                 mapbox=dict(
                                     zoom=3,
-                                    center=dict(lat=df_mapa["latitude"].mean(), lon=df_mapa["longitude"].mean())
+                                    center=dict(lat=df_mapa["latitude_mapa"].mean(), lon=df_mapa["longitude_mapa"].mean())
                                 ),
                                 uirevision="constant",
                                 font=dict(size=10),
@@ -1050,11 +977,13 @@ try:
                             )
                             st.plotly_chart(fig_mapa, width="stretch", config={'scrollZoom': True})
                             
-                            df_tabela = df_mapa[["Cliente", "Telefone", "Cidade", "Estado", "Cidade_Corrigida", "Estado_Corrigido", "Coordenadas Atuais"]].copy()
+                            df_tabela = df_mapa[["Cliente", "Telefone", "Cidade", "Estado", "Cidade_Corrigida", "Estado_Corrigido", "latitude", "longitude"]]
                             st.data_editor(df_tabela, width="stretch")
                             
                             if st.button("Exportar dados dos clientes"):
-                                csv = df_tabela.to_csv(index=False).encode('utf-8')
+                                # Coordenadas geocodificadas (sem o deslocamento do mapa) viram texto só aqui
+                                df_exportacao = df_tabela.drop(columns=["latitude", "longitude"]).assign(**{"Coordenadas Atuais": formatar_coordenadas(df_tabela)})
+                                csv = df_exportacao.to_csv(index=False).encode('utf-8')
                                 st.download_button(
                                     label="Download CSV",
                                     data=csv,
@@ -1065,44 +994,16 @@ try:
                     else:
                         st.warning("Nenhum dado de localização válido após aplicar os filtros.")
                 
-                with col_mapa2:
-                    if not df_lojistas_recuperar.empty:
-                        df_recuperar_mapa = df_lojistas_recuperar.copy()
-                        df_recuperar_mapa["Cidade"] = df_recuperar_mapa["Cidade"].str.strip()
-                        df_recuperar_mapa["Estado"] = df_recuperar_mapa["Estado"].str.strip().str.upper()
-                        
-                        df_recuperar_mapa["Cidade_Corrigida"] = None
-                        df_recuperar_mapa["latitude"] = None
-                        df_recuperar_mapa["longitude"] = None
-                        
-                        for index, row in df_recuperar_mapa.iterrows():
-                            cidade = row["Cidade"]
-                            estado = row["Estado"]
-                            cidade_corrigida, lat, lon = find_closest_city_with_state(cidade, estado, city_list, municipios_df, estados_df, threshold=70)
-                            
-                            if cidade_corrigida and lat and lon:
-                                df_recuperar_mapa.at[index, "Cidade_Corrigida"] = cidade_corrigida
-                                df_recuperar_mapa.at[index, "latitude"] = lat
-                                df_recuperar_mapa.at[index, "longitude"] = lon
-                            else:
-                                estado_normalizado = normalize_text(estado)
-                                estado_info = estados_df[estados_df["uf_normalizado"] == estado_normalizado]
-                                if not estado_info.empty:
-                                    df_recuperar_mapa.at[index, "latitude"] = estado_info.iloc[0]["latitude"]
-                                    df_recuperar_mapa.at[index, "longitude"] = estado_info.iloc[0]["longitude"]
-                                else:
-                                    df_recuperar_mapa.at[index, "latitude"] = -15.7801
-                                    df_recuperar_mapa.at[index, "longitude"] = -47.9292
-                        
-                        df_recuperar_mapa["Estado_Corrigido"] = df_recuperar_mapa["Estado"]
-                        df_recuperar_mapa["Ultima_Compra"] = df_recuperar_mapa["Data"].dt.strftime("%d/%m/%Y")
+                with col_mapa2, medir("mapa/lojistas_recuperar"):
+                    df_recuperar_mapa = montar_mapa_lojistas_recuperar(chave_versao, dt.now().date(), cubos)
+                    if not df_recuperar_mapa.empty:
                         df_recuperar_mapa = df_recuperar_mapa.dropna(subset=["latitude", "longitude"])
                         
                         if not df_recuperar_mapa.empty:
                             with st.spinner("Gerando mapa de lojistas a recuperar..."):
                                 fig_recuperar = go.Figure(go.Scattermap(
-                                    lat=df_recuperar_mapa["latitude"],
-                                    lon=df_recuperar_mapa["longitude"],
+                                    lat=df_recuperar_mapa["latitude_mapa"],
+                                    lon=df_recuperar_mapa["longitude_mapa"],
                                     mode='markers',
                                     hovertemplate=
                                     '<b>Cliente</b>: %{customdata[0]}<br>'+
@@ -1120,7 +1021,7 @@ try:
                                     mapbox_style="dark",
                                     mapbox=dict(
                                         zoom=3,
-                                        center=dict(lat=df_recuperar_mapa["latitude"].mean(), lon=df_recuperar_mapa["longitude"].mean())
+                                        center=dict(lat=df_recuperar_mapa["latitude_mapa"].mean(), lon=df_recuperar_mapa["longitude_mapa"].mean())
                                     ),
                                     uirevision="constant",
                                     font=dict(size=10),
@@ -1149,110 +1050,114 @@ try:
                         st.info("Não há lojistas a recuperar no momento. Lojistas a recuperar são aqueles com mais de 3 pedidos e mais de 3 meses sem comprar.")
                 
                 # Gráficos de distribuição geográfica
-                try:
-                    st.subheader("Análise de Distribuição Geográfica")
-                    
-                    regioes_dict = {
-                        'AC': 'Norte', 'AP': 'Norte', 'AM': 'Norte', 'PA': 'Norte', 'RO': 'Norte', 'RR': 'Norte', 'TO': 'Norte',
-                        'AL': 'Nordeste', 'BA': 'Nordeste', 'CE': 'Nordeste', 'MA': 'Nordeste', 'PB': 'Nordeste', 'PE': 'Nordeste', 'PI': 'Nordeste', 'RN': 'Nordeste', 'SE': 'Nordeste',
-                        'ES': 'Sudeste', 'MG': 'Sudeste', 'RJ': 'Sudeste', 'SP': 'Sudeste',
-                        'PR': 'Sul', 'RS': 'Sul', 'SC': 'Sul',
-                        'DF': 'Centro-Oeste', 'GO': 'Centro-Oeste', 'MT': 'Centro-Oeste', 'MS': 'Centro-Oeste'
-                    }
-                    
-                    df_mapa['Regiao'] = df_mapa['Estado_Corrigido'].map(regioes_dict)
-                    
-                    col_pie1, col_pie2 = st.columns([1, 1])
-                    
-                    with col_pie1:
-                        clientes_regiao = df_mapa['Regiao'].value_counts().reset_index()
-                        clientes_regiao.columns = ['Região', 'Número de Clientes']
+                with medir("grafico/distribuicao_geografica"):
+                    try:
+                        st.subheader("Análise de Distribuição Geográfica")
                         
-                        fig_regiao = px.pie(clientes_regiao, names='Região', values='Número de Clientes',
-                                           template='plotly_dark',
-                                           color_discrete_sequence=['#FF8C00', '#FFA500', '#E94F37', '#F7DC6F', '#BB8FCE'])
-                        fig_regiao.update_traces(textinfo='percent+label', textposition='inside')
-                        fig_regiao.update_layout(
-                            font=dict(size=10),
-                            margin=dict(l=10, r=10, t=30, b=10),
-                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                            height=400,
-                            autosize=True
-                        )
-                        st.plotly_chart(fig_regiao, width="stretch")
-                        logger.info("✅ Gráfico de distribuição por região criado")
-                    
-                    with col_pie2:
-                        clientes_estado = df_mapa['Estado_Corrigido'].value_counts().reset_index()
-                        clientes_estado.columns = ['Estado', 'Número de Clientes']
-                        top_estados = clientes_estado.head(10)
+                        regioes_dict = {
+                            'AC': 'Norte', 'AP': 'Norte', 'AM': 'Norte', 'PA': 'Norte', 'RO': 'Norte', 'RR': 'Norte', 'TO': 'Norte',
+                            'AL': 'Nordeste', 'BA': 'Nordeste', 'CE': 'Nordeste', 'MA': 'Nordeste', 'PB': 'Nordeste', 'PE': 'Nordeste', 'PI': 'Nordeste', 'RN': 'Nordeste', 'SE': 'Nordeste',
+                            'ES': 'Sudeste', 'MG': 'Sudeste', 'RJ': 'Sudeste', 'SP': 'Sudeste',
+                            'PR': 'Sul', 'RS': 'Sul', 'SC': 'Sul',
+                            'DF': 'Centro-Oeste', 'GO': 'Centro-Oeste', 'MT': 'Centro-Oeste', 'MS': 'Centro-Oeste'
+                        }
+                        
+                        df_mapa['Regiao'] = df_mapa['Estado_Corrigido'].map(regioes_dict)
+                        consultas.registrar_dataframe(con_vendas, df_mapa[['Regiao', 'Estado_Corrigido']], consultas.TABELA_MAPA, colunas=None)
+                        
+                        col_pie1, col_pie2 = st.columns([1, 1])
+                        
+                        with col_pie1:
+                            clientes_regiao = consultas.contagem_clientes(con_vendas, 'Regiao')
+                            clientes_regiao.columns = ['Região', 'Número de Clientes']
+                            
+                            fig_regiao = px.pie(clientes_regiao, names='Região', values='Número de Clientes',
+                                               template='plotly_dark',
+                                               color_discrete_sequence=['#FF8C00', '#FFA500', '#E94F37', '#F7DC6F', '#BB8FCE'])
+                            fig_regiao.update_traces(textinfo='percent+label', textposition='inside')
+                            fig_regiao.update_layout(
+                                font=dict(size=10),
+                                margin=dict(l=10, r=10, t=30, b=10),
+                                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                                height=400,
+                                autosize=True
+                            )
+                            st.plotly_chart(fig_regiao, width="stretch")
+                            logger.info("✅ Gráfico de distribuição por região criado")
+                        
+                        with col_pie2:
+                            clientes_estado = consultas.contagem_clientes(con_vendas, 'Estado_Corrigido')
+                            clientes_estado.columns = ['Estado', 'Número de Clientes']
+                            top_estados = clientes_estado.head(10)
+                            
+                            fig_estado = px.pie(top_estados, names='Estado', values='Número de Clientes',
+                                               template='plotly_dark',
+                                               color_discrete_sequence=px.colors.qualitative.Dark24)
+                            fig_estado.update_traces(textinfo='percent+label', textposition='inside')
+                            fig_estado.update_layout(
+                                font=dict(size=10),
+                                margin=dict(l=10, r=10, t=30, b=10),
+                                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+                                height=400,
+                                autosize=True
+                            )
+                            st.plotly_chart(fig_estado, width="stretch")
+                            logger.info("✅ Gráfico de distribuição por estado criado")
+                        
+                        # Análise de lojistas por valor
+                        st.subheader("Análise de Lojistas por Valor Total de Compras")
+                        
+                        estados_unicos = sorted(cubos[CUBO_MES_ESTADO]['Estado'].unique())
+                        estado_selecionado = st.selectbox("Selecione o estado para análise de lojistas", 
+                                                         ["Todos"] + estados_unicos,
+                                                         key="estado_lojistas")
                         
-                        fig_estado = px.pie(top_estados, names='Estado', values='Número de Clientes',
-                                           template='plotly_dark',
-                                           color_discrete_sequence=px.colors.qualitative.Dark24)
-                        fig_estado.update_traces(textinfo='percent+label', textposition='inside')
-                        fig_estado.update_layout(
+                        if estado_selecionado != "Todos":
+                            top_lojistas = consultas.top_lojistas(con_vendas, estado_selecionado, n=10)
+                            titulo_grafico = f"Top 10 Lojistas - {estado_selecionado}"
+                        else:
+                            top_lojistas = consultas.top_lojistas(con_vendas, n=10)
+                            titulo_grafico = "Top 10 Lojistas - Todos os Estados"
+                        
+                        fig_lojistas = px.bar(top_lojistas, 
+                                             x='Cliente', 
+                                             y='Valor Total Pedido',
+                                             title=titulo_grafico,
+                                             template='plotly_dark',
+                                             color_discrete_sequence=['#FF8C00'])
+                        
+                        fig_lojistas.update_layout(
+                            xaxis_title="Lojista",
+                            yaxis_title="Valor Total de Compras (R$)",
                             font=dict(size=10),
                             margin=dict(l=10, r=10, t=30, b=10),
-                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-                            height=400,
-                            autosize=True
+                            xaxis_tickangle=-45
                         )
-                        st.plotly_chart(fig_estado, width="stretch")
-                        logger.info("✅ Gráfico de distribuição por estado criado")
-                    
-                    # Análise de lojistas por valor
-                    st.subheader("Análise de Lojistas por Valor Total de Compras")
-                    
-                    estados_unicos = sorted(df['Estado'].unique())
-                    estado_selecionado = st.selectbox("Selecione o estado para análise de lojistas", 
-                                                     ["Todos"] + estados_unicos,
-                                                     key="estado_lojistas")
-                    
-                    df_lojistas = df.groupby(['Cliente', 'Estado'])['Valor Total Pedido'].sum().reset_index()
-                    
-                    if estado_selecionado != "Todos":
-                        df_lojistas_filtrado = df_lojistas[df_lojistas['Estado'] == estado_selecionado]
-                        titulo_grafico = f"Top 10 Lojistas - {estado_selecionado}"
-                    else:
-                        df_lojistas_filtrado = df_lojistas
-                        titulo_grafico = "Top 10 Lojistas - Todos os Estados"
-                    
-                    top_lojistas = df_lojistas_filtrado.sort_values(by='Valor Total Pedido', ascending=False).head(10)
-                    
-                    fig_lojistas = px.bar(top_lojistas, 
-                                         x='Cliente', 
-                                         y='Valor Total Pedido',
-                                         title=titulo_grafico,
-                                         template='plotly_dark',
-                                         color_discrete_sequence=['#FF8C00'])
-                    
-                    fig_lojistas.update_layout(
-                        xaxis_title="Lojista",
-                        yaxis_title="Valor Total de Compras (R$)",
-                        font=dict(size=10),
-                        margin=dict(l=10, r=10, t=30, b=10),
-                        xaxis_tickangle=-45
-                    )
-                    
-                    fig_lojistas.update_traces(texttemplate='R$ %{y:,.2f}', textposition='outside')
-                    
-                    st.plotly_chart(fig_lojistas, width="stretch")
-                    
-                    st.subheader("Dados Detalhados dos Lojistas")
-                    st.dataframe(top_lojistas.style.format({'Valor Total Pedido': 'R$ {:,.2f}'}), width="stretch")
-                    logger.info("✅ Análise de lojistas criada")
-                    
-                except Exception as e:
-                    logger.error(f"Erro na análise de distribuição geográfica: {e}")
-                    st.error(f"Erro na análise de distribuição geográfica: {e}")
+                        
+                        fig_lojistas.update_traces(texttemplate='R$ %{y:,.2f}', textposition='outside')
+                        
+                        st.plotly_chart(fig_lojistas, width="stretch")
+                        
+                        st.subheader("Dados Detalhados dos Lojistas")
+                        st.dataframe(top_lojistas.style.format({'Valor Total Pedido': 'R$ {:,.2f}'}), width="stretch")
+                        logger.info("✅ Análise de lojistas criada")
+                        
+                    except Exception as e:
+                        logger.error(f"Erro na análise de distribuição geográfica: {e}")
+                        st.error(f"Erro na análise de distribuição geográfica: {e}")
                 
             except Exception as e:
                 logger.error(f"Erro na aba Análise de Clientes: {e}")
                 st.error(f"Erro na aba Análise de Clientes: {e}")
         
+        with tab2:
+            if tab2.open:
+                aba_analise_clientes()
+        
         # ===== ABA 3: CÁLCULO DE META =====
-        with tab3:
+        @st.fragment
+        @medido("aba/calculo_meta")
+        def aba_calculo_meta():
             try:
                 st.subheader("CÁLCULO DE META")
                 
@@ -1270,10 +1175,7 @@ try:
                     )
                 
                 with col_mes:
-                    if ano_meta:
-                        meses_disponiveis = sorted(df[df["Data"].dt.year == ano_meta]["Data"].dt.month.unique())
-                    else:
-                        meses_disponiveis = sorted(df["Data"].dt.month.unique())
+                    meses_disponiveis = meses_do_ano(chave_versao, df, ano_meta)
                     
                     nomes_meses = [calendar.month_name[mes] for mes in meses_disponiveis]
                     
@@ -1293,19 +1195,16 @@ try:
                 
                 st.markdown('</div>', unsafe_allow_html=True)
                 
-                if mes_meta_num == 1:
-                    inicio_meta = dt(ano_meta - 1, 12, 26).replace(hour=0, minute=0, second=0)
-                    fim_meta = dt(ano_meta, 1, 25).replace(hour=23, minute=59, second=59)
-                else:
-                    inicio_meta = dt(ano_meta, mes_meta_num - 1, 26).replace(hour=0, minute=0, second=0)
-                    fim_meta = dt(ano_meta, mes_meta_num, 25).replace(hour=23, minute=59, second=59)
+                # A meta leva o nome do mês em que termina: 26 do mês anterior até 25
+                periodo_meta = pd.Period(year=ano_meta, month=mes_meta_num, freq="M")
+                inicio_meta, fim_meta = limites_periodo_meta(periodo_meta)
                 
                 # Calcular dados da meta
-                df_meta = df[(df["Data"] >= inicio_meta) & (df["Data"] <= fim_meta)].copy()
-                total_pedidos = len(df_meta)
-                pedidos_unicos = df_meta['Número do Pedido'].nunique()
+                totais = consultas.totais_meta(con_vendas, inicio_meta, fim_meta)
+                total_pedidos = totais["total_pedidos"]
+                pedidos_unicos = totais["pedidos_unicos"]
                 duplicatas = total_pedidos - pedidos_unicos
-                valor_total_vendido = df_meta['Valor Total Pedido'].sum()
+                valor_total_vendido = totais["valor_total_vendido"]
                 
                 meta_total = 200_000
                 percentual_meta = min(1.0, valor_total_vendido / meta_total)
@@ -1335,10 +1234,9 @@ try:
                     valor_diario_necessario = 0
                     cor_valor_esperado = "black"
                 else:
-                    cal = Brazil()
-                    dias_uteis_total = cal.get_working_days_delta(inicio_meta.date(), fim_meta.date())
+                    dias_uteis_total = dias_uteis_entre(inicio_meta.date(), fim_meta.date())
                     
-                    dias_uteis_passados = cal.get_working_days_delta(inicio_meta.date(), hoje)
+                    dias_uteis_passados = dias_uteis_entre(inicio_meta.date(), hoje)
                     
                     dias_uteis_faltantes = dias_uteis_total - dias_uteis_passados
                     
@@ -1377,53 +1275,54 @@ try:
                     st.markdown(f"R$ {valor_diario_necessario:,.2f}")
                 
                 # Cálculo de comissões
-                try:
-                    resultados, valor_total_vendido, meta_atingida = calcular_comissoes_e_bonus(df, inicio_meta, fim_meta)
-                    
-                    st.subheader("Detalhamento dos Cálculos")
-                    st.dataframe(resultados.style.format({'Valor (R$)': 'R$ {:,.2f}'}), width="stretch")
-                    
-                    st.markdown('<div class="ganhos-destaque">', unsafe_allow_html=True)
-                    st.markdown("### Ganhos Estimados")
-                    ganhos_totais = resultados.iloc[-1, 1]
-                    st.markdown(f'<div class="ganhos-valor">R$ {ganhos_totais:,.2f}</div>', unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    logger.info("✅ Cálculo de meta e comissões criado")
-                    
-                except Exception as e:
-                    logger.error(f"Erro no cálculo de comissões: {e}")
-                    st.error(f"Erro no cálculo de comissões: {e}")
+                with medir("meta/comissoes"):
+                    try:
+                        resultados, valor_total_vendido, meta_atingida = calcular_comissoes_e_bonus(cubos[CUBO_DIA_PRODUTO], inicio_meta, fim_meta)
+                        
+                        st.subheader("Detalhamento dos Cálculos")
+                        st.dataframe(resultados.style.format({'Valor (R$)': 'R$ {:,.2f}'}), width="stretch")
+                        
+                        st.markdown('<div class="ganhos-destaque">', unsafe_allow_html=True)
+                        st.markdown("### Ganhos Estimados")
+                        ganhos_totais = resultados.iloc[-1, 1]
+                        st.markdown(f'<div class="ganhos-valor">R$ {ganhos_totais:,.2f}</div>', unsafe_allow_html=True)
+                        st.markdown('</div>', unsafe_allow_html=True)
+                        logger.info("✅ Cálculo de meta e comissões criado")
+                        
+                    except Exception as e:
+                        logger.error(f"Erro no cálculo de comissões: {e}")
+                        st.error(f"Erro no cálculo de comissões: {e}")
                 
                 # Tabela de pedidos
-                try:
-                    if st.button("Mostrar Tabela de Pedidos da Meta Atual"):
-                        if mes_selecionado_num == 1:
-                            inicio_meta_tabela = dt(ano_meta - 1, 12, 26).replace(hour=0, minute=0, second=0)
-                            fim_meta_tabela = dt(ano_meta, 1, 25).replace(hour=23, minute=59, second=59)
-                        else:
-                            inicio_meta_tabela = dt(ano_meta, mes_meta_num - 1, 26).replace(hour=0, minute=0, second=0)
-                            fim_meta_tabela = dt(ano_meta, mes_meta_num, 25).replace(hour=23, minute=59, second=59)
-                        
-                        tabela_pedidos = gerar_tabela_pedidos_meta_atual(df, inicio_meta_tabela, fim_meta_tabela)
-                        if not tabela_pedidos.empty:
-                            st.subheader(f"Tabela de Pedidos da Meta Atual ({inicio_meta_tabela.strftime('%d/%m/%Y')} a {fim_meta_tabela.strftime('%d/%m/%Y')})")
-                            
-                            verificar_duplicatas(tabela_pedidos)
-                            st.dataframe(tabela_pedidos.style.format({'Valor do Pedido': 'R$ {:,.2f}'}), width="stretch")
+                with medir("meta/tabela_pedidos"):
+                    try:
+                        if st.button("Mostrar Tabela de Pedidos da Meta Atual"):
+                            inicio_meta_tabela, fim_meta_tabela = limites_periodo_meta(periodo_meta)
                             
-                            total_unico = tabela_pedidos['Valor do Pedido'].sum()
-                            st.caption(f"Valor total de pedidos únicos: R$ {total_unico:,.2f}")
-                        else:
-                            st.warning("Não há pedidos no período da meta atual.")
-                        logger.info("✅ Tabela de pedidos criada")
-                    
-                except Exception as e:
-                    logger.error(f"Erro ao criar tabela de pedidos: {e}")
-                    st.error(f"Erro ao criar tabela de pedidos: {e}")
+                            tabela_pedidos = gerar_tabela_pedidos_meta_atual(cubos[CUBO_PEDIDOS], inicio_meta_tabela, fim_meta_tabela)
+                            if not tabela_pedidos.empty:
+                                st.subheader(f"Tabela de Pedidos da Meta Atual ({inicio_meta_tabela.strftime('%d/%m/%Y')} a {fim_meta_tabela.strftime('%d/%m/%Y')})")
+                                
+                                verificar_duplicatas(tabela_pedidos)
+                                st.dataframe(tabela_pedidos.style.format({'Valor do Pedido': 'R$ {:,.2f}'}), width="stretch")
+                                
+                                total_unico = tabela_pedidos['Valor do Pedido'].sum()
+                                st.caption(f"Valor total de pedidos únicos: R$ {total_unico:,.2f}")
+                            else:
+                                st.warning("Não há pedidos no período da meta atual.")
+                            logger.info("✅ Tabela de pedidos criada")
+                        
+                    except Exception as e:
+                        logger.error(f"Erro ao criar tabela de pedidos: {e}")
+                        st.error(f"Erro ao criar tabela de pedidos: {e}")
                 
             except Exception as e:
                 logger.error(f"Erro na aba Cálculo de Meta: {e}")
                 st.error(f"Erro na aba Cálculo de Meta: {e}")
+        
+        with tab3:
+            if tab3.open:
+                aba_calculo_meta()
     
     else:
         st.warning("⚠️ Nenhum dado disponível. Verifique a configuração do Google Drive.")
@@ -1437,4 +1336,14 @@ except Exception as e:
     st.error(f"❌ Erro crítico: {str(e)}")
     st.write("Detalhes do erro:")
     st.write(f"Tipo: {type(e).__name__}")
-    st.write(f"Mensagem: {str(e)}")
\ No newline at end of file
+    st.write(f"Mensagem: {str(e)}")
+# ===== PERFIL DA EXECUÇÃO =====
+# Trechos medidos neste rerun e p50/p95 da janela móvel do processo
+# (medicoes.py). Reruns só de fragmento (filtros dentro de uma aba) não
+# passam por aqui, mas entram nos percentis e no arquivo de medições.
+execucao.encerrar()
+if st.sidebar.checkbox("⏱️ Perfil da execução", key="mostrar_perfil"):
+    st.sidebar.caption(f"Último rerun: {execucao.total * 1000:.0f} ms")
+    st.sidebar.dataframe(execucao.detalhamento(), hide_index=True, width="stretch")
+    st.sidebar.caption("p50/p95 dos últimos reruns")
+    st.sidebar.dataframe(percentis(), hide_index=True, width="stretch")
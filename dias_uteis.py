@@ -0,0 +1,119 @@
+import os
+import json
+import logging
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+from workalendar.america import Brazil
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURAÇÃO =====
+CAMINHO_DIAS_UTEIS = os.path.join("cache", "dias_uteis.json")
+
+# Tabela em memória: ano inicial, dia inicial e contagem acumulada de dias
+# úteis (acumulado[i] = dias úteis de inicio até inicio + i, inclusive).
+# Nunca é alterada no lugar: garantir_anos monta uma tabela nova e troca a
+# referência numa só atribuição, de modo que uma consulta em outra thread
+# vê a tabela antiga inteira ou a nova inteira. _trava serializa só as
+# extensões (cálculo e gravação do arquivo).
+_tabela = {"caminho": None, "anos": {}, "inicio": None, "acumulado": None}
+_trava = threading.Lock()
+
+
+# ===== PERSISTÊNCIA =====
+# O arquivo guarda, por ano, uma string de '0'/'1' com um caractere por dia
+# (1 = dia útil no calendário Brazil do workalendar)
+
+def _ler_anos(caminho):
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f).get("anos", {})
+    except Exception as e:
+        logger.warning(f"Tabela de dias úteis ilegível: {e}")
+        return {}
+
+def _salvar_anos(caminho, anos):
+    try:
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"calendario": "Brazil", "anos": anos}, f)
+        os.replace(temporario, caminho)
+    except Exception as e:
+        logger.warning(f"Não foi possível salvar a tabela de dias úteis: {e}")
+
+def _dias_uteis_do_ano(cal, ano):
+    dia = date(ano, 1, 1)
+    flags = []
+    while dia.year == ano:
+        flags.append("1" if cal.is_working_day(dia) else "0")
+        dia += timedelta(days=1)
+    return "".join(flags)
+
+
+# ===== TABELA ACUMULADA =====
+
+def garantir_anos(ano_inicio, ano_fim, caminho=CAMINHO_DIAS_UTEIS):
+    """
+    Garante a tabela cobrindo os anos [ano_inicio, ano_fim] (sem lacunas) e
+    a retorna. Anos ausentes são calculados uma única vez com workalendar e
+    gravados no arquivo; as chamadas seguintes só consultam a memória.
+    """
+    global _tabela
+    with _trava:
+        atual = _tabela
+        anos = dict(atual["anos"]) if atual["caminho"] == caminho else _ler_anos(caminho)
+        existentes = [int(a) for a in anos]
+        ano_inicio = min([ano_inicio, *existentes])
+        ano_fim = max([ano_fim, *existentes])
+        faltantes = [a for a in range(ano_inicio, ano_fim + 1) if str(a) not in anos]
+
+        if not faltantes and atual["caminho"] == caminho and atual["acumulado"] is not None:
+            return atual
+
+        if faltantes:
+            cal = Brazil()
+            for ano in faltantes:
+                anos[str(ano)] = _dias_uteis_do_ano(cal, ano)
+            _salvar_anos(caminho, anos)
+            logger.info(f"📅 Dias úteis calculados para {faltantes[0]}–{faltantes[-1]}")
+
+        flags = "".join(anos[str(a)] for a in range(ano_inicio, ano_fim + 1))
+        _tabela = {
+            "caminho": caminho,
+            "anos": anos,
+            "inicio": date(ano_inicio, 1, 1),
+            "acumulado": np.cumsum(np.frombuffer(flags.encode("ascii"), dtype=np.uint8) - ord("0"), dtype=np.int32),
+        }
+        return _tabela
+
+def _como_data(dia):
+    return dia.date() if isinstance(dia, datetime) else dia
+
+def _cobre(tabela, inicio, fim, caminho):
+    return (
+        tabela["caminho"] == caminho
+        and tabela["acumulado"] is not None
+        and inicio >= tabela["inicio"]
+        and (fim - tabela["inicio"]).days < len(tabela["acumulado"])
+    )
+
+def dias_uteis_entre(inicio, fim, caminho=CAMINHO_DIAS_UTEIS):
+    """
+    Mesmo resultado de Brazil().get_working_days_delta(inicio, fim): dias
+    úteis em (inicio, fim], independente da ordem dos argumentos, em O(1).
+    Anos fora da tabela são acrescentados na primeira consulta.
+    """
+    inicio, fim = sorted((_como_data(inicio), _como_data(fim)))
+    tabela = _tabela
+    if not _cobre(tabela, inicio, fim, caminho):
+        tabela = garantir_anos(inicio.year, fim.year, caminho)
+
+    base = tabela["inicio"]
+    acumulado = tabela["acumulado"]
+    return int(acumulado[(fim - base).days] - acumulado[(inicio - base).days])
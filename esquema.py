@@ -0,0 +1,131 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ===== ESQUEMA DO DATAFRAME DE VENDAS =====
+
+COLUNA_DATA = "Data"
+
+# Texto com poucos valores distintos em relação ao número de linhas
+COLUNAS_CATEGORICAS = ["Cliente", "Produto", "Cidade", "Estado", "Telefone", "Número do Pedido"]
+LIMITE_CARDINALIDADE = 0.5  # distintos / linhas; acima disso a coluna fica como texto
+
+# Colunas inteiras que cabem em int32 sem perda
+COLUNAS_INTEIRAS = ["Quantidade", "Quantidade Pedido", "Número do Pedido"]
+
+# Valores monetários continuam float64: float32 tem ~7 dígitos significativos,
+# insuficiente para somas em reais com centavos
+
+
+def _inteiro_seguro(serie):
+    """
+    True quando todos os valores são inteiros finitos dentro da faixa do int32
+    """
+    if not pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        return False
+    valores = serie.to_numpy(dtype=float, na_value=np.nan)
+    if len(valores) == 0 or not np.isfinite(valores).all():
+        return False
+    info = np.iinfo(np.int32)
+    return bool((valores == np.round(valores)).all() and valores.min() >= info.min and valores.max() <= info.max)
+
+def aplicar_esquema(df):
+    """
+    Aplica o esquema declarado: datetime64 para Data, int32 onde não há
+    perda, categorias para texto de baixa cardinalidade. Registra no log
+    a memória economizada.
+    """
+    if df.empty:
+        return df
+
+    memoria_antes = df.memory_usage(deep=True).sum()
+    df = df.copy(deep=False)
+
+    if COLUNA_DATA in df.columns:
+        df[COLUNA_DATA] = pd.to_datetime(df[COLUNA_DATA], errors="coerce").astype("datetime64[ns]")
+
+    for coluna in COLUNAS_INTEIRAS:
+        if coluna in df.columns and _inteiro_seguro(df[coluna]):
+            df[coluna] = df[coluna].astype(np.int32)
+
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna not in df.columns:
+            continue
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            # Já categórica desde os chunks (categorizar_texto): volta a
+            # texto se passar do limite no conjunto, como faria sem os chunks
+            if len(df[coluna].cat.categories) > LIMITE_CARDINALIDADE * len(df):
+                df[coluna] = df[coluna].astype("str")
+            continue
+        if pd.api.types.is_numeric_dtype(df[coluna]):
+            continue
+        if df[coluna].nunique(dropna=True) <= LIMITE_CARDINALIDADE * len(df):
+            df[coluna] = df[coluna].astype("category")
+
+    memoria_depois = df.memory_usage(deep=True).sum()
+    logger.info(
+        f"💾 Esquema aplicado: {memoria_antes / 2**20:.1f} MB -> {memoria_depois / 2**20:.1f} MB "
+        f"({(1 - memoria_depois / max(memoria_antes, 1)) * 100:.0f}% de economia)"
+    )
+    return df
+
+def categorizar_texto(df):
+    """
+    Categorias para as colunas de COLUNAS_CATEGORICAS em texto, sem o
+    limite de cardinalidade (conferido depois, no conjunto, por
+    aplicar_esquema). Aplicada a cada chunk da ingestão, para que até o
+    conjunto ficar pronto a memória guarde os códigos e só uma cópia de
+    cada texto distinto do chunk.
+    """
+    novas = {
+        coluna: df[coluna].astype("category")
+        for coluna in COLUNAS_CATEGORICAS
+        if coluna in df.columns
+        and not isinstance(df[coluna].dtype, pd.CategoricalDtype)
+        and not pd.api.types.is_numeric_dtype(df[coluna])
+    }
+    return df.assign(**novas) if novas else df
+
+def concatenar(partes):
+    """
+    pd.concat que mantém as colunas categóricas: as categorias de cada
+    coluna são unidas (em ordem, como no astype("category")) e os códigos
+    de cada parte são remapeados para a união; o concat puro devolveria
+    texto quando as categorias diferem entre as partes
+    """
+    if len(partes) < 2:
+        return pd.concat(partes, ignore_index=True)
+    categoricas = [
+        coluna for coluna, dtype in partes[0].dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+        and all(coluna in parte.columns and isinstance(parte[coluna].dtype, pd.CategoricalDtype) for parte in partes)
+    ]
+    unidas = {}
+    for coluna in categoricas:
+        categorias = pd.Index(pd.unique(np.concatenate([parte[coluna].cat.categories.to_numpy() for parte in partes]))).sort_values()
+        codigos = []
+        for parte in partes:
+            # Posição de cada categoria da parte na união; -1 (ausente) continua -1
+            mapa = np.append(categorias.get_indexer(parte[coluna].cat.categories), -1)
+            codigos.append(mapa[parte[coluna].cat.codes.to_numpy()])
+        unidas[coluna] = pd.Categorical.from_codes(np.concatenate(codigos), dtype=pd.CategoricalDtype(categorias))
+    # As demais colunas pelo concat; as categóricas montadas uma vez cada
+    df = pd.concat([parte.drop(columns=categoricas) for parte in partes], ignore_index=True)
+    return df.assign(**unidas)[list(partes[0].columns)]
+
+def relatorio_memoria(df_original, df_tipado):
+    """
+    Memória por coluna (bytes, deep=True) antes e depois do esquema
+    """
+    antes = df_original.memory_usage(deep=True, index=False)
+    depois = df_tipado.memory_usage(deep=True, index=False)
+    relatorio = pd.DataFrame({
+        "dtype_antes": df_original.dtypes.astype(str),
+        "dtype_depois": df_tipado.dtypes.astype(str),
+        "MB_antes": antes / 2**20,
+        "MB_depois": depois / 2**20,
+    })
+    relatorio["economia_%"] = (1 - relatorio["MB_depois"] / relatorio["MB_antes"].where(relatorio["MB_antes"] > 0)) * 100
+    return relatorio.round(2)
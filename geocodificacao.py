@@ -0,0 +1,501 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from fuzzywuzzy import process, fuzz, utils
+from medicoes import medir
+
+try:
+    from rapidfuzz import process as rf_process, fuzz as rf_fuzz
+    RAPIDFUZZ_DISPONIVEL = True
+except ImportError:
+    RAPIDFUZZ_DISPONIVEL = False
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURAÇÃO =====
+CAMINHO_CACHE_GEOCODIFICACAO = os.path.join("cache", "geocodificacao.json")
+COORDENADAS_PADRAO = (-15.7801, -47.9292)  # Brasília, usado quando nem o estado é reconhecido
+LINHAS_POR_MATRIZ = 1000  # consultas por chamada de cdist, limita a matriz a ~45 MB
+MINIMO_PARA_PROCESSOS = 200  # abaixo disso o pool de processos custa mais do que economiza
+
+# Cache em memória do arquivo em disco, reaproveitado entre reruns do Streamlit
+_cache_memoria = {}
+
+
+# ===== NORMALIZAÇÃO E BUSCA =====
+
+# Caracteres da categoria Mn (marcas combinantes) removidos depois do NFD.
+# Em vez de filtrar caractere a caractere com unicodedata.category, cada
+# caractere distinto é classificado uma única vez, na primeira string que
+# o traz, e as marcas já vistas são removidas por uma regex. Texto ASCII
+# não muda no NFD e não tem marcas.
+_marcas = set()
+_caracteres_vistos = set()
+_padrao_marcas = None
+
+def _registrar_marcas(texto):
+    global _padrao_marcas
+    novos = set(texto) - _caracteres_vistos
+    if not novos:
+        return
+    marcas = {c for c in novos if unicodedata.category(c) == 'Mn'}
+    _caracteres_vistos.update(novos)
+    if marcas:
+        _marcas.update(marcas)
+        _padrao_marcas = re.compile("[" + "".join(re.escape(c) for c in sorted(_marcas)) + "]")
+
+@lru_cache(maxsize=65536)
+def _normalizar_str(text):
+    if text.isascii():
+        return text.strip().upper()
+    decomposto = unicodedata.normalize('NFD', text)
+    _registrar_marcas(decomposto)
+    if _padrao_marcas is not None:
+        decomposto = _padrao_marcas.sub("", decomposto)
+    return decomposto.strip().upper()
+
+def _limpar_normalizacao():
+    """
+    Esquece a memoização e as marcas vistas (estado do início do processo)
+    """
+    global _padrao_marcas
+    _normalizar_str.cache_clear()
+    _marcas.clear()
+    _caracteres_vistos.clear()
+    _padrao_marcas = None
+
+def normalize_text(text):
+    if pd.isna(text):
+        return ""
+    return _normalizar_str(str(text))
+
+def normalizar_serie(serie):
+    """
+    Versão vetorizada de normalize_text para uma Series inteira.
+    Normaliza só os valores distintos (NFD + tabela de tradução, memoizado) e
+    espalha o resultado pelos códigos do factorize, então 1M de linhas com
+    poucas cidades custa praticamente o mesmo que a lista de cidades distintas.
+    O upper é feito pelo Python e não pelo str accessor porque o backend Arrow
+    de strings difere em casos como "ß".
+    """
+    serie = pd.Series(serie)
+    codigos, unicos = pd.factorize(serie)
+    normalizados = [_normalizar_str(str(valor)) for valor in unicos.tolist()]
+    # Valores ausentes recebem código -1, que aponta para o "" final
+    valores = np.array(normalizados + [""], dtype=object)
+    return pd.Series(valores[codigos], index=serie.index, dtype=object)
+
+def find_closest_city_with_state(city, state, city_list, municipios_df, estados_df, threshold=70, indice=None):
+    """
+    Busca o município mais próximo, primeiro dentro do estado e depois no país.
+    Recebe o índice de construir_indice_municipios; sem ele o índice é montado
+    na hora, o que só compensa para chamadas isoladas.
+    """
+    if not city or city == "DESCONHECIDO":
+        return None, None, None
+
+    if indice is None:
+        indice = construir_indice_municipios(municipios_df, estados_df)
+
+    normalized_city = normalize_text(city)
+    normalized_state = normalize_text(state) if state else None
+    tamanho_consulta = len(forma_ordenada(normalized_city))
+
+    estado_codigo = None
+    if normalized_state:
+        estado_codigo = get_estado_codigo(normalized_state, estados_df, indice=indice)
+        bloco = indice["por_uf"].get(estado_codigo) if estado_codigo is not None else None
+        if bloco is not None:
+            posicao = _melhor_candidato(normalized_city, tamanho_consulta, bloco, threshold)
+            if posicao is not None:
+                return bloco["nomes"][posicao], bloco["latitudes"][posicao], bloco["longitudes"][posicao]
+            # A busca no país só aceitaria um município deste mesmo estado,
+            # que já foi avaliado acima sem atingir o threshold
+            return None, None, None
+
+    bloco = indice["pais"]
+    posicao = _melhor_candidato(normalized_city, tamanho_consulta, bloco, threshold)
+    if posicao is not None:
+        if estado_codigo is not None and bloco["codigos_uf"][posicao] != estado_codigo:
+            return None, None, None
+        return bloco["nomes"][posicao], bloco["latitudes"][posicao], bloco["longitudes"][posicao]
+
+    return None, None, None
+
+def get_estado_codigo(estado_normalizado, estados_df, indice=None):
+    if indice is not None:
+        return indice["uf_por_sigla"].get(estado_normalizado)
+    estado_info = estados_df[estados_df['uf_normalizado'] == estado_normalizado]
+    if not estado_info.empty:
+        return estado_info.iloc[0]['codigo_uf']
+    return None
+
+
+# ===== ARQUIVOS DE REFERÊNCIA =====
+
+def ler_referencias(caminho_municipios="municipios.csv", caminho_estados="estados.csv"):
+    """
+    Municípios e estados com os nomes normalizados, a assinatura dos
+    arquivos (chave do cache em disco) e o índice de busca.
+    Retorna (estados_df, municipios_df, city_list, assinatura, indice).
+    """
+    estados_df = pd.read_csv(caminho_estados)
+    municipios_df = pd.read_csv(caminho_municipios)
+
+    municipios_df["nome_normalizado"] = normalizar_serie(municipios_df["nome"])
+    city_list = municipios_df["nome_normalizado"].tolist()
+
+    estados_df["uf_normalizado"] = normalizar_serie(estados_df["uf"])
+    assinatura = assinatura_arquivos(caminho_municipios, caminho_estados)
+    indice = construir_indice_municipios(municipios_df, estados_df)
+    return estados_df, municipios_df, city_list, assinatura, indice
+
+
+# ===== ÍNDICE DE MUNICÍPIOS =====
+
+def forma_ordenada(texto):
+    """
+    Mesma transformação aplicada por fuzz.token_sort_ratio antes de comparar
+    """
+    return " ".join(sorted(utils.full_process(texto, force_ascii=True).split()))
+
+def _montar_bloco(municipios):
+    nomes = municipios["nome_normalizado"].tolist()
+    formas = [forma_ordenada(nome) for nome in nomes]
+    posicao = {}
+    for i, nome in enumerate(nomes):
+        posicao.setdefault(nome, i)
+    return {
+        "nomes": nomes,
+        "formas": formas,
+        "tamanhos": np.array([len(forma) for forma in formas], dtype=np.int32),
+        "latitudes": municipios["latitude"].to_numpy(dtype=float),
+        "longitudes": municipios["longitude"].to_numpy(dtype=float),
+        "codigos_uf": municipios["codigo_uf"].to_numpy(),
+        "posicao": posicao,
+    }
+
+def construir_indice_municipios(municipios_df, estados_df):
+    """
+    Índice em memória montado uma única vez ao carregar os CSVs de referência:
+    sigla -> codigo_uf, codigo_uf -> candidatos com coordenadas em arrays e
+    nome -> posição (primeira ocorrência, como o iloc[0] das buscas antigas).
+    """
+    uf_por_sigla = {}
+    for sigla, codigo in zip(estados_df["uf_normalizado"], estados_df["codigo_uf"]):
+        uf_por_sigla.setdefault(sigla, codigo)
+
+    por_uf = {
+        codigo: _montar_bloco(grupo)
+        for codigo, grupo in municipios_df.groupby("codigo_uf", sort=False)
+    }
+
+    return {
+        "uf_por_sigla": uf_por_sigla,
+        "por_uf": por_uf,
+        "pais": _montar_bloco(municipios_df),
+    }
+
+def _candidatos_por_tamanho(tamanho_consulta, tamanhos, threshold):
+    """
+    Bloqueio por faixa de tamanho. A razão de Levenshtein entre textos de
+    tamanhos a e b nunca passa de 2*min(a, b)/(a + b), então candidatos que
+    não alcançam o threshold nem no melhor caso são descartados sem alterar
+    o resultado do extractOne.
+    """
+    soma = tamanhos + tamanho_consulta
+    melhor_caso = np.where(soma > 0, 200.0 * np.minimum(tamanhos, tamanho_consulta) / np.maximum(soma, 1), 100.0)
+    return np.flatnonzero(melhor_caso >= threshold - 0.5)
+
+def _melhor_candidato(cidade_normalizada, tamanho_consulta, bloco, threshold):
+    posicoes = _candidatos_por_tamanho(tamanho_consulta, bloco["tamanhos"], threshold)
+    if len(posicoes) == 0:
+        return None
+    candidatos = [bloco["nomes"][i] for i in posicoes]
+    match = process.extractOne(cidade_normalizada, candidatos, scorer=fuzz.token_sort_ratio)
+    if match and match[1] >= threshold:
+        return bloco["posicao"][match[0]]
+    return None
+
+
+# ===== BUSCA EM LOTE =====
+
+def find_closest_cities_with_state(cities, states, indice, threshold=70, max_workers=None):
+    """
+    Versão em lote de find_closest_city_with_state.
+    Recebe as listas de cidades e estados e devolve um DataFrame alinhado com
+    cidade_corrigida, score, latitude e longitude (None quando não há match).
+    Com rapidfuzz instalado usa a matriz de scores do cdist (C++, multithread);
+    sem ele divide os pares distintos entre processos.
+    """
+    cidades = normalizar_serie(list(cities)).tolist()
+    estados = normalizar_serie(list(states)).tolist()
+    pares = list(dict.fromkeys(zip(cidades, estados)))
+
+    if RAPIDFUZZ_DISPONIVEL:
+        resolvidos = _resolver_pares_cdist(pares, indice, threshold)
+    else:
+        resolvidos = _resolver_pares_processos(pares, indice, threshold, max_workers)
+
+    linhas = [resolvidos[par] for par in zip(cidades, estados)]
+    return pd.DataFrame(linhas, columns=["cidade_corrigida", "score", "latitude", "longitude"])
+
+def _resolver_pares_cdist(pares, indice, threshold):
+    """
+    Reproduz as duas etapas de find_closest_city_with_state agrupando as
+    consultas por bloco (estado ou país) e pontuando cada grupo de uma vez.
+    fuzz.ratio do rapidfuzz sobre as formas ordenadas dá o mesmo valor de
+    fuzz.token_sort_ratio do fuzzywuzzy antes do arredondamento.
+    """
+    sem_match = (None, None, None, None)
+    resolvidos = {}
+    grupos = {}
+    for par in pares:
+        cidade, estado = par
+        if not cidade or cidade == "DESCONHECIDO":
+            resolvidos[par] = sem_match
+            continue
+        estado_codigo = indice["uf_por_sigla"].get(estado) if estado else None
+        grupos.setdefault(estado_codigo, []).append(par)
+
+    for estado_codigo, pares_grupo in grupos.items():
+        bloco = indice["por_uf"].get(estado_codigo) if estado_codigo is not None else None
+        conferir_estado = bloco is None and estado_codigo is not None
+        if bloco is None:
+            bloco = indice["pais"]
+
+        formas = [forma_ordenada(cidade) for cidade, _ in pares_grupo]
+        for inicio in range(0, len(formas), LINHAS_POR_MATRIZ):
+            matriz = rf_process.cdist(
+                formas[inicio:inicio + LINHAS_POR_MATRIZ], bloco["formas"],
+                scorer=rf_fuzz.ratio, processor=None, score_cutoff=threshold - 0.5,
+                dtype=np.float64, workers=-1
+            )
+            scores = np.round(matriz)
+            melhores = scores.argmax(axis=1)
+            for par, posicao, score in zip(pares_grupo[inicio:], melhores, scores[np.arange(len(melhores)), melhores]):
+                if score < threshold or (conferir_estado and bloco["codigos_uf"][posicao] != estado_codigo):
+                    resolvidos[par] = sem_match
+                else:
+                    resolvidos[par] = (bloco["nomes"][posicao], int(score),
+                                       bloco["latitudes"][posicao], bloco["longitudes"][posicao])
+    return resolvidos
+
+_indice_processo = None
+
+def _iniciar_processo(indice):
+    global _indice_processo
+    _indice_processo = indice
+
+def _resolver_pares_serial(pares, indice=None, threshold=70):
+    indice = indice if indice is not None else _indice_processo
+    resultado = []
+    for cidade, estado in pares:
+        cidade_corrigida, lat, lon = find_closest_city_with_state(
+            cidade, estado, None, None, None, threshold=threshold, indice=indice
+        )
+        if cidade_corrigida:
+            score = fuzz.token_sort_ratio(cidade, cidade_corrigida)
+            resultado.append((cidade_corrigida, score, lat, lon))
+        else:
+            resultado.append((None, None, None, None))
+    return resultado
+
+def _resolver_pares_processos(pares, indice, threshold, max_workers):
+    if len(pares) < MINIMO_PARA_PROCESSOS:
+        return dict(zip(pares, _resolver_pares_serial(pares, indice, threshold)))
+
+    workers = max_workers or os.cpu_count() or 1
+    tamanho = -(-len(pares) // workers)
+    fatias = [pares[i:i + tamanho] for i in range(0, len(pares), tamanho)]
+    logger.info(f"Geocodificando {len(pares)} pares em {len(fatias)} processos (rapidfuzz indisponível)")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_processo, initargs=(indice,)) as executor:
+        partes = executor.map(_resolver_pares_serial, fatias, [None] * len(fatias), [threshold] * len(fatias))
+        resultado = [item for parte in partes for item in parte]
+    return dict(zip(pares, resultado))
+
+
+# ===== CACHE PERSISTENTE =====
+
+def assinatura_arquivos(*caminhos):
+    """
+    Gera uma assinatura (SHA-1 do conteúdo) dos arquivos de referência.
+    Qualquer alteração em municipios.csv/estados.csv invalida o cache.
+    """
+    h = hashlib.sha1()
+    for caminho in caminhos:
+        with open(caminho, "rb") as f:
+            for bloco in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloco)
+    return h.hexdigest()
+
+def carregar_cache_geocodificacao(caminho, assinatura):
+    """
+    Lê o cache de geocodificação do disco, descartando-o se a assinatura não confere
+    """
+    chave_memoria = (caminho, assinatura)
+    if chave_memoria in _cache_memoria:
+        return _cache_memoria[chave_memoria]
+
+    entradas = {}
+    if os.path.exists(caminho):
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                conteudo = json.load(f)
+            if conteudo.get("assinatura") == assinatura:
+                entradas = conteudo.get("entradas", {})
+                logger.info(f"✅ Cache de geocodificação carregado: {len(entradas)} entradas")
+            else:
+                logger.info("Arquivos de referência alterados. Cache de geocodificação invalidado")
+        except Exception as e:
+            logger.warning(f"Cache de geocodificação ilegível, será recriado: {e}")
+
+    _cache_memoria.clear()
+    _cache_memoria[chave_memoria] = entradas
+    return entradas
+
+def salvar_cache_geocodificacao(caminho, assinatura, entradas):
+    """
+    Grava o cache de forma atômica (arquivo temporário + os.replace)
+    """
+    try:
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        # Cópia e arquivo temporário próprios: a atualização em segundo plano
+        # pode gravar ao mesmo tempo que uma sessão
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"assinatura": assinatura, "entradas": dict(entradas)}, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    except Exception as e:
+        logger.warning(f"Não foi possível salvar o cache de geocodificação: {e}")
+
+def chave_geocodificacao(cidade_normalizada, estado_normalizado):
+    return f"{cidade_normalizada}|{estado_normalizado}"
+
+
+# ===== GEOCODIFICAÇÃO EM LOTE =====
+
+def geocodificar_dataframe(df, city_list, municipios_df, estados_df, assinatura,
+                           caminho_cache=CAMINHO_CACHE_GEOCODIFICACAO, threshold=70, indice=None):
+    """
+    Adiciona Cidade_Corrigida, latitude e longitude ao DataFrame.
+    Cada par (Cidade, Estado) distinto é resolvido uma única vez e o resultado
+    fica no cache em disco, de modo que novas sessões não repetem a busca fuzzy.
+    """
+    df = df.copy()
+    cidades_norm = normalizar_serie(df["Cidade"])
+    estados_norm = normalizar_serie(df["Estado"])
+    chaves = [chave_geocodificacao(c, e) for c, e in zip(cidades_norm, estados_norm)]
+
+    entradas = carregar_cache_geocodificacao(caminho_cache, assinatura)
+
+    pendentes = {}
+    for chave, cidade, estado in zip(chaves, cidades_norm, estados_norm):
+        if chave not in entradas and chave not in pendentes:
+            pendentes[chave] = (cidade, estado)
+
+    if pendentes:
+        if indice is None:
+            indice = construir_indice_municipios(municipios_df, estados_df)
+        logger.info(f"Geocodificando {len(pendentes)} pares cidade/estado novos...")
+        cidades_pendentes = [cidade for cidade, _ in pendentes.values()]
+        estados_pendentes = [estado for _, estado in pendentes.values()]
+        matches = find_closest_cities_with_state(cidades_pendentes, estados_pendentes, indice, threshold=threshold)
+        for chave, cidade_corrigida, lat, lon in zip(pendentes, matches["cidade_corrigida"], matches["latitude"], matches["longitude"]):
+            if pd.notna(cidade_corrigida) and lat and lon:
+                entradas[chave] = [cidade_corrigida, float(lat), float(lon)]
+            else:
+                entradas[chave] = None
+        salvar_cache_geocodificacao(caminho_cache, assinatura, entradas)
+
+    resolvidos = [entradas[chave] for chave in chaves]
+    df["Cidade_Corrigida"] = [r[0] if r else None for r in resolvidos]
+    df["latitude"] = [r[1] if r else None for r in resolvidos]
+    df["longitude"] = [r[2] if r else None for r in resolvidos]
+
+    # Sem cidade reconhecida: centro do estado ou, em último caso, Brasília
+    sem_cidade = df["Cidade_Corrigida"].isna()
+    if sem_cidade.any():
+        centros = estados_df.drop_duplicates(subset=["uf_normalizado"]).set_index("uf_normalizado")
+        lat_estado = estados_norm[sem_cidade].map(centros["latitude"]).fillna(COORDENADAS_PADRAO[0])
+        lon_estado = estados_norm[sem_cidade].map(centros["longitude"]).fillna(COORDENADAS_PADRAO[1])
+        df.loc[sem_cidade, "latitude"] = lat_estado
+        df.loc[sem_cidade, "longitude"] = lon_estado
+
+    df["latitude"] = df["latitude"].astype(float)
+    df["longitude"] = df["longitude"].astype(float)
+    return df
+
+
+# ===== DISPOSIÇÃO DOS PONTOS NO MAPA =====
+
+RAIO_DISPERSAO = 0.002  # graus; separa clientes da mesma cidade sem tirá-los dela
+SEMENTE_DISPERSAO = 42
+
+def dispersar_pontos(df, coluna_grupo="Cidade_Corrigida", raio=RAIO_DISPERSAO, semente=SEMENTE_DISPERSAO):
+    """
+    Acrescenta latitude_mapa e longitude_mapa (float): as coordenadas
+    geocodificadas deslocadas por um valor uniforme em [-raio, raio], para
+    que clientes da mesma cidade não fiquem sobrepostos. Todos os
+    deslocamentos saem de uma única chamada ao gerador, na mesma ordem de
+    sorteio do antigo laço com np.random.seed(42) (cidades em ordem
+    alfabética, pontos na ordem do frame, latitude antes de longitude),
+    então o layout não muda. Pontos sem cidade não são deslocados.
+    """
+    df = df.copy()
+    codigos, _ = pd.factorize(df[coluna_grupo], sort=True)
+    ordem = np.argsort(codigos, kind="stable")
+    ordem = ordem[codigos[ordem] >= 0]
+    deslocamentos = np.random.RandomState(semente).uniform(-raio, raio, size=(len(ordem), 2))
+
+    latitude = df["latitude"].to_numpy(dtype=float, copy=True)
+    longitude = df["longitude"].to_numpy(dtype=float, copy=True)
+    latitude[ordem] += deslocamentos[:, 0]
+    longitude[ordem] += deslocamentos[:, 1]
+    df["latitude_mapa"] = latitude
+    df["longitude_mapa"] = longitude
+    return df
+
+def formatar_coordenadas(df, coluna_latitude="latitude", coluna_longitude="longitude"):
+    """
+    Texto "(lat, lon)" das coordenadas, só para exportação
+    """
+    # map(str) em vez de astype(str), que manteria NaN em vez de "nan"
+    return "(" + df[coluna_latitude].map(str) + ", " + df[coluna_longitude].map(str) + ")"
+
+
+# ===== PONTOS DOS MAPAS =====
+
+def montar_pontos_mapa(df, referencias, caminho_cache=CAMINHO_CACHE_GEOCODIFICACAO, threshold=70):
+    """
+    Pontos de um mapa de clientes a partir de um frame com Cidade, Estado e
+    Data (uma linha por cliente): geocodificados com as referências de
+    ler_referencias, afastados dentro da mesma cidade (latitude_mapa,
+    longitude_mapa) e com a data da última compra em texto. As linhas sem
+    coordenadas ficam; quem desenha decide descartá-las.
+    """
+    estados_df, municipios_df, city_list, assinatura, indice = referencias
+    df = df.copy()
+    df["Cidade"] = df["Cidade"].str.strip()
+    df["Estado"] = df["Estado"].str.strip().str.upper()
+
+    with medir("geocodificacao", linhas=len(df)):
+        df = geocodificar_dataframe(
+            df, city_list, municipios_df, estados_df, assinatura,
+            caminho_cache=caminho_cache, threshold=threshold, indice=indice
+        )
+
+    df["Estado_Corrigido"] = df["Estado"]
+    df = dispersar_pontos(df)
+    df["Ultima_Compra"] = df["Data"].dt.strftime("%d/%m/%Y")
+    return df
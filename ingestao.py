@@ -0,0 +1,593 @@
+import io
+import os
+import csv
+import time
+import logging
+import threading
+import multiprocessing
+from dataclasses import dataclass, field
+from typing import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from transformacoes import calcular_valor_unitario, classificar_produtos
+from esquema import aplicar_esquema, categorizar_texto, concatenar
+from calendario import adicionar_calendario, COLUNAS_CALENDARIO
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURAÇÃO =====
+LINHAS_POR_CHUNK = 100_000
+BYTES_POR_BLOCO = 8 * 1024 * 1024
+
+# Mapeamento robusto de colunas: nomes aceitos na exportação -> nome padrão
+MAPEAMENTO_COLUNAS = {
+    'data': ['data', 'Data', 'DATA', 'date', 'Date', 'DATE'],
+    'valor_total': ['valor_total', 'Valor Total Z19-Z24', 'valor_total', 'Valor Total', 'valor', 'Valor'],
+    'quantidade': ['quantidade', 'Quantidade', 'QUANTIDADE', 'qtd', 'QTD'],
+    'numero_pedido': ['numero_pedido', 'Número do Pedido', 'pedido', 'Pedido', 'NUMERO_PEDIDO'],
+    'cliente': ['cliente', 'Cliente', 'CLIENTE', 'customer', 'Customer'],
+    'produto': ['produto', 'Produto', 'PRODUTO', 'item', 'Item'],
+    'cidade': ['cidade', 'Cidade', 'CIDADE'],
+    'estado': ['estado', 'Estado', 'ESTADO'],
+    'telefone': ['telefone', 'Telefone', 'TELEFONE'],
+    'valor_unitario': ['valor_unitario', 'Valor Unitário', 'VALOR_UNITARIO', 'unitario', 'Unitário'],
+    'valor_produto': ['valor_produto', 'Valor Produto', 'VALOR_PRODUTO', 'produto_value', 'Produto Value']
+}
+
+# Identificadores lidos sempre como texto (qualquer um dos nomes aceitos):
+# sem o dtype, cada chunk do read_csv infere o próprio tipo, e um número de
+# pedido com zero à esquerda ou célula vazia num chunk sai como texto ali e
+# como inteiro nos outros
+COLUNAS_TEXTO = ['numero_pedido', 'cliente', 'produto', 'cidade', 'estado', 'telefone']
+OUTRAS_COLUNAS_TEXTO = ['cep', 'CEP']
+
+NOMES_PADRAO = {
+    'data': 'Data',
+    'valor_total': 'Valor Total Z19-Z24',
+    'quantidade': 'Quantidade',
+    'numero_pedido': 'Número do Pedido',
+    'cliente': 'Cliente',
+    'produto': 'Produto',
+    'cidade': 'Cidade',
+    'estado': 'Estado',
+    'telefone': 'Telefone',
+    'valor_unitario': 'Valor Unitário',
+    'valor_produto': 'Valor Produto'
+}
+
+
+# ===== ETAPAS DO PIPELINE =====
+# A ingestão é uma lista declarada de etapas tipadas, executada uma única
+# vez: mapear -> converter -> derivar -> compactar (texto como categoria)
+# -> deduplicar -> enriquecer, e no fim ordenar, aplicar o esquema e
+# categorizar os produtos. As partes (chunks ou partições) são unidas por
+# esquema.concatenar, que mantém as categorias. O escopo diz quanto do conjunto a etapa
+# precisa ver de uma vez:
+#   chunk     só a própria linha; roda em cada chunk assim que ele chega
+#   pedido    todas as linhas de um pedido; roda no conjunto ou numa
+#             partição por número do pedido
+#   conjunto  o frame inteiro
+# requer/produz declaram colunas de entrada e saída, conferidas a cada
+# execução. O resultado são duas tabelas ligadas por "Número do Pedido":
+# as linhas (com os atributos do pedido repetidos, para as abas filtrarem
+# sem join) e os pedidos (uma linha por pedido).
+
+ESCOPOS = ("chunk", "pedido", "conjunto")
+CHAVE_PEDIDO = "Número do Pedido"
+COLUNA_POSICAO = "_posicao"
+
+# Atributos do pedido iguais em todas as suas linhas: vale o primeiro valor
+# não nulo na ordem de data
+ATRIBUTOS_PEDIDO = ["Data", "Cliente", "Telefone", "Cidade", "Estado"]
+COLUNAS_PEDIDO = [
+    CHAVE_PEDIDO, *ATRIBUTOS_PEDIDO, "Valor Total Pedido", "Quantidade Pedido",
+    "Período_Mês", *COLUNAS_CALENDARIO
+]
+
+
+@dataclass(frozen=True)
+class Etapa:
+    nome: str
+    escopo: str
+    funcao: Callable[[pd.DataFrame, dict], pd.DataFrame]
+    requer: tuple[str, ...] = ()
+    produz: tuple[str, ...] = ()
+
+    def executar(self, df, contexto, tempos):
+        """
+        Roda a etapa conferindo as colunas declaradas e soma o tempo gasto
+        em tempos[nome] (várias chamadas quando roda por chunk)
+        """
+        faltantes = [c for c in self.requer if c not in df.columns]
+        if faltantes:
+            raise KeyError(f"Etapa '{self.nome}' requer as colunas {faltantes}")
+
+        inicio = time.perf_counter()
+        df = self.funcao(df, contexto)
+        tempos[self.nome] = tempos.get(self.nome, 0.0) + time.perf_counter() - inicio
+
+        ausentes = [c for c in self.produz if c not in df.columns]
+        if ausentes:
+            raise KeyError(f"Etapa '{self.nome}' não produziu as colunas {ausentes}")
+        return df
+
+@dataclass
+class ResultadoPipeline:
+    linhas: pd.DataFrame
+    pedidos: pd.DataFrame
+    tempos: dict = field(default_factory=dict)
+    renomeacoes: dict = field(default_factory=dict)
+
+
+def encontrar_coluna(df, nomes_esperados):
+    for nome in nomes_esperados:
+        if nome in df.columns:
+            return nome
+    return None
+
+def mapear_colunas(df):
+    """
+    Renomeia as colunas da exportação para os nomes padrão.
+    Retorna (df, renomeacoes).
+    """
+    renomeacoes = {}
+    for chave, nomes_esperados in MAPEAMENTO_COLUNAS.items():
+        coluna = encontrar_coluna(df, nomes_esperados)
+        if coluna and coluna != NOMES_PADRAO[chave]:
+            renomeacoes[coluna] = NOMES_PADRAO[chave]
+
+    if renomeacoes:
+        df = df.rename(columns=renomeacoes)
+    return df, renomeacoes
+
+def _mapear(df, contexto):
+    df, renomeacoes = mapear_colunas(df)
+    contexto.setdefault("renomeacoes", {}).update(renomeacoes)
+    return df
+
+def converter_tipos(df, contexto=None):
+    """
+    Datas e números; valores ilegíveis viram NaT/NaN
+    """
+    df = df.copy()
+    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
+    df["Valor Total Z19-Z24"] = pd.to_numeric(df["Valor Total Z19-Z24"], errors="coerce")
+    df["Quantidade"] = pd.to_numeric(df["Quantidade"], errors="coerce")
+    return df
+
+def derivar_valores(df, contexto=None):
+    """
+    Valor unitário e valor do produto (quando a exportação não os traz) e
+    descarte das linhas inválidas
+    """
+    # Se coluna Valor Unitário não existir, calcular a partir do Valor Total
+    if "Valor Unitário" not in df.columns:
+        df["Valor Unitário"] = calcular_valor_unitario(df)
+
+    # Se coluna Valor Produto não existir, calcular
+    if "Valor Produto" not in df.columns:
+        df["Valor Produto"] = df["Valor Unitário"] * df["Quantidade"]
+
+    # Filtrar dados inválidos; linhas sem número de pedido não pertencem a
+    # nenhum pedido
+    df = df.dropna(subset=["Data", "Valor Produto", CHAVE_PEDIDO])
+    return df[df["Quantidade"] > 0]
+
+def deduplicar(df, contexto=None):
+    """
+    Remove linhas repetidas de pedido/produto mantendo a última na ordem de
+    data. A ordenação é estável para que o keep="last" não dependa de como
+    o arquivo foi dividido; o frame sai ordenado por data.
+    """
+    # Só as colunas-chave são olhadas para que o frame seja copiado uma vez
+    ordem = np.argsort(df["Data"].to_numpy(), kind="stable")
+    duplicadas = df[[CHAVE_PEDIDO, "Produto"]].iloc[ordem].duplicated(keep="last").to_numpy()
+    return df.iloc[ordem[~duplicadas]]
+
+def enriquecer_pedidos(df, contexto=None):
+    """
+    Atributos do pedido iguais em todas as suas linhas, totais do pedido
+    (calculados uma vez, depois da deduplicação), período mensal e o
+    calendário da meta (26 a 25) pela data do pedido
+    """
+    pedidos = df.groupby(CHAVE_PEDIDO, sort=False)
+    novas = {coluna: pedidos[coluna].transform("first") for coluna in ATRIBUTOS_PEDIDO if coluna in df.columns}
+    novas["Valor Total Pedido"] = pedidos["Valor Produto"].transform("sum")
+    novas["Quantidade Pedido"] = pedidos["Quantidade"].transform("sum")
+    novas["Período_Mês"] = novas["Data"].dt.to_period("M")
+    return adicionar_calendario(df.assign(**novas))
+
+def ordenar_linhas(df, contexto=None):
+    """
+    Ordem final: data do pedido e, no empate, a posição da linha no
+    arquivo, qualquer que tenha sido a divisão em chunks ou partições
+    """
+    ordem = np.lexsort((df[COLUNA_POSICAO].to_numpy(), df["Data"].to_numpy()))
+    return df.iloc[ordem].drop(columns=COLUNA_POSICAO).reset_index(drop=True)
+
+def compactar_texto(df, contexto=None):
+    """
+    Texto de baixa cardinalidade já como categoria em cada chunk (o
+    esquema completo roda no conjunto)
+    """
+    return categorizar_texto(df)
+
+def _aplicar_esquema(df, contexto):
+    return aplicar_esquema(df)
+
+def categorizar_produtos(df, contexto=None):
+    """
+    Coluna categórica "Categoria", lida pelos gráficos e pelas comissões.
+    Depois do esquema, Produto já é categórico e a classificação roda só
+    sobre as categorias.
+    """
+    return df.assign(Categoria=classificar_produtos(df["Produto"]))
+
+
+ETAPAS = [
+    Etapa("mapear", "chunk", _mapear),
+    Etapa("converter", "chunk", converter_tipos, requer=("Data", "Valor Total Z19-Z24", "Quantidade")),
+    Etapa("derivar", "chunk", derivar_valores, requer=("Data", "Quantidade", CHAVE_PEDIDO), produz=("Valor Unitário", "Valor Produto")),
+    Etapa("compactar", "chunk", compactar_texto),
+    Etapa("deduplicar", "pedido", deduplicar, requer=("Data", CHAVE_PEDIDO, "Produto")),
+    Etapa("enriquecer", "pedido", enriquecer_pedidos, requer=("Valor Produto", "Quantidade"), produz=tuple(COLUNAS_PEDIDO)),
+    Etapa("ordenar", "conjunto", ordenar_linhas, requer=("Data", COLUNA_POSICAO)),
+    Etapa("esquema", "conjunto", _aplicar_esquema),
+    Etapa("categorizar", "conjunto", categorizar_produtos, requer=("Produto",), produz=("Categoria",)),
+]
+
+
+def separar_pedidos(linhas):
+    """
+    Tabela de pedidos (uma linha por pedido, na ordem das linhas) a partir
+    das linhas enriquecidas, ligada a elas por "Número do Pedido"
+    """
+    colunas = [c for c in COLUNAS_PEDIDO if c in linhas.columns]
+    if linhas.empty:
+        return pd.DataFrame(columns=colunas)
+    primeiras = ~linhas[CHAVE_PEDIDO].duplicated().to_numpy()
+    return linhas.loc[primeiras, colunas].reset_index(drop=True)
+
+
+# ===== EXECUÇÃO =====
+
+def _etapas(etapas, *escopos):
+    return [etapa for etapa in etapas if etapa.escopo in escopos]
+
+def _concluir(linhas, contexto, tempos):
+    inicio = time.perf_counter()
+    pedidos = separar_pedidos(linhas)
+    tempos["pedidos"] = time.perf_counter() - inicio
+    logger.info("⏱️ Pipeline de ingestão: " + ", ".join(f"{nome} {t:.2f}s" for nome, t in tempos.items()))
+    return ResultadoPipeline(linhas, pedidos, tempos, contexto.get("renomeacoes", {}))
+
+def executar_pipeline(chunks, etapas=ETAPAS):
+    """
+    Executa as etapas sobre um iterável de DataFrames brutos: as de escopo
+    chunk em cada chunk assim que ele chega, as demais uma vez sobre o
+    conjunto já reduzido. Retorna um ResultadoPipeline.
+    """
+    contexto, tempos = {}, {}
+    partes = []
+    posicao = 0
+    for i, chunk in enumerate(chunks):
+        chunk = chunk.assign(**{COLUNA_POSICAO: np.arange(posicao, posicao + len(chunk), dtype=np.int64)})
+        posicao += len(chunk)
+        for etapa in _etapas(etapas, "chunk"):
+            chunk = etapa.executar(chunk, contexto, tempos)
+        partes.append(chunk)
+        logger.debug(f"Chunk {i + 1} processado ({len(chunk)} linhas)")
+
+    if not partes:
+        return ResultadoPipeline(pd.DataFrame(), pd.DataFrame(), tempos, contexto.get("renomeacoes", {}))
+
+    df = concatenar(partes)
+    partes.clear()
+    if df.empty:
+        return ResultadoPipeline(df, pd.DataFrame(), tempos, contexto.get("renomeacoes", {}))
+
+    for etapa in _etapas(etapas, "pedido", "conjunto"):
+        df = etapa.executar(df, contexto, tempos)
+    return _concluir(df, contexto, tempos)
+
+
+# ===== EXECUÇÃO PARALELA =====
+# Para um frame bruto já em memória. As linhas são particionadas pelo
+# número do pedido, de modo que todas as linhas de um pedido caem na mesma
+# partição e as etapas de escopo chunk e pedido rodam dentro dela. As
+# partições vão para um ProcessPoolExecutor em Arrow IPC gravado em memória
+# compartilhada, ida e volta; as etapas de escopo conjunto rodam no
+# processo principal. O resultado é idêntico ao de executar_pipeline([df]).
+#
+# O pool é um só por processo, criado na primeira chamada e reaproveitado
+# pelas seguintes: subir um worker spawn e importar pandas/pyarrow custa
+# ~3s.
+#
+# O caminho paralelo é opcional: por padrão (PROCESSOS_INGESTAO=0) o
+# pipeline roda em passo único. Numa CPU, com o pool já aberto, os casos
+# pipeline_serial e pipeline_particoes (python -m benchmarks executar
+# --casos pipeline_serial pipeline_particoes) mediram o caminho por
+# partições 0,1s mais lento que o passo único em 100 mil linhas e 2,1s em
+# 1 milhão; o ganho com várias CPUs ainda não foi medido. Numa máquina com
+# várias CPUs, rode os mesmos casos e, se as partições ganharem, defina
+# PROCESSOS_INGESTAO com o número de processos.
+
+LINHAS_POR_PARTICAO = 250_000
+PROCESSOS_INGESTAO = int(os.environ.get("PROCESSOS_INGESTAO", "0"))
+
+_pool = None
+_trava_pool = threading.Lock()
+
+
+def _processar_particao(df, etapas):
+    contexto, tempos = {}, {}
+    for etapa in etapas:
+        df = etapa.executar(df, contexto, tempos)
+    return df, contexto, tempos
+
+def _gravar_compartilhada(df):
+    """
+    Grava o frame em Arrow IPC direto num bloco de memória compartilhada.
+    Retorna (bloco, tamanho em bytes).
+    """
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    medidor = pa.MockOutputStream()
+    with pa.ipc.new_stream(medidor, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    tamanho = medidor.size()
+
+    bloco = shared_memory.SharedMemory(create=True, size=max(tamanho, 1))
+    try:
+        destino = pa.FixedSizeBufferWriter(pa.py_buffer(bloco.buf))
+        with pa.ipc.new_stream(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    except Exception:
+        bloco.close()
+        bloco.unlink()
+        raise
+    return bloco, tamanho
+
+def _ler_compartilhada(bloco, tamanho):
+    # O stream é lido direto do bloco, sem cópia; como as colunas do
+    # to_pandas podem apontar para os buffers Arrow, cada lote é copiado uma
+    # vez para a memória do processo antes de soltar a visão (quem chama
+    # fecha e remove o bloco em seguida)
+    with bloco.buf[:tamanho] as visao:
+        leitor = pa.ipc.open_stream(pa.BufferReader(pa.py_buffer(visao)))
+        memoria = pa.default_cpu_memory_manager()
+        tabela = pa.Table.from_batches([lote.copy_to(memoria) for lote in leitor], leitor.schema)
+        del leitor
+    return tabela.to_pandas()
+
+def _processar_particao_compartilhada(nome_entrada, tamanho_entrada, etapas):
+    """
+    Executada no processo filho: lê a partição do bloco de entrada e grava
+    o resultado num bloco novo. Devolve (nome, tamanho, contexto, tempos).
+    Quem criou cada bloco não o remove; o processo principal remove os dois.
+    """
+    entrada = shared_memory.SharedMemory(name=nome_entrada)
+    try:
+        df = _ler_compartilhada(entrada, tamanho_entrada)
+    finally:
+        entrada.close()
+
+    df, contexto, tempos = _processar_particao(df, etapas)
+    saida, tamanho_saida = _gravar_compartilhada(df)
+    saida.close()
+    return saida.name, tamanho_saida, contexto, tempos
+
+def _particionar(df, n_particoes):
+    """
+    Posições das linhas de cada partição, na ordem original, com a
+    partição definida pelo hash do número do pedido
+    """
+    hashes = pd.util.hash_pandas_object(df[CHAVE_PEDIDO], index=False).to_numpy()
+    particao = (hashes % np.uint64(n_particoes)).astype(np.int64)
+    ordem = np.argsort(particao, kind="stable")
+    limites = np.cumsum(np.bincount(particao, minlength=n_particoes))
+    return [p for p in np.split(ordem, limites[:-1]) if len(p)]
+
+def _somar(destino, origem):
+    for nome, valor in origem.items():
+        destino[nome] = destino.get(nome, 0.0) + valor
+
+def _obter_pool(max_workers):
+    """
+    Pool de processos do processo corrente, criado na primeira chamada e
+    recriado se o número de workers pedido mudar
+    """
+    global _pool
+    with _trava_pool:
+        if _pool is not None and _pool[0] != max_workers:
+            _pool[1].shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            # spawn: o dashboard chama a partir de threads (agendador), onde
+            # fork não é seguro
+            mp_contexto = multiprocessing.get_context("spawn")
+            _pool = (max_workers, ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_contexto))
+            logger.info(f"Pool de processos da ingestão criado ({max_workers} processos)")
+        return _pool[1]
+
+def _descartar_pool(pool):
+    """
+    Esquece o pool (um worker morreu e ele não aceita mais tarefas); a
+    próxima chamada cria outro
+    """
+    global _pool
+    with _trava_pool:
+        if _pool is not None and _pool[1] is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def encerrar_pool():
+    """
+    Encerra o pool de processos da ingestão, se houver (o próximo
+    processamento paralelo cria outro)
+    """
+    global _pool
+    with _trava_pool:
+        if _pool is not None:
+            _pool[1].shutdown()
+            _pool = None
+
+def _executar_no_pool(particoes, etapas, max_workers, contexto, tempos):
+    """
+    Processa as partições no pool; partições que o Arrow não representa
+    (colunas object com tipos misturados) são processadas aqui mesmo.
+    Os tempos das etapas são somados entre as partições.
+    """
+    resultados = []
+    blocos = {}
+    pendentes = set()
+    pool = _obter_pool(max_workers)
+    try:
+        for i, parte in enumerate(particoes):
+            try:
+                bloco, tamanho = _gravar_compartilhada(parte)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+                logger.debug(f"Partição {i + 1} processada localmente (sem Arrow): {e}")
+                df, contexto_parte, tempos_parte = _processar_particao(parte, etapas)
+                resultados.append(df)
+                contexto.setdefault("renomeacoes", {}).update(contexto_parte.get("renomeacoes", {}))
+                _somar(tempos, tempos_parte)
+                continue
+            blocos[i] = bloco
+            pendentes.add(pool.submit(_processar_particao_compartilhada, bloco.name, tamanho, etapas))
+
+        total = len(pendentes)
+        for concluidas, futuro in enumerate(as_completed(list(pendentes)), start=1):
+            pendentes.discard(futuro)
+            nome_saida, tamanho_saida, contexto_parte, tempos_parte = futuro.result()
+            saida = shared_memory.SharedMemory(name=nome_saida)
+            try:
+                resultados.append(_ler_compartilhada(saida, tamanho_saida))
+            finally:
+                saida.close()
+                saida.unlink()
+            contexto.setdefault("renomeacoes", {}).update(contexto_parte.get("renomeacoes", {}))
+            _somar(tempos, tempos_parte)
+            logger.info(f"Partição {concluidas}/{total} processada ({concluidas / total * 100:.1f}%)")
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        raise
+    finally:
+        # Depois de um erro, o pool continua aberto: partições ainda na fila
+        # são canceladas e as que já rodavam têm o bloco de saída removido
+        for futuro in pendentes:
+            if futuro.cancel():
+                continue
+            try:
+                saida = shared_memory.SharedMemory(name=futuro.result()[0])
+            except Exception:
+                continue
+            saida.close()
+            saida.unlink()
+        for bloco in blocos.values():
+            bloco.close()
+            bloco.unlink()
+    return resultados
+
+def executar_pipeline_em_paralelo(df, etapas=ETAPAS, linhas_por_particao=LINHAS_POR_PARTICAO, max_workers=None):
+    """
+    Mesmo resultado de executar_pipeline([df]). Com max_workers (padrão
+    PROCESSOS_INGESTAO) de 2 ou mais e um frame maior que uma partição, as
+    etapas de escopo chunk e pedido rodam em partições por número do
+    pedido no pool de processos; senão, segue o caminho sequencial.
+    """
+    max_workers = min(max_workers or PROCESSOS_INGESTAO, os.cpu_count() or 1)
+    if max_workers < 2 or len(df) <= linhas_por_particao:
+        return executar_pipeline([df], etapas)
+    return executar_pipeline_em_particoes(df, etapas, linhas_por_particao, max_workers)
+
+def executar_pipeline_em_particoes(df, etapas=ETAPAS, linhas_por_particao=LINHAS_POR_PARTICAO, max_workers=2):
+    """
+    O caminho paralelo sem as condições de executar_pipeline_em_paralelo:
+    sempre particiona e usa o pool, com max_workers processos (os
+    benchmarks medem assim o custo das partições em qualquer máquina)
+    """
+    contexto, tempos = {}, {}
+    df = df.reset_index(drop=True).assign(**{COLUNA_POSICAO: np.arange(len(df), dtype=np.int64)})
+
+    # Etapas iniciais que ainda não produziram a chave do pedido (o
+    # mapeamento de colunas) rodam aqui, antes de particionar
+    etapas_particao = _etapas(etapas, "chunk", "pedido")
+    while CHAVE_PEDIDO not in df.columns and etapas_particao and etapas_particao[0].escopo == "chunk":
+        df = etapas_particao.pop(0).executar(df, contexto, tempos)
+
+    inicio = time.perf_counter()
+    n_particoes = max(-(-len(df) // linhas_por_particao), max_workers)
+    particoes = [df.iloc[posicoes] for posicoes in _particionar(df, n_particoes)]
+    del df
+    resultados = _executar_no_pool(particoes, etapas_particao, max_workers, contexto, tempos)
+    particoes.clear()
+    tempos["particoes"] = time.perf_counter() - inicio
+    logger.info(f"✅ {len(resultados)} partições processadas em {tempos['particoes']:.2f}s ({max_workers} processos)")
+
+    resultados = [r for r in resultados if not r.empty]
+    if not resultados:
+        return ResultadoPipeline(pd.DataFrame(), pd.DataFrame(), tempos, contexto.get("renomeacoes", {}))
+
+    df = concatenar(resultados)
+    resultados.clear()
+    for etapa in _etapas(etapas, "conjunto"):
+        df = etapa.executar(df, contexto, tempos)
+    return _concluir(df, contexto, tempos)
+
+
+# ===== LEITURA EM FLUXO =====
+
+class LeitorBlocos(io.RawIOBase):
+    """
+    Expõe um iterador de blocos de bytes (iter_content do requests,
+    next_chunk do MediaIoBaseDownload) como arquivo, para o pd.read_csv
+    consumir sem que o arquivo inteiro fique em memória
+    """
+
+    def __init__(self, blocos):
+        self._blocos = iter(blocos)
+        self._pendente = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._pendente:
+            try:
+                self._pendente = memoryview(next(self._blocos))
+            except StopIteration:
+                return 0
+        n = min(len(destino), len(self._pendente))
+        destino[:n] = self._pendente[:n]
+        self._pendente = self._pendente[n:]
+        return n
+
+def _cabecalho(fluxo):
+    """
+    Nomes das colunas da primeira linha, sem consumir o fluxo ([] se a
+    primeira linha não couber no buffer)
+    """
+    inicio = fluxo.peek(BYTES_POR_BLOCO)
+    if b"\n" not in inicio:
+        return []
+    linha = inicio.split(b"\n", 1)[0].decode("utf-8", errors="replace").rstrip("\r")
+    return next(csv.reader([linha]), [])
+
+def ler_csv_em_chunks(blocos, linhas_por_chunk=LINHAS_POR_CHUNK):
+    """
+    Gera DataFrames de até linhas_por_chunk linhas a partir de blocos de
+    bytes. Os tipos não dependem do chunk: identificadores como texto
+    (COLUNAS_TEXTO) e a coluna de data, se reconhecida no cabeçalho, já
+    como data (valores ilegíveis ficam para converter_tipos).
+    """
+    fluxo = io.BufferedReader(LeitorBlocos(blocos), buffer_size=BYTES_POR_BLOCO)
+    texto = [nome for chave in COLUNAS_TEXTO for nome in MAPEAMENTO_COLUNAS[chave]] + OUTRAS_COLUNAS_TEXTO
+    datas = [nome for nome in _cabecalho(fluxo) if nome in MAPEAMENTO_COLUNAS['data']][:1]
+    return pd.read_csv(
+        fluxo, chunksize=linhas_por_chunk, encoding="utf-8",
+        dtype=dict.fromkeys(texto, "str"), parse_dates=datas
+    )
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ===== MEDIÇÕES DE TEMPO (SPANS) =====
+# Cada trecho medido vira um span: nome, duração, span pai e atributos
+# (linhas, aba...). Todo span encerrado é
+#  - gravado como uma linha JSON no arquivo configurado (configurar_saida);
+#  - somado a uma janela móvel por nome, de onde saem p50/p95 do processo;
+#  - anexado à execução corrente da thread (um rerun do Streamlit), que o
+#    painel de perfil mostra na barra lateral.
+# Sem arquivo configurado, nada é gravado; o custo por span é um
+# perf_counter, um dicionário e um append.
+
+JANELA_PERCENTIS = 500
+
+_saida = logging.getLogger("medicoes.saida")
+_saida.propagate = False
+_saida.setLevel(logging.INFO)
+
+_trava = threading.Lock()
+_janelas = {}
+_local = threading.local()
+
+
+def configurar_saida(caminho):
+    """
+    Grava os spans como JSON lines em caminho (uma vez por processo; chamar
+    de novo com o mesmo caminho não faz nada)
+    """
+    caminho = os.path.abspath(caminho)
+    with _trava:
+        if any(getattr(h, "baseFilename", None) == caminho for h in _saida.handlers):
+            return
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        handler = logging.FileHandler(caminho, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _saida.addHandler(handler)
+    logger.info(f"⏱️ Medições gravadas em {caminho}")
+
+def _pilha():
+    if not hasattr(_local, "pilha"):
+        _local.pilha = []
+    return _local.pilha
+
+def registrar(nome, segundos, inicio=None, **atributos):
+    """
+    Registra um span já medido (por exemplo, tempos devolvidos por outro
+    processo), como filho do span aberto na thread. Devolve o registro.
+    """
+    pilha = _pilha()
+    execucao = getattr(_local, "execucao", None)
+    registro = {
+        "ts": round(time.time(), 3),
+        "nome": nome,
+        "ms": round(segundos * 1000, 3),
+        "pai": pilha[-1] if pilha else None,
+        "nivel": len(pilha),
+        "thread": threading.current_thread().name,
+        **({"execucao": execucao.id} if execucao is not None else {}),
+        **atributos,
+    }
+    with _trava:
+        janela = _janelas.get(nome)
+        if janela is None:
+            janela = _janelas[nome] = deque(maxlen=JANELA_PERCENTIS)
+        janela.append(segundos)
+    if execucao is not None:
+        execucao.spans.append((time.perf_counter() - segundos if inicio is None else inicio, registro))
+    if _saida.handlers:
+        _saida.info(json.dumps(registro, ensure_ascii=False, default=str))
+    return registro
+
+def registrar_tempos(prefixo, tempos, **atributos):
+    """
+    Registra um dicionário {etapa: segundos} como spans "prefixo/etapa",
+    em sequência terminando agora
+    """
+    inicio = time.perf_counter() - sum(tempos.values())
+    for etapa, segundos in tempos.items():
+        registrar(f"{prefixo}/{etapa}", segundos, inicio=inicio, **atributos)
+        inicio += segundos
+
+@contextmanager
+def medir(nome, **atributos):
+    """
+    Span em volta de um bloco. Spans abertos dentro dele têm este como pai.
+    Atributos podem ser acrescentados durante o bloco pelo dicionário
+    devolvido (ex.: atributos["linhas"] = len(df)).
+    """
+    pilha = _pilha()
+    pilha.append(nome)
+    inicio = time.perf_counter()
+    try:
+        yield atributos
+    finally:
+        pilha.pop()
+        registrar(nome, time.perf_counter() - inicio, inicio=inicio, **atributos)
+
+def medido(nome):
+    """
+    Decorador: cada chamada da função é um span
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(nome):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+# ===== EXECUÇÕES (RERUNS) =====
+
+class Execucao:
+    """
+    Spans de um rerun (com o instante de início de cada um)
+    """
+    def __init__(self):
+        self.id = f"{os.getpid()}-{time.time_ns()}"
+        self.inicio = time.perf_counter()
+        self.spans = []
+        self.total = None
+
+    def encerrar(self):
+        if self.total is None:
+            self.total = time.perf_counter() - self.inicio
+            if getattr(_local, "execucao", None) is self:
+                _local.execucao = None
+            registrar("execucao", self.total, spans=len(self.spans))
+        return self
+
+    def detalhamento(self):
+        """
+        DataFrame com um span por linha (nome recuado pela profundidade) e a
+        fração do tempo total da execução
+        """
+        total_ms = (self.total or time.perf_counter() - self.inicio) * 1000
+        # Em ordem de início; o pai (que começa antes) fica acima dos filhos
+        spans = sorted(self.spans, key=lambda item: (item[0], item[1]["nivel"]))
+        linhas = [
+            {
+                "Trecho": "\u00a0\u00a0" * r["nivel"] + r["nome"],
+                "ms": r["ms"],
+                "% do total": round(100 * r["ms"] / total_ms, 1) if total_ms else 0.0,
+            }
+            for _, r in spans
+        ]
+        return pd.DataFrame(linhas, columns=["Trecho", "ms", "% do total"])
+
+def iniciar_execucao():
+    """
+    Abre a execução da thread corrente; os spans encerrados a partir daqui
+    são anexados a ela
+    """
+    _local.execucao = Execucao()
+    _local.pilha = []
+    return _local.execucao
+
+
+# ===== PERCENTIS =====
+
+def percentis(nomes=None):
+    """
+    p50/p95 (ms) da janela móvel de cada span, do processo inteiro
+    """
+    with _trava:
+        janelas = {nome: list(valores) for nome, valores in _janelas.items() if nomes is None or nome in nomes}
+    linhas = []
+    for nome, valores in sorted(janelas.items()):
+        amostras = np.asarray(valores) * 1000
+        p50, p95 = np.percentile(amostras, [50, 95])
+        linhas.append({"Trecho": nome, "n": len(amostras), "p50 ms": round(p50, 1), "p95 ms": round(p95, 1)})
+    return pd.DataFrame(linhas, columns=["Trecho", "n", "p50 ms", "p95 ms"])
+
+def limpar():
+    """
+    Descarta as janelas de percentis (útil entre rodadas de benchmark)
+    """
+    with _trava:
+        _janelas.clear()
@@ -0,0 +1,38 @@
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ===== RECORTE DE PERÍODOS SOBRE O FRAME ORDENADO POR DATA =====
+# Com o frame ordenado por Data, qualquer janela [inicio, fim] é um bloco
+# contíguo de linhas: duas buscas binárias dão os limites e o iloc devolve
+# uma visão, sem comparar a coluna inteira nem copiar os dados.
+
+def ordenar_por_data(df, coluna="Data"):
+    """
+    Garante o frame ordenado por data (ordenação estável, índice refeito).
+    Não faz nada quando a coluna já é crescente.
+    """
+    if df.empty or df[coluna].is_monotonic_increasing:
+        return df
+    logger.info("Ordenando o dataset por data para o recorte de períodos")
+    return df.sort_values(coluna, kind="stable", ignore_index=True)
+
+def limites_periodo(df, inicio, fim, coluna="Data"):
+    """
+    Posições [i, j) das linhas com inicio <= data <= fim, em O(log n).
+    Supõe o frame ordenado por coluna (ver ordenar_por_data).
+    """
+    datas = df[coluna].to_numpy()
+    i = np.searchsorted(datas, np.datetime64(pd.Timestamp(inicio)), side="left")
+    j = np.searchsorted(datas, np.datetime64(pd.Timestamp(fim)), side="right")
+    return int(i), int(max(i, j))
+
+def fatiar_periodo(df, inicio, fim, coluna="Data"):
+    """
+    Linhas do período [inicio, fim] como visão do frame original. Quem
+    precisar alterar o resultado deve copiá-lo antes.
+    """
+    i, j = limites_periodo(df, inicio, fim, coluna)
+    return df.iloc[i:j]
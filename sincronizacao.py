@@ -0,0 +1,126 @@
+import io
+import os
+import json
+import hashlib
+import logging
+import requests
+from googleapiclient.http import MediaIoBaseDownload
+
+logger = logging.getLogger(__name__)
+
+# ===== CONFIGURAÇÃO =====
+CAMINHO_ESTADO_SINCRONIZACAO = os.path.join("cache", "sincronizacao.json")
+
+
+# ===== ESTADO DA ÚLTIMA SINCRONIZAÇÃO =====
+
+def ler_estado_sincronizacao(caminho=CAMINHO_ESTADO_SINCRONIZACAO):
+    """
+    Metadados (ETag, Last-Modified, md5, modifiedTime) da última versão
+    processada de cada fonte
+    """
+    if not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Estado de sincronização ilegível: {e}")
+        return {}
+
+def salvar_estado_sincronizacao(fonte, metadados, caminho=CAMINHO_ESTADO_SINCRONIZACAO):
+    try:
+        estado = ler_estado_sincronizacao(caminho)
+        estado[fonte] = metadados
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    except Exception as e:
+        logger.warning(f"Não foi possível salvar o estado de sincronização: {e}")
+
+
+# ===== DOWNLOAD CONDICIONAL VIA HTTP =====
+
+def abrir_se_alterado(url, metadados_anteriores=None, timeout=30):
+    """
+    GET condicional (If-None-Match / If-Modified-Since) em modo stream.
+    Retorna (response, metadados); response é None quando a origem responde
+    304. O corpo não é lido aqui: o chamador consome response.iter_content.
+    Levanta requests.HTTPError para respostas de erro.
+    """
+    headers = {}
+    if metadados_anteriores:
+        if metadados_anteriores.get("etag"):
+            headers["If-None-Match"] = metadados_anteriores["etag"]
+        if metadados_anteriores.get("last_modified"):
+            headers["If-Modified-Since"] = metadados_anteriores["last_modified"]
+
+    response = requests.get(url, headers=headers, timeout=timeout, stream=True)
+    if response.status_code == 304:
+        response.close()
+        logger.info(f"Origem sem alterações (304): {url}")
+        return None, metadados_anteriores
+    if not response.ok:
+        response.close()
+        response.raise_for_status()
+
+    metadados = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "md5": None,
+    }
+    return response, metadados
+
+def blocos_com_md5(blocos, metadados):
+    """
+    Repassa os blocos calculando o md5 do conteúdo; ao fim do fluxo grava
+    o resultado em metadados["md5"]
+    """
+    h = hashlib.md5()
+    for bloco in blocos:
+        h.update(bloco)
+        yield bloco
+    metadados["md5"] = h.hexdigest()
+
+
+# ===== METADADOS DO GOOGLE DRIVE =====
+
+def metadados_drive(service, file_id):
+    """
+    Consulta só os metadados do arquivo (uma chamada leve, sem baixar o conteúdo)
+    """
+    info = service.files().get(fileId=file_id, fields="modifiedTime,md5Checksum,size").execute()
+    return {
+        "modified_time": info.get("modifiedTime"),
+        "md5": info.get("md5Checksum"),
+        "tamanho": info.get("size"),
+    }
+
+def iterar_download_drive(service, file_id, bytes_por_bloco):
+    """
+    Baixa o arquivo do Drive em blocos, devolvendo cada bloco assim que o
+    MediaIoBaseDownload o recebe, sem acumular o arquivo inteiro
+    """
+    request = service.files().get_media(fileId=file_id)
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(buffer, request, chunksize=bytes_por_bloco)
+    done = False
+    while done is False:
+        status, done = downloader.next_chunk()
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def drive_inalterado(metadados_atuais, metadados_anteriores):
+    if not metadados_anteriores:
+        return False
+    if metadados_atuais.get("md5") and metadados_anteriores.get("md5"):
+        return metadados_atuais["md5"] == metadados_anteriores["md5"]
+    return (
+        metadados_atuais.get("modified_time") is not None
+        and metadados_atuais.get("modified_time") == metadados_anteriores.get("modified_time")
+    )
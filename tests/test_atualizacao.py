@@ -0,0 +1,47 @@
+"""
+Publicação da versão dos dados (atualizacao.py): um job de atualização
+disparado durante a primeira carga publica depois dela, nunca antes.
+"""
+import threading
+import pandas as pd
+import pytest
+import atualizacao
+from atualizacao import obter_versao, versao_atual
+
+
+@pytest.fixture(autouse=True)
+def sem_versao(monkeypatch):
+    monkeypatch.setattr(atualizacao, "_versao", None)
+
+
+def test_job_durante_a_primeira_carga_publica_depois():
+    job_concluido = threading.Event()
+    primeira = pd.DataFrame({"origem": ["arrow"]})
+    nova = pd.DataFrame({"origem": ["download"]})
+
+    def job():
+        atualizacao._executar_com_log(lambda: (nova, {}))
+        job_concluido.set()
+
+    def carregar_primeira():
+        # Como em carregar_primeira_versao: abre o dataset final e antecipa o job
+        threading.Thread(target=job).start()
+        # O job não consegue publicar enquanto a carga não terminar
+        assert not job_concluido.wait(0.2)
+        return primeira, {}
+
+    versao = obter_versao(carregar_primeira)
+
+    assert versao["df"] is primeira
+    assert job_concluido.wait(5)
+    assert versao_atual()["df"] is nova
+    assert versao_atual()["origem"] == "segundo_plano"
+
+
+def test_job_sem_nova_versao_mantem_a_publicada():
+    primeira = pd.DataFrame({"origem": ["arrow"]})
+    versao = obter_versao(lambda: (primeira, {}))
+
+    atualizacao._executar_com_log(lambda: None)
+
+    assert versao_atual() is versao
@@ -0,0 +1,152 @@
+"""
+Consultas DuckDB sobre os cubos (consultas.py) contra as implementações
+originais em pandas, sobre uma exportação sintética do benchmarks.gerador
+ingerida pelo mesmo caminho do dashboard.
+"""
+import pandas as pd
+import pytest
+import consultas
+from calendario import limites_periodo_meta
+from cubos import construir_cubos
+from ingestao import executar_pipeline, ler_csv_em_chunks
+from benchmarks.gerador import gravar_csv
+
+LINHAS_EXPORTACAO = 30_000
+SEMENTE = 7
+N_TOP = 10
+REGIOES = {
+    "AC": "Norte", "AP": "Norte", "AM": "Norte", "PA": "Norte", "RO": "Norte", "RR": "Norte", "TO": "Norte",
+    "AL": "Nordeste", "BA": "Nordeste", "CE": "Nordeste", "MA": "Nordeste", "PB": "Nordeste", "PE": "Nordeste",
+    "PI": "Nordeste", "RN": "Nordeste", "SE": "Nordeste",
+    "ES": "Sudeste", "MG": "Sudeste", "RJ": "Sudeste", "SP": "Sudeste",
+    "PR": "Sul", "RS": "Sul", "SC": "Sul",
+    "DF": "Centro-Oeste", "GO": "Centro-Oeste", "MT": "Centro-Oeste",
+}  # sem MS: clientes de MS ficam sem região (NULL na consulta)
+
+
+@pytest.fixture(scope="module")
+def dados(tmp_path_factory):
+    caminho = tmp_path_factory.mktemp("consultas") / "exportacao.csv"
+    gravar_csv(str(caminho), LINHAS_EXPORTACAO, SEMENTE)
+    with open(caminho, "rb") as f:
+        linhas = executar_pipeline(ler_csv_em_chunks(iter(lambda: f.read(1 << 20), b""))).linhas
+
+    df_mapa = linhas.drop_duplicates(subset=["Cliente"], keep="last")[["Cliente", "Estado"]].copy()
+    df_mapa["Estado_Corrigido"] = df_mapa["Estado"].astype(str).str.strip().str.upper()
+    df_mapa["Regiao"] = df_mapa["Estado_Corrigido"].map(REGIOES)
+
+    con = consultas.conectar(linhas, cubos=construir_cubos(linhas))
+    consultas.registrar_dataframe(con, df_mapa[["Regiao", "Estado_Corrigido"]], consultas.TABELA_MAPA, colunas=None)
+    yield linhas, df_mapa, con
+    con.close()
+
+
+def _periodos(linhas):
+    """
+    Todos os períodos da meta do histórico, mais um sem vendas
+    """
+    meses = pd.period_range(linhas["Data"].min().to_period("M"), linhas["Data"].max().to_period("M") + 1, freq="M")
+    return [limites_periodo_meta(mes) for mes in meses]
+
+def _valores(df, chaves, coluna):
+    return df.set_index(chaves)[coluna].astype(float).sort_index()
+
+def _top(df, coluna_valor, chaves, n=N_TOP):
+    """
+    Os n primeiros com empate resolvido pelas chaves, como no ORDER BY do SQL
+    """
+    ordenado = df.sort_values([coluna_valor, *chaves], ascending=[False] + [True] * len(chaves), kind="stable")
+    return ordenado.head(n).reset_index(drop=True)
+
+
+def test_vendas_por_dia(dados):
+    linhas, _, con = dados
+    for inicio, fim in _periodos(linhas):
+        sql = consultas.vendas_por_dia(con, inicio, fim)
+        referencia = consultas.vendas_por_dia_pandas(linhas, inicio, fim)
+        referencia["Data"] = pd.to_datetime(referencia["Data"])
+        sql["Data"] = pd.to_datetime(sql["Data"])
+        pd.testing.assert_series_equal(
+            _valores(sql, "Data", "Valor Total Pedido"), _valores(referencia, "Data", "Valor Total Pedido"),
+            check_index_type=False, rtol=1e-9
+        )
+
+def test_vendas_por_semana(dados):
+    linhas, _, con = dados
+    for inicio, fim in _periodos(linhas):
+        sql = consultas.vendas_por_semana(con, inicio, fim)
+        referencia = consultas.vendas_por_semana_pandas(linhas, inicio, fim)
+        assert sql["Semana"].tolist() == [1, 2, 3, 4]
+        pd.testing.assert_series_equal(
+            _valores(sql, "Semana", "Valor Total Pedido"), _valores(referencia, "Semana", "Valor Total Pedido"),
+            check_index_type=False, rtol=1e-9
+        )
+
+def test_vendas_por_categoria(dados):
+    linhas, _, con = dados
+    for inicio, fim in _periodos(linhas):
+        sql = consultas.vendas_por_categoria(con, inicio, fim)
+        referencia = consultas.vendas_por_categoria_pandas(linhas, inicio, fim)
+        referencia["Categoria"] = referencia["Categoria"].astype(str)
+        pd.testing.assert_series_equal(
+            _valores(sql, "Categoria", "Valor Total Pedido"), _valores(referencia, "Categoria", "Valor Total Pedido"),
+            check_index_type=False, rtol=1e-9
+        )
+
+def test_top_produtos(dados):
+    linhas, _, con = dados
+    for inicio, fim in _periodos(linhas):
+        sql = consultas.top_produtos(con, inicio, fim, n=N_TOP)
+        referencia = _top(consultas.top_produtos_pandas(linhas, inicio, fim, n=len(linhas)), "Quantidade", ["Produto"])
+        assert sql["Produto"].tolist() == referencia["Produto"].tolist()
+        assert sql["Quantidade"].astype(float).tolist() == referencia["Quantidade"].astype(float).tolist()
+
+@pytest.mark.parametrize("estado", [None, "SP", "MS", "XX"])
+def test_top_lojistas(dados, estado):
+    linhas, _, con = dados
+    sql = consultas.top_lojistas(con, estado, n=N_TOP)
+    referencia = consultas.top_lojistas_pandas(linhas, estado, n=len(linhas))
+    referencia = _top(referencia.astype({"Cliente": str, "Estado": str}), "Valor Total Pedido", ["Cliente", "Estado"])
+    assert sql[["Cliente", "Estado"]].values.tolist() == referencia[["Cliente", "Estado"]].values.tolist()
+    assert sql["Valor Total Pedido"].tolist() == pytest.approx(referencia["Valor Total Pedido"].tolist(), rel=1e-9)
+
+@pytest.mark.parametrize("coluna", ["Regiao", "Estado_Corrigido"])
+def test_contagem_clientes(dados, coluna):
+    _, df_mapa, con = dados
+    sql = consultas.contagem_clientes(con, coluna)
+    referencia = consultas.contagem_clientes_pandas(df_mapa, coluna)
+    referencia = _top(referencia.astype({"valor": str}), "total", ["valor"], n=len(referencia))
+    assert sql["valor"].tolist() == referencia["valor"].tolist()
+    assert sql["total"].tolist() == referencia["total"].tolist()
+
+def test_totais_meta(dados):
+    linhas, _, con = dados
+    for inicio, fim in _periodos(linhas):
+        sql = consultas.totais_meta(con, inicio, fim)
+        referencia = consultas.totais_meta_pandas(linhas, inicio, fim)
+        assert sql["total_pedidos"] == referencia["total_pedidos"]
+        assert sql["pedidos_unicos"] == referencia["pedidos_unicos"]
+        assert sql["valor_total_vendido"] == pytest.approx(float(referencia["valor_total_vendido"]), rel=1e-9)
+
+def test_valor_de_cada_pedido_conta_uma_vez(dados):
+    linhas, _, con = dados
+    assert linhas["Número do Pedido"].duplicated().any(), "a exportação precisa de pedidos com várias linhas"
+    for inicio, fim in _periodos(linhas):
+        vendido = float(linhas.loc[linhas["Data"].between(inicio, fim), "Valor Produto"].sum())
+        assert consultas.totais_meta(con, inicio, fim)["valor_total_vendido"] == pytest.approx(vendido, rel=1e-9)
+        assert consultas.vendas_por_dia(con, inicio, fim)["Valor Total Pedido"].sum() == pytest.approx(vendido, rel=1e-9)
+        assert consultas.vendas_por_semana(con, inicio, fim)["Valor Total Pedido"].sum() == pytest.approx(vendido, rel=1e-9)
+        assert consultas.vendas_por_categoria(con, inicio, fim)["Valor Total Pedido"].sum() == pytest.approx(vendido, rel=1e-9)
+    total_lojistas = consultas.top_lojistas(con, n=len(linhas))["Valor Total Pedido"].sum()
+    assert total_lojistas == pytest.approx(float(linhas["Valor Produto"].sum()), rel=1e-9)
+
+def test_banco_da_versao_igual_ao_registro(dados):
+    linhas, _, con = dados
+    banco = consultas.criar_banco(construir_cubos(linhas))
+    cursor = banco.cursor()
+    inicio, fim = _periodos(linhas)[-2]
+    for consulta in (consultas.vendas_por_dia, consultas.vendas_por_semana, consultas.vendas_por_categoria, consultas.top_produtos):
+        pd.testing.assert_frame_equal(consulta(cursor, inicio, fim), consulta(con, inicio, fim), check_dtype=False)
+    pd.testing.assert_frame_equal(consultas.top_lojistas(cursor, "SP"), consultas.top_lojistas(con, "SP"), check_dtype=False)
+    assert consultas.totais_meta(cursor, inicio, fim) == consultas.totais_meta(con, inicio, fim)
+    banco.close()
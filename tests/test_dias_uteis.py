@@ -0,0 +1,64 @@
+"""
+Tabela acumulada de dias úteis (dias_uteis.py) contra o workalendar,
+inclusive com threads estendendo a tabela ao mesmo tempo em que outras a
+consultam.
+"""
+import random
+import threading
+from datetime import date, datetime, timedelta
+from workalendar.america import Brazil
+import dias_uteis
+from dias_uteis import dias_uteis_entre, garantir_anos
+
+THREADS = 8
+CONSULTAS_POR_THREAD = 200
+
+
+def _pares(semente, n, ano_inicio, ano_fim):
+    rng = random.Random(semente)
+    primeiro = date(ano_inicio, 1, 1)
+    dias = (date(ano_fim, 12, 31) - primeiro).days
+    return [(primeiro + timedelta(days=rng.randrange(dias)), primeiro + timedelta(days=rng.randrange(dias))) for _ in range(n)]
+
+
+def test_igual_ao_workalendar(tmp_path):
+    caminho = str(tmp_path / "dias_uteis.json")
+    cal = Brazil()
+    for inicio, fim in _pares(1, 300, 2019, 2026):
+        assert dias_uteis_entre(inicio, fim, caminho) == cal.get_working_days_delta(inicio, fim)
+    inicio, fim = datetime(2024, 1, 26, 15, 30), datetime(2024, 2, 25, 23, 59, 59)
+    assert dias_uteis_entre(inicio, fim, caminho) == cal.get_working_days_delta(inicio.date(), fim.date())
+
+
+def test_tabela_gravada_e_reaproveitada(tmp_path):
+    caminho = str(tmp_path / "dias_uteis.json")
+    garantir_anos(2020, 2022, caminho)
+    dias_uteis._tabela = {"caminho": None, "anos": {}, "inicio": None, "acumulado": None}
+
+    tabela = garantir_anos(2021, 2021, caminho)
+
+    assert sorted(tabela["anos"]) == ["2020", "2021", "2022"]
+    assert garantir_anos(2021, 2022, caminho) is tabela
+
+
+def test_consultas_concorrentes_com_extensao(tmp_path):
+    caminho = str(tmp_path / "dias_uteis.json")
+    garantir_anos(2024, 2024, caminho)
+    cal = Brazil()
+    pares = [_pares(semente, CONSULTAS_POR_THREAD, 2010 + semente, 2024) for semente in range(THREADS)]
+    esperados = [[cal.get_working_days_delta(inicio, fim) for inicio, fim in lista] for lista in pares]
+    obtidos = [None] * THREADS
+    largada = threading.Barrier(THREADS)
+
+    def consultar(i):
+        largada.wait()
+        obtidos[i] = [dias_uteis_entre(inicio, fim, caminho) for inicio, fim in pares[i]]
+
+    threads = [threading.Thread(target=consultar, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert obtidos == esperados
+    assert dias_uteis._tabela["inicio"] == date(2010, 1, 1)
@@ -0,0 +1,173 @@
+"""
+Busca de municípios: as versões com índice (find_closest_city_with_state)
+e em lote (find_closest_cities_with_state, cdist do rapidfuzz) devem dar o
+mesmo resultado da busca original com fuzzywuzzy.process.extractOne sobre
+as listas completas, inclusive no limite do threshold=70 e no recurso ao
+país quando o estado não resolve. Sem rapidfuzz, o lote divide os pares
+entre processos, e o resultado tem de ser o mesmo.
+"""
+import os
+import unicodedata
+import numpy as np
+import pandas as pd
+import pytest
+from fuzzywuzzy import process, fuzz
+import geocodificacao
+from geocodificacao import ler_referencias, find_closest_city_with_state, find_closest_cities_with_state
+from benchmarks.gerador import errar_grafia, PASTA_REFERENCIAS
+
+
+# ===== VERSÃO ORIGINAL (REFERÊNCIA) =====
+
+def normalize_text_original(text):
+    if pd.isna(text):
+        return ""
+    text = ''.join(c for c in unicodedata.normalize('NFD', str(text)) if unicodedata.category(c) != 'Mn')
+    return text.strip().upper()
+
+def get_estado_codigo_original(estado_normalizado, estados_df):
+    estado_info = estados_df[estados_df['uf_normalizado'] == estado_normalizado]
+    if not estado_info.empty:
+        return estado_info.iloc[0]['codigo_uf']
+    return None
+
+def find_closest_city_with_state_original(city, state, city_list, municipios_df, estados_df, threshold=70):
+    if not city or city == "DESCONHECIDO":
+        return None, None, None
+
+    normalized_city = normalize_text_original(city)
+    normalized_state = normalize_text_original(state) if state else None
+
+    if normalized_state:
+        estado_codigo = get_estado_codigo_original(normalized_state, estados_df)
+        if estado_codigo is not None:
+            state_cities = municipios_df[municipios_df['codigo_uf'] == estado_codigo]
+            state_city_list = state_cities['nome_normalizado'].tolist()
+
+            if state_city_list:
+                match = process.extractOne(normalized_city, state_city_list, scorer=fuzz.token_sort_ratio)
+                if match and match[1] >= threshold:
+                    matched_city = match[0]
+                    city_info = state_cities[state_cities['nome_normalizado'] == matched_city]
+                    if not city_info.empty:
+                        return matched_city, city_info.iloc[0]['latitude'], city_info.iloc[0]['longitude']
+
+    match = process.extractOne(normalized_city, city_list, scorer=fuzz.token_sort_ratio)
+    if match and match[1] >= threshold:
+        matched_city = match[0]
+        city_info = municipios_df[municipios_df['nome_normalizado'] == matched_city]
+        if not city_info.empty:
+            if normalized_state:
+                estado_codigo = get_estado_codigo_original(normalized_state, estados_df)
+                if estado_codigo is not None and city_info.iloc[0]['codigo_uf'] != estado_codigo:
+                    return None, None, None
+            return matched_city, city_info.iloc[0]['latitude'], city_info.iloc[0]['longitude']
+
+    return None, None, None
+
+
+# ===== CASOS =====
+
+# Consultas cujo melhor score no estado é exatamente 69, 70 ou 71
+# (conferido em test_scores_no_limite)
+NO_LIMITE = [
+    ("SAO SEXXXXIAO", "AL", 69), ("TRELA DO SUL", "MG", 69), ("OES DO NORTE", "MA", 69),
+    ("JOSE DA ", "RN", 70), ("ROCA XXXES", "RS", 70), ("FIRMINO ", "BA", 70),
+    ("CLAXXIO", "MG", 71), ("RIO DO ", "RN", 71), ("RIO DO", "RN", 71),
+]
+ESPECIAIS = [
+    ("DESCONHECIDO", "SP"), ("", "SP"), (None, "SP"), ("???", "SP"), ("12345", "RJ"), ("A", "MG"),
+    ("SAO PAULO", None), ("SAO PAULO", ""), ("SAO PAULO", "XX"), ("SAO PAULO", "RJ"), ("sao paulo", " sp "),
+    ("CAMPINAS", "DESCONHECIDO"), ("BRASILIA", "DF"), ("LUISB", None),
+]
+
+
+@pytest.fixture(scope="module")
+def referencias():
+    return ler_referencias(os.path.join(PASTA_REFERENCIAS, "municipios.csv"), os.path.join(PASTA_REFERENCIAS, "estados.csv"))
+
+@pytest.fixture(scope="module")
+def casos(referencias):
+    """
+    Nomes reais e com erros de digitação, com o estado certo, outro estado,
+    UF inexistente e sem estado, mais os casos especiais e os do limite
+    """
+    estados_df, municipios_df = referencias[0], referencias[1]
+    ufs = dict(zip(estados_df["codigo_uf"], estados_df["uf"]))
+    rng = np.random.default_rng(3)
+    casos = list(ESPECIAIS)
+    for cidade, uf, _ in NO_LIMITE:
+        casos += [(cidade, uf), (cidade, "XX"), (cidade, None)]
+    for municipio in municipios_df.sample(60, random_state=11).itertuples():
+        uf = ufs[municipio.codigo_uf]
+        outro = ufs[list(ufs)[(list(ufs).index(municipio.codigo_uf) + 1) % len(ufs)]]
+        errado = errar_grafia(municipio.nome, rng)
+        casos += [
+            (municipio.nome, uf), (errado, uf), (errado, outro),
+            (errado, "XX"), (errado, None), (errado.lower(), uf.lower()),
+        ]
+    return casos
+
+def _original(referencias, cidade, estado):
+    estados_df, municipios_df, city_list = referencias[:3]
+    return find_closest_city_with_state_original(cidade, estado, city_list, municipios_df, estados_df)
+
+def _mesmo(a, b):
+    cidade_a, lat_a, lon_a = a
+    cidade_b, lat_b, lon_b = b
+    # O lote devolve NaN onde a busca escalar devolve None
+    if pd.isna(cidade_a) or pd.isna(cidade_b):
+        return pd.isna(cidade_a) and pd.isna(cidade_b)
+    return cidade_a == cidade_b and lat_a == pytest.approx(lat_b) and lon_a == pytest.approx(lon_b)
+
+
+# ===== TESTES =====
+
+def test_scores_no_limite(referencias):
+    estados_df, municipios_df = referencias[0], referencias[1]
+    for cidade, uf, score in NO_LIMITE:
+        codigo = estados_df.loc[estados_df["uf"] == uf, "codigo_uf"].iloc[0]
+        nomes = municipios_df.loc[municipios_df["codigo_uf"] == codigo, "nome_normalizado"].tolist()
+        assert process.extractOne(cidade, nomes, scorer=fuzz.token_sort_ratio)[1] == score, cidade
+
+def test_busca_com_indice_igual_a_original(referencias, casos):
+    estados_df, municipios_df, city_list, _, indice = referencias
+    divergentes = [
+        (cidade, estado)
+        for cidade, estado in casos
+        if not _mesmo(
+            find_closest_city_with_state(cidade, estado, city_list, municipios_df, estados_df, threshold=70, indice=indice),
+            _original(referencias, cidade, estado),
+        )
+    ]
+    assert divergentes == []
+
+def _divergentes_em_lote(referencias, casos, **kwargs):
+    indice = referencias[4]
+    # O lote recebe cidades já sem None (como no geocodificar_dataframe)
+    cidades = ["" if cidade is None else cidade for cidade, _ in casos]
+    estados = ["" if estado is None else estado for _, estado in casos]
+    resultado = find_closest_cities_with_state(cidades, estados, indice, threshold=70, **kwargs)
+    return [
+        (cidade, estado)
+        for (cidade, estado), linha in zip(casos, resultado.itertuples(index=False))
+        if not _mesmo((linha.cidade_corrigida, linha.latitude, linha.longitude), _original(referencias, cidade, estado))
+    ]
+
+def test_busca_em_lote_igual_a_original(referencias, casos):
+    assert _divergentes_em_lote(referencias, casos) == []
+
+def test_busca_em_lote_sem_rapidfuzz_igual_a_original(referencias, casos, monkeypatch):
+    pools = []
+
+    class PoolRegistrado(geocodificacao.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs.get("max_workers"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(geocodificacao, "RAPIDFUZZ_DISPONIVEL", False)
+    monkeypatch.setattr(geocodificacao, "ProcessPoolExecutor", PoolRegistrado)
+
+    assert _divergentes_em_lote(referencias, casos, max_workers=2) == []
+    # Pares distintos acima de MINIMO_PARA_PROCESSOS: o pool foi usado
+    assert pools == [2]
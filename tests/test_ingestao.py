@@ -0,0 +1,67 @@
+"""
+Leitura em chunks (ler_csv_em_chunks + executar_pipeline) contra a leitura
+em passo único: os tipos não podem depender de como o arquivo foi dividido,
+nem quando uma coluna muda de cara entre um chunk e outro.
+"""
+import pandas as pd
+import pytest
+from ingestao import executar_pipeline, ler_csv_em_chunks
+from benchmarks.gerador import gravar_csv
+
+LINHAS_POR_CHUNK = 50
+TODO_O_ARQUIVO = 10**9
+
+
+def _blocos(conteudo, tamanho=1 << 12):
+    return (conteudo[i:i + tamanho] for i in range(0, len(conteudo), tamanho))
+
+def _ingerir(conteudo, linhas_por_chunk):
+    return executar_pipeline(ler_csv_em_chunks(_blocos(conteudo), linhas_por_chunk=linhas_por_chunk))
+
+def _exportacao_com_tipos_misturados():
+    """
+    Primeiro chunk só com números de pedido e telefones numéricos; no
+    segundo, zeros à esquerda, texto e células vazias nas mesmas colunas
+    """
+    linhas = ["Data,Número do Pedido,Cliente,Produto,Cidade,Estado,Telefone,Quantidade,Valor Total Z19-Z24"]
+    for i in range(LINHAS_POR_CHUNK):
+        linhas.append(f"2024-01-{i % 28 + 1:02d},{101 + i // 3},LOJA {i % 7},PRODUTO {i % 5},CAMPINAS,SP,1932{i:06d},{i % 4 + 1},{10.5 * (i + 1):.2f}")
+    segundo = [
+        ("0101", "1932000000"), ("0101", ""), ("101", "(19) 3200-0001"), ("A-7", "1932000002"),
+        ("", "1932000003"), ("00102", "1932000004"),
+    ]
+    for i, (pedido, telefone) in enumerate(segundo):
+        linhas.append(f"2024-02-{i + 1:02d},{pedido},LOJA {i},PRODUTO {i},CAMPINAS,SP,{telefone},2,{20.0 + i:.2f}")
+    return ("\n".join(linhas) + "\n").encode("utf-8")
+
+
+def test_tipos_iguais_com_colunas_que_mudam_entre_chunks():
+    conteudo = _exportacao_com_tipos_misturados()
+
+    em_chunks = _ingerir(conteudo, LINHAS_POR_CHUNK)
+    inteiro = _ingerir(conteudo, TODO_O_ARQUIVO)
+
+    pd.testing.assert_frame_equal(em_chunks.linhas, inteiro.linhas)
+    pd.testing.assert_frame_equal(em_chunks.pedidos, inteiro.pedidos)
+    pedidos = set(em_chunks.pedidos["Número do Pedido"].astype(str))
+    # Identificadores são texto: "0101" e "101" são pedidos diferentes, e a
+    # linha sem número de pedido é descartada
+    assert {"101", "0101", "00102", "A-7"} <= pedidos
+    assert "" not in pedidos and "nan" not in pedidos
+    assert em_chunks.linhas["Data"].dtype == "datetime64[ns]"
+
+
+@pytest.fixture(scope="module")
+def exportacao(tmp_path_factory):
+    caminho = tmp_path_factory.mktemp("ingestao") / "exportacao.csv"
+    gravar_csv(str(caminho), 5_000, 13)
+    return caminho.read_bytes()
+
+def test_chunks_igual_ao_passo_unico_com_categorias(exportacao):
+    em_chunks = _ingerir(exportacao, 700)
+    inteiro = _ingerir(exportacao, TODO_O_ARQUIVO)
+
+    pd.testing.assert_frame_equal(em_chunks.linhas, inteiro.linhas)
+    pd.testing.assert_frame_equal(em_chunks.pedidos, inteiro.pedidos)
+    for coluna in ["Cliente", "Produto", "Cidade", "Estado", "Número do Pedido"]:
+        assert isinstance(em_chunks.linhas[coluna].dtype, pd.CategoricalDtype), coluna
@@ -0,0 +1,67 @@
+"""
+Pipeline em partições no pool de processos (ingestao.py) contra o passo
+único, com o pool reaproveitado entre chamadas, e as condições que mandam
+para o caminho sequencial: o padrão (sem PROCESSOS_INGESTAO), uma CPU só
+ou um frame que cabe numa partição.
+"""
+import pandas as pd
+import pytest
+import ingestao
+from ingestao import executar_pipeline, executar_pipeline_em_paralelo, executar_pipeline_em_particoes
+from benchmarks.gerador import gravar_csv
+
+LINHAS_EXPORTACAO = 20_000
+SEMENTE = 11
+
+
+@pytest.fixture(scope="module")
+def bruto(tmp_path_factory):
+    caminho = tmp_path_factory.mktemp("ingestao") / "exportacao.csv"
+    gravar_csv(str(caminho), LINHAS_EXPORTACAO, SEMENTE)
+    yield pd.read_csv(caminho)
+    ingestao.encerrar_pool()
+
+
+def test_particoes_igual_ao_passo_unico_com_o_mesmo_pool(bruto):
+    referencia = executar_pipeline([bruto])
+
+    primeiro = executar_pipeline_em_particoes(bruto, linhas_por_particao=5_000, max_workers=2)
+    pool = ingestao._pool
+    segundo = executar_pipeline_em_particoes(bruto, linhas_por_particao=5_000, max_workers=2)
+
+    assert ingestao._pool is pool
+    for resultado in (primeiro, segundo):
+        pd.testing.assert_frame_equal(resultado.linhas, referencia.linhas)
+        pd.testing.assert_frame_equal(resultado.pedidos, referencia.pedidos)
+
+
+@pytest.mark.parametrize("processos, cpus, linhas, caminho", [
+    (0, 8, 20_000, "passo_unico"),
+    (4, 1, 20_000, "passo_unico"),
+    (4, 8, 5_000, "passo_unico"),
+    (4, 8, 5_001, "particoes"),
+    (2, 2, 20_000, "particoes"),
+])
+def test_caminho_paralelo_so_quando_pedido(bruto, monkeypatch, processos, cpus, linhas, caminho):
+    caminhos = []
+    monkeypatch.setattr(ingestao, "PROCESSOS_INGESTAO", processos)
+    monkeypatch.setattr(ingestao.os, "cpu_count", lambda: cpus)
+    monkeypatch.setattr(ingestao, "executar_pipeline", lambda *args: caminhos.append("passo_unico"))
+    monkeypatch.setattr(ingestao, "executar_pipeline_em_particoes", lambda *args: caminhos.append("particoes"))
+
+    executar_pipeline_em_paralelo(bruto.head(linhas), linhas_por_particao=5_000)
+
+    assert caminhos == [caminho]
+
+
+def test_leitura_compartilhada_solta_o_bloco(bruto):
+    df = bruto.head(1_000).astype({"Cliente": "category"})
+    bloco, tamanho = ingestao._gravar_compartilhada(df)
+    try:
+        lido = ingestao._ler_compartilhada(bloco, tamanho)
+    finally:
+        # Sem referências do frame lido ao bloco, fechar não dá BufferError
+        bloco.close()
+        bloco.unlink()
+
+    pd.testing.assert_frame_equal(lido, df)
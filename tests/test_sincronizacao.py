@@ -0,0 +1,153 @@
+"""
+GET condicional e md5 do download (sincronizacao.py) contra um servidor
+http.server em localhost que imita o download do Google Drive: responde 304
+quando If-None-Match ou If-Modified-Since batem com a versão servida.
+"""
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from sincronizacao import (
+    abrir_se_alterado,
+    blocos_com_md5,
+    drive_inalterado,
+    ler_estado_sincronizacao,
+    salvar_estado_sincronizacao,
+)
+
+CSV_V1 = "Data,Cliente,Valor Produto\n01/01/2024,Loja A,10.00\n".encode("utf-8")
+CSV_V2 = "Data,Cliente,Valor Produto\n01/01/2024,Loja A,10.00\n02/01/2024,Loja B,20.00\n".encode("utf-8")
+LAST_MODIFIED_V1 = "Mon, 01 Jan 2024 10:00:00 GMT"
+LAST_MODIFIED_V2 = "Tue, 02 Jan 2024 10:00:00 GMT"
+
+
+class Origem:
+    """
+    Versão servida (corpo, ETag, Last-Modified) e as requisições recebidas
+    """
+    def __init__(self):
+        self.publicar(CSV_V1, '"v1"', LAST_MODIFIED_V1)
+        self.requisicoes = []
+
+    def publicar(self, corpo, etag, last_modified):
+        self.corpo, self.etag, self.last_modified = corpo, etag, last_modified
+
+
+@pytest.fixture
+def origem():
+    origem = Origem()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            origem.requisicoes.append(dict(self.headers))
+            if_none_match = self.headers.get("If-None-Match")
+            if_modified_since = self.headers.get("If-Modified-Since")
+            inalterado = (
+                if_none_match == origem.etag if if_none_match is not None
+                else if_modified_since is not None and if_modified_since == origem.last_modified
+            )
+            if inalterado:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(origem.corpo)))
+            if origem.etag:
+                self.send_header("ETag", origem.etag)
+            self.send_header("Last-Modified", origem.last_modified)
+            self.end_headers()
+            self.wfile.write(origem.corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    origem.url = f"http://127.0.0.1:{servidor.server_address[1]}/uc?export=download"
+    yield origem
+    servidor.shutdown()
+    servidor.server_close()
+    thread.join()
+
+
+def _baixar(url, metadados_anteriores):
+    """
+    Como o dashboard: GET condicional e, se veio conteúdo, consome os blocos
+    pelo blocos_com_md5
+    """
+    response, metadados = abrir_se_alterado(url, metadados_anteriores, timeout=5)
+    if response is None:
+        return None, metadados
+    with response:
+        corpo = b"".join(blocos_com_md5(response.iter_content(16), metadados))
+    return corpo, metadados
+
+
+def test_primeiro_download_registra_etag_last_modified_e_md5(origem):
+    corpo, metadados = _baixar(origem.url, None)
+
+    assert corpo == CSV_V1
+    assert metadados == {"etag": '"v1"', "last_modified": LAST_MODIFIED_V1, "md5": hashlib.md5(CSV_V1).hexdigest()}
+    assert "If-None-Match" not in origem.requisicoes[0]
+    assert "If-Modified-Since" not in origem.requisicoes[0]
+
+
+def test_etag_igual_responde_304_e_retorna_none(origem, tmp_path):
+    caminho_estado = str(tmp_path / "sincronizacao.json")
+    _, metadados = _baixar(origem.url, None)
+    salvar_estado_sincronizacao("download_direto", metadados, caminho_estado)
+
+    anteriores = ler_estado_sincronizacao(caminho_estado)["download_direto"]
+    response, metadados = abrir_se_alterado(origem.url, anteriores, timeout=5)
+
+    assert response is None
+    assert metadados == anteriores
+    assert origem.requisicoes[-1]["If-None-Match"] == '"v1"'
+    assert origem.requisicoes[-1]["If-Modified-Since"] == LAST_MODIFIED_V1
+
+
+def test_last_modified_sem_etag_responde_304(origem):
+    origem.publicar(CSV_V1, None, LAST_MODIFIED_V1)
+    _, metadados = _baixar(origem.url, None)
+    assert metadados["etag"] is None
+
+    response, _ = abrir_se_alterado(origem.url, metadados, timeout=5)
+
+    assert response is None
+    assert "If-None-Match" not in origem.requisicoes[-1]
+    assert origem.requisicoes[-1]["If-Modified-Since"] == LAST_MODIFIED_V1
+
+
+def test_etag_alterado_baixa_a_nova_versao(origem):
+    _, anteriores = _baixar(origem.url, None)
+    origem.publicar(CSV_V2, '"v2"', LAST_MODIFIED_V2)
+
+    corpo, metadados = _baixar(origem.url, anteriores)
+
+    assert corpo == CSV_V2
+    assert metadados["etag"] == '"v2"'
+    assert metadados["last_modified"] == LAST_MODIFIED_V2
+    assert origem.requisicoes[-1]["If-None-Match"] == '"v1"'
+
+
+def test_md5_diferente_e_detectado(origem):
+    _, anteriores = _baixar(origem.url, None)
+    origem.publicar(CSV_V2, '"v2"', LAST_MODIFIED_V2)
+    _, metadados = _baixar(origem.url, anteriores)
+
+    assert metadados["md5"] == hashlib.md5(CSV_V2).hexdigest()
+    assert metadados["md5"] != anteriores["md5"]
+    assert not drive_inalterado({"md5": metadados["md5"], "modified_time": None}, anteriores)
+    assert drive_inalterado({"md5": anteriores["md5"], "modified_time": None}, anteriores)
+
+
+def test_md5_so_e_gravado_ao_fim_do_fluxo(origem):
+    response, metadados = abrir_se_alterado(origem.url, None, timeout=5)
+    with response:
+        blocos = blocos_com_md5(response.iter_content(16), metadados)
+        next(blocos)
+        assert metadados["md5"] is None
+        list(blocos)
+    assert metadados["md5"] == hashlib.md5(CSV_V1).hexdigest()
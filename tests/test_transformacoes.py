@@ -0,0 +1,33 @@
+"""
+classificar_produtos (um nome distinto por vez, em texto ou categórico)
+contra classificar_produto aplicado linha a linha.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from transformacoes import classificar_produto, classificar_produtos, CATEGORIAS
+from benchmarks.gerador import catalogo_produtos
+
+ESPECIAIS = [
+    " kit 1 modelo x ", "Kit Universal", "KIT UPGRADE", "KIT 8 GENERICO", "KIT 12", "PECA KIT ROSCA",
+    "kit rosca", "KIT  ROSCA", "KITROSCA", "", "   ", None, np.nan, "ÇKIT 1",
+]
+
+
+@pytest.fixture(scope="module")
+def produtos():
+    rng = np.random.default_rng(5)
+    nomes = catalogo_produtos(2_000, rng)["Produto"].tolist() + ESPECIAIS
+    return pd.Series(np.array(nomes, dtype=object)[rng.integers(0, len(nomes), 50_000)], name="Produto")
+
+
+@pytest.mark.parametrize("dtype", [object, "str", "category"])
+def test_igual_ao_apply(produtos, dtype):
+    serie = produtos.astype(dtype) if dtype is not object else produtos
+    referencia = produtos.apply(classificar_produto)
+
+    categorias = classificar_produtos(serie)
+
+    assert list(categorias.cat.categories) == CATEGORIAS
+    assert categorias.index.equals(produtos.index)
+    assert categorias.astype(str).tolist() == referencia.tolist()
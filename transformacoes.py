@@ -0,0 +1,72 @@
+import re
+import numpy as np
+import pandas as pd
+
+# ===== TRANSFORMAÇÕES VETORIZADAS =====
+
+def calcular_valor_unitario(df, coluna_valor="Valor Total Z19-Z24", coluna_quantidade="Quantidade"):
+    """
+    Valor Unitário = Valor Total / Quantidade, vetorizado com divisão mascarada.
+    Linhas com valor ou quantidade ausentes, ou quantidade <= 0, ficam NaN,
+    exatamente como o antigo df.apply(..., axis=1) que devolvia None.
+    """
+    valor = pd.to_numeric(df[coluna_valor], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    quantidade = pd.to_numeric(df[coluna_quantidade], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+    validos = ~np.isnan(valor) & ~np.isnan(quantidade) & (quantidade > 0)
+    resultado = np.full(len(valor), np.nan)
+    np.divide(valor, quantidade, out=resultado, where=validos)
+
+    return pd.Series(resultado, index=df.index, name="Valor Unitário")
+
+# ===== CATEGORIA DO PRODUTO =====
+# Kits de ar são reconhecidos pelo prefixo da descrição; "KIT ROSCA" em
+# qualquer posição; o resto é peça avulsa. Os prefixos viram uma única
+# regex compilada, aplicada uma vez por nome de produto distinto.
+
+KIT_AR = "KITS AR"
+KIT_ROSCA = "KITS ROSCA"
+PECAS_AVULSAS = "PEÇAS AVULSAS"
+CATEGORIAS = [KIT_AR, KIT_ROSCA, PECAS_AVULSAS]
+
+PREFIXOS_KITS_AR = ["KIT 1", "KIT 2", "KIT 3", "KIT 4", "KIT 5", "KIT 6", "KIT 7",
+                    "KIT UNIVERSAL", "KIT UPGRADE", "KIT AIR RIDE 4C", "KIT K3", "KIT K4", "KIT K5"]
+_PADRAO_KITS_AR = re.compile("|".join(re.escape(prefixo) for prefixo in PREFIXOS_KITS_AR))
+
+def classificar_produto(descricao):
+    """
+    Categoria de uma descrição; versão escalar de classificar_produtos
+    """
+    descricao_normalizada = str(descricao).strip().upper()
+    if _PADRAO_KITS_AR.match(descricao_normalizada):
+        return KIT_AR
+    elif "KIT ROSCA" in descricao_normalizada:
+        return KIT_ROSCA
+    else:
+        return PECAS_AVULSAS
+
+def classificar_produtos(produtos):
+    """
+    Coluna "Categoria" (Categorical com as CATEGORIAS) para uma série de
+    produtos. Cada nome distinto é classificado uma única vez (as
+    categorias do Categorical, ou os valores do factorize) e o resultado é
+    espalhado pelos códigos. Ausentes seguem classificar_produto (peça
+    avulsa).
+    """
+    if isinstance(produtos.dtype, pd.CategoricalDtype):
+        codigos = produtos.cat.codes.to_numpy()
+        nomes = produtos.cat.categories
+    else:
+        codigos, nomes = pd.factorize(produtos)
+
+    normalizados = pd.Series(nomes, dtype=object).map(str).str.strip().str.upper()
+    kit_ar = normalizados.str.match(_PADRAO_KITS_AR).to_numpy(dtype=bool)
+    kit_rosca = normalizados.str.contains("KIT ROSCA", regex=False).to_numpy(dtype=bool)
+    por_nome = np.where(kit_ar, 0, np.where(kit_rosca, 1, 2)).astype(np.int8)
+
+    # Código -1 (ausente) pega o último elemento: peça avulsa
+    categorias = np.append(por_nome, np.int8(2))[codigos]
+    return pd.Series(
+        pd.Categorical.from_codes(categorias, categories=CATEGORIAS),
+        index=produtos.index, name="Categoria"
+    )